@@ -1,49 +1,189 @@
 """Set logging, get current host, read and configure API spec."""
 import argparse
+import itertools
 import logging
 
 import coloredlogs
 
+import config.config
+import utils.benchmark
 import utils.errors as err
 import utils.export as export
+import utils.history
 import utils.jsonschemas
-import utils.run_test
+import utils.loadgen
+import utils.mock_beacon
+import utils.parallel
+import utils.reporters
+import utils.result_cache
+import utils.results
 import utils.setup
+import utils.shards
+import utils.stats
+import utils.watch
 
 
-def run():
-    """Look for all test modules and run them."""
+def skip_unchanged(tests, cache, reporters):
+    """Report the tests that passed before with the same inputs as unchanged, return the other tests."""
     settings = utils.setup.Settings()
-    for test in settings.tests:
-        try:
-            utils.run_test.run_test(test)
-        except err.BeaconTestError:
-            logging.error('Testing stopped unexpectedly.')
-            exit()
+    changed = []
+    for test in tests:
+        if not cache.unchanged(test):
+            changed.append(test)
+            continue
+        result = utils.results.TestResult(test)
+        result.status = 'unchanged'
+        for reporter in reporters:
+            reporter.add(result)
+    settings.unchanged = len(tests) - len(changed)
+    return changed
+
+
+def run(reporters=(), changed_only=False, prioritize=False, max_failures=0, shard=None, shard_timings=None):
+    """Look for all test modules and run them. Each result is passed on to the reporters as soon as it is done.
+
+    With `changed_only`, tests that passed before with the same inputs are not run again.
+    With `prioritize`, recently failing and fast tests are run first.
+    With `max_failures`, the run stops after that many failed tests.
+    With `shard` (i, N), only the i:th of N parts of the tests is run, and the history is not updated (see utils.shards).
+    The parts are split by the `shard_timings` of the tests, if given (see utils.shards.read_timings).
+    Generated tests are made while they are run, unless the options above need all tests first.
+    """
+    settings = utils.setup.Settings()
+    history = utils.history.History(config.config.CACHE_DIR, settings.host_name())
+    tests = settings.tests
+    if settings.generated is not None:
+        if shard is not None or changed_only or prioritize:
+            tests = tests + list(settings.generated)
+        else:
+            tests = itertools.chain(tests, settings.generated)
+    if shard is not None:
+        tests = utils.shards.select(tests, *shard, shard_timings)
+    cache = utils.result_cache.open_cache(settings) if changed_only else None
+    if cache is not None:
+        tests = skip_unchanged(tests, cache, reporters)
+    if prioritize:
+        tests = history.prioritize(tests)
+
+    # the tests may be made as they are needed, so each one is only taken once from `tests`
+    tests, scheduled = itertools.tee(tests)
+    results = utils.parallel.run_tests(scheduled, settings.workers)
+    failures = 0
+    try:
+        for test, result in zip(tests, results):
+            history.update(test, result)
+            if cache is not None:
+                cache.update(test, result)
+            if result.status != 'skipped':
+                settings.add_timings(utils.results.timing_record(result))
+            for reporter in reporters:
+                reporter.add(result)
+            failures += result.status == 'failed'
+            if max_failures and failures >= max_failures:
+                logging.error(f'Stopping after {failures} failed tests.')
+                break
+    except err.BeaconTestError:
+        logging.error('Testing stopped unexpectedly.')
+        exit()
+    finally:
+        results.close()
+        if shard is None:
+            history.save()
+        if cache is not None:
+            cache.save()
+
+
+def watch(c_args, reporters):
+    """Run the affected tests again whenever the test files or their data change, until interrupted (see utils.watch)."""
+    settings = utils.setup.Settings()
+    # print_result changes the logging, set it back for the next run
+    level = 'WARNING' if c_args.only_warn else 'INFO'
+    coloredlogs.install(level=level, fmt='%(levelname)s: %(message)s')
+
+    def rerun(tests):
+        settings.reset_results()
+        settings.tests, settings.generated = tests, None
+        run(reporters, max_failures=1 if c_args.fail_fast else c_args.max_failures)
+        print_result()
+        coloredlogs.install(level=level, fmt='%(levelname)s: %(message)s')
+
+    utils.watch.Watch(c_args, rerun, c_args.watch).loop()
 
 
 def print_result():
     """Print a summary of the results."""
     settings = utils.setup.Settings()
+    print_summary(settings.errors, settings.warnings, settings.query_warnings,
+                  unchanged=settings.unchanged, response_cache=settings.response_cache, timings=settings.timings)
+
+
+def print_summary(errors, warnings, query_warnings, unchanged=0, response_cache=None, timings=()):
+    """Print the number of errors and specification errors, and the timings."""
     coloredlogs.install(level='DEBUG', fmt='%(message)s')
     logging.info(f'\n\n{"":_^40}')
     logging.info('Testing done. Result:\n')
-    if settings.errors:
-        logging.error(f'  {"Data errors:":27} {settings.errors} tests failed')
-    if settings.warnings:
-        logging.warning(f'  {"Specification errors:":27} {len(settings.warnings)} ({len(set(settings.warnings))} unique)')
-    if settings.query_warnings:
-        logging.warning(f'  {"Query specification errors:":27} {len(settings.query_warnings)} ({len(set(settings.query_warnings))} unique)')
-    if not (settings.errors or settings.warnings or settings.query_warnings):
+    if errors:
+        logging.error(f'  {"Data errors:":27} {errors} tests failed')
+    if warnings:
+        logging.warning(f'  {"Specification errors:":27} {len(warnings)} ({len(set(warnings))} unique)')
+    if query_warnings:
+        logging.warning(f'  {"Query specification errors:":27} {len(query_warnings)} ({len(set(query_warnings))} unique)')
+    if not (errors or warnings or query_warnings):
         logging.debug('  All tests passed!')
+    if unchanged:
+        logging.info(f'  {"Unchanged:":27} {unchanged} tests not run, they passed before')
+    if response_cache is not None:
+        logging.info(f'  {"Response cache:":27} {response_cache.hits} hits, {response_cache.misses} misses')
+    if timings:
+        print_timings(timings)
     logging.info('\n\n')
 
 
+def print_merged(filepaths, host):
+    """Print the summary of the json lines reports of several shards, add them to the history of the host."""
+    history = utils.history.History(config.config.CACHE_DIR, utils.setup.host_name(host))
+    merged = utils.shards.merge_reports(filepaths, history)
+    history.save()
+    print_summary(merged['errors'], merged['warnings'], merged['query_warnings'],
+                  unchanged=merged['unchanged'], timings=merged['timings'])
+
+
+def print_timings(records):
+    """Print how much time the tests spent in each phase."""
+    summary = utils.results.summarize_timings(records)
+    total = summary['duration']['total']
+    logging.info(f'\n  Time per phase ({len(records)} tests, in ms):\n')
+    logging.info(f'  {"phase":29} {"total":>10} {"mean":>8} {"p50":>8} {"p95":>8} {"max":>8} {"share":>6}')
+    for phase in utils.results.PHASES + ['duration']:
+        stats = summary[phase]
+        name = utils.results.PHASE_NAMES.get(phase, 'Whole test')
+        share = f'{stats["total"] / total:6.1%}' if total else f'{"-":>6}'
+        logging.info(f'  {name:29} {utils.stats.in_ms(stats["total"]):>10} {utils.stats.in_ms(stats["mean"]):>8} '
+                     f'{utils.stats.in_ms(stats["p50"]):>8} {utils.stats.in_ms(stats["p95"]):>8} '
+                     f'{utils.stats.in_ms(stats["max"]):>8} {share}')
+
+
+def run_test_file_tools(c_args):
+    """Run the options that work on the test files only. Return whether one was given."""
+    if c_args.validate_tests:
+        utils.jsonschemas.run_testvalidaton(c_args.validate_tests)
+    elif c_args.extract_vcf_data:
+        export.export_vcf_testdata(c_args.extract_vcf_data, print_metadata=True)
+    elif c_args.extract_csv_data:
+        export.export_csv_testdata(c_args.extract_csv_data, c_args.csv_output, c_args.csv_columns)
+    elif c_args.show_data_files:
+        export.show_data_files(c_args.show_data_files)
+    else:
+        return False
+    return True
+
+
 if __name__ == '__main__':
     coloredlogs.install(level='INFO', fmt='%(levelname)s: %(message)s')
     parser = argparse.ArgumentParser()
     parser.add_argument('--host', type=str, nargs='?', default='local',
-                        help="Specify which beacon host to test")
+                        help="Specify which beacon host to test. "
+                        f"Use `{config.config.MOCK_HOST}` to test against a mock beacon serving the test data")
     parser.add_argument('--test', action='append',
                         help="Run a test (pathname for test configuration file in YAML format). "
                         "This option may occur several times")
@@ -57,6 +197,81 @@ if __name__ == '__main__':
                         help="Only print warnings and errors")
     parser.add_argument('--one_based', action="store_true",
                         help="Expect the beacon to be 1 based")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Number of tests to run concurrently. Default 1")
+    parser.add_argument('--validation_processes', type=int, default=0, metavar='N',
+                        help="Validate the responses in N processes, with --workers. Default 0: validate in the test threads")
+    parser.add_argument('--pool_size', type=int, default=config.config.POOL_SIZE,
+                        help=f"Number of connections to keep open to the beacon. Default {config.config.POOL_SIZE}")
+    parser.add_argument('--timeout', type=float, default=config.config.TIMEOUT,
+                        help=f"Seconds to wait for the beacon to answer. Default {config.config.TIMEOUT}")
+    parser.add_argument('--prioritize', action="store_true",
+                        help="Run the tests that failed recently first, then the fastest ones, based on earlier runs")
+    parser.add_argument('--fail_fast', action="store_true",
+                        help="Stop at the first failed test")
+    parser.add_argument('--max_failures', type=int, default=0, metavar='N',
+                        help="Stop after N failed tests")
+    parser.add_argument('--shard', type=utils.shards.parse_shard, metavar='i/N',
+                        help="Only run the i:th of N parts of the tests. The parts have about the same number of tests, "
+                        "or take about the same time with --shard_timings")
+    parser.add_argument('--shard_timings', nargs='+', metavar='FILE',
+                        help="Split the tests of --shard by their durations in these json lines reports "
+                        "(eg. of the shards of an earlier run). All shards must be given the same files")
+    parser.add_argument('--merge_reports', nargs='+', metavar='FILE',
+                        help="Print the summary of several json lines reports (eg. from the shards of a run), "
+                        "and add them to the history of --host")
+    parser.add_argument('--generate', action='append', metavar='FILE',
+                        help="Generate tests from a beacon data file (csv or tsv): exact hits, off-by-one positions, ranges, "
+                        "wrong alleles and missing datasets. May be given more than once")
+    parser.add_argument('--generate_limit', type=int, default=0, metavar='N',
+                        help="Generate at most N tests. Default 0: all")
+    parser.add_argument('--changed_only', action="store_true",
+                        help="Only run the tests that did not pass before with the same test definition, host, "
+                        "specifications, options and beacon info")
+    parser.add_argument('--stream_responses', type=float, metavar='MB',
+                        help="Parse the responses while they are read, and check the datasetAlleleResponses at the same time. "
+                        "Bodies bigger than MB megabytes are only kept parsed, and not validated against the OpenAPI specification")
+    parser.add_argument('--cache_responses', action="store_true",
+                        help="Send each distinct query only once, and reuse its response and specification errors "
+                        "in all tests that make the same query")
+    parser.add_argument('--record', metavar='CASSETTE',
+                        help="Save all responses from the beacon in a cassette file, to be replayed later")
+    parser.add_argument('--replay', metavar='CASSETTE',
+                        help="Don't contact the beacon, use the responses saved in a cassette file. "
+                        "Implies --offline")
+    parser.add_argument('--timings_json', metavar='FILE',
+                        help="Write the time each test spent in each phase (connecting, validating, comparing etc) "
+                        "to a json file")
+    parser.add_argument('--report', action='append', type=utils.reporters.parse_report, metavar='KIND:FILE',
+                        help=f"Write a report of the results to FILE while the tests are running. KIND is one of "
+                        f"{', '.join(utils.reporters.REPORTERS)}. This option may occur several times")
+    parser.add_argument('--watch', type=float, nargs='?', const=utils.watch.INTERVAL, metavar='S',
+                        help="Keep running, and run the affected tests again when the test files or their data files change. "
+                        f"Look for changes every S seconds, default {utils.watch.INTERVAL}")
+    parser.add_argument('--offline', action="store_true",
+                        help="Don't download specifications or schemas, only use the ones in the cache "
+                        f"({config.config.CACHE_DIR})")
+    parser.add_argument('--compare_hosts', nargs='+', metavar='HOST',
+                        help="Run the tests against several beacon hosts in parallel and compare the results and "
+                        "latencies. Use `all` for all hosts in the config")
+    parser.add_argument('--repeat', type=int, default=1,
+                        help="Number of times to run each test when comparing hosts. Default 1")
+    parser.add_argument('--load', action="store_true",
+                        help="Instead of testing, replay the queries of the tests as load on the beacon")
+    parser.add_argument('--load_qps', type=utils.loadgen.parse_rate, nargs='+', default=[10],
+                        help="Queries per second to send in load mode. Several rates are run one after another. Default 10")
+    parser.add_argument('--load_duration', type=float, default=10,
+                        help="Seconds to keep each rate in load mode. Default 10")
+    parser.add_argument('--load_requests', type=int, default=0,
+                        help="Number of queries to send per rate in load mode, instead of using a duration")
+    parser.add_argument('--load_concurrency', type=int, default=50,
+                        help="Maximum number of queries waiting for an answer in load mode. Default 50")
+    parser.add_argument('--mock_beacon', type=int, metavar='PORT',
+                        help="Serve the test data (see --mock_data) as a beacon on PORT, until interrupted")
+    parser.add_argument('--mock_data', action='append', metavar='FILE',
+                        help="Data file for the mock beacon. This option may occur several times. "
+                        "Default: the beacondata of the tests given with --test, or "
+                        f"{', '.join(config.config.MOCK_DATA)}")
     parser.add_argument('--validate_tests', action='append',
                         help="Check if a test file is correctly formatted."
                         "Input: pathname for test configuration file in YAML format."
@@ -66,22 +281,34 @@ if __name__ == '__main__':
                         "Input: pathname for test file.")
     parser.add_argument('--extract_vcf_data', action='append',
                         help="Extract the beacon data for a test in vcf format."
-                        "Input: pathname for test configuration file in YAML format.")
+                        "Input: pathname for test configuration file in YAML format. "
+                        "The vcf files may be bgzip compressed.")
+    parser.add_argument('--extract_csv_data', action='append',
+                        help="Extract the beacon data for a test in csv format, each variant once. "
+                        "Input: pathname for test configuration file in YAML format. "
+                        "This option may occur several times")
+    parser.add_argument('--csv_output', default='-', metavar='FILE',
+                        help="Where to write the data of --extract_csv_data: tsv if FILE ends with .tsv, "
+                        "compressed if it ends with .gz. Default: stdout")
+    parser.add_argument('--csv_columns', type=lambda columns: columns.split(','), metavar='COLUMN,...',
+                        help="The columns to write with --extract_csv_data. Default: all data fields of the test schema")
     # currently not used:
     parser.add_argument('--version', nargs='?', default='v1.0.1',
                         choices=['v1.0.1', 'v1.1.0', 'v101', 'v110'],
                         help="Which version of the api to test. Defalt v1.0.1")
 
     c_args = parser.parse_args()
-    if c_args.validate_tests:
-        utils.jsonschemas.run_testvalidaton(c_args.validate_tests)
+    if run_test_file_tools(c_args):
         exit()
-    if c_args.extract_vcf_data:
-        data = export.export_vcf_testdata(c_args.extract_vcf_data)
-        export.print_vcf_files(data, print_metadata=True)
+    if c_args.merge_reports:
+        print_merged(c_args.merge_reports, c_args.host)
         exit()
-    if c_args.show_data_files:
-        export.show_data_files(c_args.show_data_files)
+    if c_args.mock_beacon is not None:
+        utils.mock_beacon.make_server(c_args, port=c_args.mock_beacon).serve_forever()
+        exit()
+
+    if c_args.compare_hosts:
+        utils.benchmark.run_hosts(c_args)
         exit()
 
     logging.info('Running api tests...')
@@ -91,5 +318,24 @@ if __name__ == '__main__':
         utils.setup.Settings().set_args(c_args)
     except err.BeaconTestError:
         exit()
-    run()
-    print_result()
+    if c_args.load:
+        try:
+            utils.loadgen.run_load(utils.setup.Settings(), c_args.load_qps, duration=c_args.load_duration,
+                                   count=c_args.load_requests, concurrency=c_args.load_concurrency)
+        finally:
+            utils.setup.Settings().close()
+        exit()
+    reporters = utils.reporters.open_reporters(c_args.report)
+    try:
+        run(reporters, changed_only=c_args.changed_only, prioritize=c_args.prioritize,
+            max_failures=1 if c_args.fail_fast else c_args.max_failures, shard=c_args.shard,
+            shard_timings=utils.shards.read_timings(c_args.shard_timings) if c_args.shard_timings else None)
+        print_result()
+        if c_args.watch is not None:
+            watch(c_args, reporters)
+    finally:
+        for reporter in reporters:
+            reporter.close()
+        utils.setup.Settings().close()
+    if c_args.timings_json:
+        utils.results.export_timings(utils.setup.Settings().timings, c_args.timings_json)
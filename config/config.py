@@ -22,3 +22,18 @@ SCHEMAS = ''
 PRECISION = 6
 
 TEST_SPEC = 'tests/schema.yaml'
+
+# Number of connections kept open to each beacon host
+POOL_SIZE = 10
+# Seconds to wait for a beacon to connect or answer
+TIMEOUT = 60
+
+# Directory for downloaded specifications and schemas
+CACHE_DIR = '.beacon_cache'
+# Seconds during which downloaded files are used without checking for updates
+CACHE_MAX_AGE = 24 * 60 * 60
+
+# Host name for the mock beacon, which serves the test data from within the tester
+MOCK_HOST = 'mock'
+# Data files served by the mock beacon, when the tests don't name any
+MOCK_DATA = ['tests/testdata.csv', 'tests/testdata_mate.csv']
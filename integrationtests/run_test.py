@@ -10,40 +10,42 @@ import utils.jsonschemas
 import utils.run_test
 
 
+MOCK_BODY = {
+    "beaconId": "localhost:5050",
+    "apiVersion": "1.1.0",
+    "exists": True,
+    "alleleRequest": {
+        "referenceName": "22",
+        "referenceBases": "C",
+        "assemblyId": "GRCh38",
+        "includeDatasetResponses": "HIT",
+        "variantType": "SNP",
+        "datasetIds": ["GRCh38:beacon_test:2030-01-01"],
+        "start": 17302971,
+        "end": 17302972
+    },
+    "datasetAlleleResponses": [{
+        "datasetId": "GRCh38:beacon_test:2030-01-01",
+        "referenceName": "22",
+        "externalUrl": "",
+        "note": "",
+        "variantCount": 2931,
+        "callCount": 5008,
+        "sampleCount": 2504,
+        "exists": True,
+        "referenceBases": "C",
+        "alternateBases": "A",
+        "variantType": "SNP",
+        "start": 17302971,
+        "end": 17302972,
+        "frequency": 0.585264027,
+        "info": {"accessType": "PUBLIC"}
+    }]
+}
 MOCK_RESPONSE = {
     'return_value.status_code': 200,
-    'return_value.data': json.dumps({
-        "beaconId": "localhost:5050",
-        "apiVersion": "1.1.0",
-        "exists": True,
-        "alleleRequest": {
-            "referenceName": "22",
-            "referenceBases": "C",
-            "assemblyId": "GRCh38",
-            "includeDatasetResponses": "HIT",
-            "variantType": "SNP",
-            "datasetIds": ["GRCh38:beacon_test:2030-01-01"],
-            "start": 17302971,
-            "end": 17302972
-        },
-        "datasetAlleleResponses": [{
-            "datasetId": "GRCh38:beacon_test:2030-01-01",
-            "referenceName": "22",
-            "externalUrl": "",
-            "note": "",
-            "variantCount": 2931,
-            "callCount": 5008,
-            "sampleCount": 2504,
-            "exists": True,
-            "referenceBases": "C",
-            "alternateBases": "A",
-            "variantType": "SNP",
-            "start": 17302971,
-            "end": 17302972,
-            "frequency": 0.585264027,
-            "info": {"accessType": "PUBLIC"}
-        }]
-    })
+    'return_value.data': json.dumps(MOCK_BODY),
+    'return_value.json.return_value': MOCK_BODY
 }
 
 
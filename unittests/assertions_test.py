@@ -0,0 +1,86 @@
+"""Tests for the compiled checks of the responses."""
+import unittest
+
+import utils.assertions
+import utils.errors as err
+
+
+class CountingList(list):
+    """A list that counts how many times it is iterated."""
+
+    iterations = 0
+
+    def __iter__(self):
+        """Count the iteration."""
+        CountingList.iterations += 1
+        return super().__iter__()
+
+
+def response():
+    """Return a response with a list of datasets."""
+    return {'exists': True,
+            'datasetAlleleResponses': CountingList([{'datasetId': f'd{num}', 'referenceBases': 'A', 'variantType': 'SNP',
+                                                     'variantCount': num} for num in range(20)])}
+
+
+class TestAssertions(unittest.TestCase):
+    """Test that the checks are evaluated together, but fail as if evaluated one by one."""
+
+    def setUp(self):
+        """Reset the iteration count."""
+        CountingList.iterations = 0
+
+    def test_one_pass(self):
+        """Test that all list checks of a property go through the list once."""
+        checks = [{'assert': 'contains', 'property': 'datasetAlleleResponses', 'data': {'datasetId': f'd{num}', 'variantCount': num}}
+                  for num in range(20)]
+        checks += [{'assert': 'contains', 'property': 'datasetAlleleResponses', 'data': {'datasetId': 'x', 'variantCount': 3}},
+                   {'assert': 'not_contains', 'property': 'datasetAlleleResponses', 'data': {'datasetId': 'd21'}},
+                   {'assert': 'length_eq', 'property': 'datasetAlleleResponses', 'length': 20},
+                   {'assert': 'is_true', 'property': 'exists'},
+                   {'assert': 'status_code', 'status_code': 200}]
+        with self.assertRaises(err.ResponseError) as context:
+            utils.assertions.Assertions(checks).check(response())
+        self.assertEqual(context.exception.messages, ['Bad value for field datasetId: x != d0', 'Bad value for field variantCount: 3 != 0'])
+        # once for the index, once for the checks
+        self.assertEqual(CountingList.iterations, 2)
+
+    def test_first_failure(self):
+        """Test that the error of the first failing check is raised."""
+        checks = [{'assert': 'contains', 'property': 'datasetAlleleResponses', 'data': {'datasetId': 'd1'}},
+                  {'assert': 'not_contains', 'property': 'datasetAlleleResponses', 'data': {'datasetId': 'd1'}},
+                  {'assert': 'is_false', 'property': 'exists'},
+                  {'assert': 'length_gt', 'property': 'datasetAlleleResponses', 'length': 30}]
+        with self.assertRaises(err.ResponseError) as context:
+            utils.assertions.Assertions(checks).check(response())
+        self.assertEqual(context.exception.messages, ['Value {datasetId: d1} not allowed in answer'])
+        with self.assertRaises(AssertionError) as context:
+            utils.assertions.Assertions(checks[2:]).check(response())
+        self.assertEqual(str(context.exception), "Bad value of field existsshould be 'false', but is True")
+
+    def test_missing_property(self):
+        """Test the errors for missing properties."""
+        with self.assertRaises(AssertionError):
+            utils.assertions.Assertions([{'assert': 'contains', 'property': 'datasets', 'data': {}}]).check(response())
+        with self.assertRaises(KeyError):
+            utils.assertions.Assertions([{'assert': 'length_eq', 'property': 'datasets', 'length': 0}]).check(response())
+
+    def test_fed(self):
+        """Test that a list pass fed while the response is read gives the same errors."""
+        checks = [{'assert': 'contains', 'property': 'datasetAlleleResponses', 'data': {'datasetId': 'd3', 'variantCount': 4}},
+                  {'assert': 'not_contains', 'property': 'datasetAlleleResponses', 'data': {'datasetId': 'd1'}},
+                  {'assert': 'length_eq', 'property': 'datasetAlleleResponses', 'length': 21}]
+        for num in range(len(checks)):
+            assertions = utils.assertions.Assertions(checks[num:])
+            list_pass = assertions.list_pass('datasetAlleleResponses')
+            for obj in response()['datasetAlleleResponses']:
+                list_pass.feed(obj)
+            with self.assertRaises(Exception) as fed:
+                assertions.check(response(), fed={'datasetAlleleResponses': list_pass})
+            with self.assertRaises(Exception) as expected:
+                utils.assertions.Assertions(checks[num:]).check(response())
+            self.assertEqual(str(fed.exception), str(expected.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()
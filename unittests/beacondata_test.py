@@ -0,0 +1,52 @@
+"""Tests for reading and searching the beacon data files."""
+import unittest
+
+import utils.beacondata
+
+
+DATA = ['tests/testdata.csv', 'tests/testdata_mate.csv']
+
+
+def search(**query):
+    """Search the test data."""
+    index = utils.beacondata.VariantIndex.from_files(DATA)
+    return index.search(utils.beacondata.Query(assemblyId='GRCh38', **query))
+
+
+class TestBeaconData(unittest.TestCase):
+    """Test the variant index."""
+
+    def test_read_rows(self):
+        """Test that the values get the right types."""
+        row = next(utils.beacondata.read_rows(DATA[0]))
+        self.assertEqual(row['start'], 17302971)
+        self.assertIsNone(row['mateName'])
+
+    def test_precise(self):
+        """Test queries with start, and with start and end."""
+        self.assertEqual(len(search(referenceName='22', start=16050074, referenceBases='A', alternateBases='G')), 1)
+        self.assertEqual(len(search(referenceName='22', start=17300407, end=17300409, referenceBases='A', alternateBases='G')), 0)
+        self.assertEqual(len(search(referenceName='22', start=16050074, referenceBases='C')), 0)
+        # no end in the data, the end of the reference bases is used
+        hits = search(referenceName='22', start=16577043, end=16577045, referenceBases='TG', variantType='SNP')
+        self.assertEqual(len(hits), 3)
+        hits = search(referenceName='22', start=16577043, referenceBases='TG', variantType='SNP',
+                      datasetIds=['GRCh38:beacon_test2:2030-01-01'])
+        self.assertEqual(len(hits), 1)
+
+    def test_range(self):
+        """Test queries with startMin, startMax, endMin and endMax."""
+        hits = search(referenceName='22', startMin=17000000, startMax=17400000, endMin=0, endMax=17302972,
+                      referenceBases='N', alternateBases='N')
+        self.assertEqual(sorted(hit['start'] for hit in hits), [17300407, 17302971])
+
+    def test_mates(self):
+        """Test that breakends are found from both chromosomes."""
+        self.assertEqual(len(search(referenceName='2', mateName='13', start=321680, end=123459,
+                                    referenceBases='N', variantType='BND')), 2)
+        self.assertEqual(len(search(referenceName='13', mateName='2', start=123459, end=321680,
+                                    referenceBases='A', variantType='BND')), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+"""Tests for comparing beacons."""
+import argparse
+import types
+import unittest
+from unittest.mock import patch
+
+import config.config
+import utils.benchmark
+
+
+TESTS = 'tests/test-v101-variants.yaml'
+ARGS = {'test': [TESTS], 'generate': None, 'generate_limit': 0, 'mock_data': None, 'only_structure': False,
+        'workers': 1, 'pool_size': 2, 'timeout': 5, 'one_based': False, 'cache_responses': False, 'replay': None,
+        'record': None, 'stream_responses': None, 'version': 'v1.0.1', 'offline': True, 'no_openapi': True,
+        'no_json': True, 'validation_processes': 0, 'repeat': 2}
+
+
+class TestBenchmark(unittest.TestCase):
+    """Test running the tests against several hosts, and the comparison."""
+
+    def test_compare_mock_hosts(self):
+        """Test that the results and latencies of each host and test are collected and printed."""
+        c_args = argparse.Namespace(**ARGS, compare_hosts=[config.config.MOCK_HOST, config.config.MOCK_HOST])
+        with self.assertLogs(level='INFO') as logs:
+            reports = utils.benchmark.run_hosts(c_args)
+        self.assertEqual(len(reports), 2)
+        for report in reports:
+            self.assertIsNone(report['failure'])
+            self.assertTrue(report['url'].startswith('http://127.0.0.1:'))
+            self.assertEqual(report['warnings'], 0)
+            self.assertTrue(report['tests'])
+            for test in report['tests']:
+                self.assertEqual(test['status'], 'passed', test['name'])
+                self.assertEqual(len(test['latencies']), 2)
+        self.assertEqual([test['name'] for test in reports[0]['tests']], [test['name'] for test in reports[1]['tests']])
+        output = '\n'.join(logs.output)
+        self.assertIn('Host comparison', output)
+        self.assertIn(reports[0]['tests'][0]['name'], output)
+        # both hosts give the same results
+        self.assertNotIn('WARNING', output)
+
+    def test_repeated_warnings(self):
+        """Test that the specification errors are counted once, not once per repeat."""
+        settings = types.SimpleNamespace(host='http://beacon', tests=[{'name': 'a'}], generated=iter([{'name': 'b'}]),
+                                         workers=1, warnings=[], set_args=lambda c_args: None)
+
+        def run_tests(tests, workers):
+            settings.warnings += ['error', 'error']
+            return [types.SimpleNamespace(status='passed', latency=0.1) for _ in tests]
+
+        with patch('utils.setup.Settings', return_value=settings), patch('utils.parallel.run_tests', run_tests), \
+                patch('coloredlogs.install'):
+            report = utils.benchmark.run_host(argparse.Namespace(**{**ARGS, 'repeat': 3}), 'beacon')
+        self.assertEqual((report['warnings'], report['unique_warnings']), (2, 1))
+        # the generated tests are run in each repeat as well
+        self.assertEqual([(test['name'], len(test['latencies'])) for test in report['tests']], [('a', 3), ('b', 3)])
+
+    def test_compare_generated(self):
+        """Test that generated tests are run against each host."""
+        c_args = argparse.Namespace(**{**ARGS, 'test': None, 'generate': ['tests/testdata.csv'], 'generate_limit': 3, 'repeat': 1},
+                                    compare_hosts=[config.config.MOCK_HOST])
+        with self.assertLogs(level='INFO'):
+            reports = utils.benchmark.run_hosts(c_args)
+        self.assertEqual([test['status'] for test in reports[0]['tests']], ['passed'] * 3)
+
+    def test_print_differences(self):
+        """Test that tests with different results on the hosts are marked, and failed hosts are reported."""
+        reports = [{'host': host, 'failure': None, 'wall_time': 1.0, 'warnings': 0, 'unique_warnings': 0,
+                    'tests': [{'name': 'a', 'status': status, 'latencies': [0.1]}]}
+                   for host, status in [('one', 'passed'), ('two', 'failed')]]
+        reports.append({'host': 'three', 'failure': 'Could not set up the tests', 'tests': []})
+        with self.assertLogs(level='INFO') as logs:
+            utils.benchmark.print_comparison(reports)
+        self.assertIn('ERROR:root:  three        Could not set up the tests', logs.output)
+        self.assertTrue(any(line.startswith('WARNING:root:*   1 a ') for line in logs.output))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+"""Tests for recording and replaying beacon responses."""
+import os
+import tempfile
+import types
+import unittest
+
+import utils.cassette
+import utils.errors as err
+
+
+def request(query):
+    """Return a fake request with the given query parameters."""
+    return types.SimpleNamespace(cache_key=lambda: ('http://host', 'query', tuple(sorted(query.items()))),
+                                 url=lambda: 'http://host/query')
+
+
+class TestCassette(unittest.TestCase):
+    """Test that recorded responses are replayed as they were."""
+
+    def test_record_replay(self):
+        """Test a text and a binary response, and a missing one."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'cassette.gz')
+            recorder = utils.cassette.Recorder(path, 'http://host')
+            for query, body in [({'start': '1'}, b'{"exists": true}'), ({'start': '2'}, b'\xff\x00')]:
+                response = types.SimpleNamespace(status_code=200, mimetype='application/json', error=False, data=body)
+                recorder.add(request(query), response)
+            # only the first response is kept
+            recorder.add(request({'start': '1'}), types.SimpleNamespace(status_code=500, mimetype='', error=True, data=b''))
+            recorder.close()
+
+            player = utils.cassette.Player(path)
+            self.assertEqual(player.host, 'http://host')
+            for query, body in [({'start': '1'}, b'{"exists": true}'), ({'start': '2'}, b'\xff\x00')]:
+                response = types.SimpleNamespace()
+                player.play(request(query), response)
+                self.assertEqual((response.status_code, response.error, response.data), (200, False, body))
+            with self.assertRaises(err.BeaconTestError):
+                player.play(request({'start': '3'}), types.SimpleNamespace())
+
+
+if __name__ == '__main__':
+    unittest.main()
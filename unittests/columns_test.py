@@ -0,0 +1,87 @@
+"""Tests for the beacon data files in columns."""
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import utils.beacondata
+import utils.columns
+import utils.generate
+
+
+DATA = ['tests/testdata.csv', 'tests/testdata_mate.csv']
+ROWS = [{'referenceName': '1', 'referenceBases': 'A', 'alternateBases': 'G', 'assemblyId': 'GRCh38', 'start': 100, 'end': 101,
+         'datasetId': 'first', 'variantCount': 2, 'callCount': 10, 'sampleCount': 5, 'frequency': 0.2},
+        {'referenceName': '1', 'referenceBases': 'A', 'alternateBases': 'G', 'assemblyId': 'GRCh38', 'start': 100, 'end': 101,
+         'datasetId': 'second', 'variantCount': 3, 'callCount': 20, 'sampleCount': None, 'frequency': 0.15},
+        {'referenceName': '1', 'referenceBases': 'C', 'alternateBases': 'T', 'assemblyId': 'GRCh38', 'start': 200, 'end': 201,
+         'datasetId': 'first', 'variantCount': 1, 'callCount': 4, 'sampleCount': 1, 'frequency': 0.25}]
+
+
+def query(**params):
+    """Make a query on GRCh38."""
+    return utils.beacondata.Query(assemblyId='GRCh38', **params)
+
+
+@unittest.skipIf(utils.columns.numpy is None, 'numpy is not installed')
+class TestColumns(unittest.TestCase):
+    """Test the hits and counts of queries."""
+
+    def test_same_hits(self):
+        """Test that the same variants are found as by the variant index."""
+        columns = utils.columns.VariantColumns.from_files(DATA)
+        index = utils.beacondata.VariantIndex.from_files(DATA)
+        queries = [utils.beacondata.make_query(test['query']) for test in utils.generate.generate_tests(DATA)]
+        queries += [query(referenceName='2', mateName='13', start=321680, end=123459, referenceBases='N', variantType='BND'),
+                    query(referenceName='13', mateName='2', start=123459, end=321680, referenceBases='A', variantType='BND'),
+                    query(referenceName='22', startMin=17000000, startMax=17400000, endMin=0, endMax=17302972,
+                          referenceBases='N', alternateBases='N')]
+        # the variant index finds both ends of a breakend, count them once
+        rows = {id(end): id(variant['pair'][0]) for variants in index.variants.values() for variant in variants
+                for end in variant['pair']}
+        for query_ in queries:
+            hits = {rows[id(hit)] for hit in index.search(query_)}
+            self.assertEqual(len(columns.hits(query_)), len(hits), query_)
+
+    def test_counts(self):
+        """Test that the counts of the matching variants are summed."""
+        columns = utils.columns.VariantColumns(ROWS)
+        self.assertEqual(columns.counts(query(referenceName='1', start=100, referenceBases='A', alternateBases='G')),
+                         {'variantCount': 5, 'callCount': 30, 'sampleCount': 5, 'frequency': 5 / 30})
+        self.assertEqual(columns.counts(query(referenceName='1', start=200, referenceBases='C', alternateBases='T')),
+                         {'variantCount': 1, 'callCount': 4, 'sampleCount': 1, 'frequency': 0.25})
+        self.assertEqual(columns.counts(query(referenceName='2', start=100, referenceBases='A', alternateBases='G')),
+                         {'variantCount': None, 'callCount': None, 'sampleCount': None, 'frequency': None})
+
+    def test_check_counts(self):
+        """Test that counts that don't match the data file are reported."""
+        columns = ['referenceName', 'referenceBases', 'alternateBases', 'assemblyId', 'start', 'end', 'datasetId',
+                   'variantCount', 'callCount', 'sampleCount', 'frequency']
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with open(os.path.join(tmpdir, 'data.csv'), 'w') as fileh:
+                fileh.write(f'# {",".join(columns)}\n')
+                for row in ROWS:
+                    fileh.write(','.join(str(row[column]) for column in columns) + '\n')
+            tests = [{'name': 'ok', 'beacondata': 'data.csv', 'counts': {'sampleCount': 5, 'callCount': None},
+                      'query': {'referenceName': '1', 'start': 100, 'referenceBases': 'A', 'alternateBases': 'G', 'assemblyId': 'GRCh38'}},
+                     {'name': 'wrong', 'beacondata': 'data.csv', 'counts': {'variantCount': 2},
+                      'query': {'referenceName': '1', 'start': 100, 'referenceBases': 'A', 'alternateBases': 'G', 'assemblyId': 'GRCh38'}}]
+            messages = utils.columns.check_counts(os.path.join(tmpdir, 'test.yaml'), tests)
+        self.assertEqual(len(messages), 1)
+        self.assertIn('wrong: variantCount is 2, but 5', messages[0])
+
+
+class TestWithoutNumpy(unittest.TestCase):
+    """Test that the counts are not silently left unchecked."""
+
+    def test_no_numpy(self):
+        """Test that tests with counts fail to validate without numpy."""
+        tests = [{'name': 'counted', 'beacondata': 'data.csv', 'counts': {'variantCount': 2}, 'query': {'referenceName': '1'}}]
+        with patch('utils.columns.numpy', None):
+            messages = utils.columns.check_counts('test.yaml', tests)
+        self.assertEqual(len(messages), 1)
+        self.assertIn('numpy is not installed', messages[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
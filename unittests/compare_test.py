@@ -1,4 +1,5 @@
 """Tests for the comparisons of the Beacon responses."""
+import random
 import unittest
 from unittest.mock import patch
 
@@ -93,6 +94,26 @@ class TestComparisons(unittest.TestCase):
         res = utils.compare.find_matching_object(gold, obj, 'key')
         self.assertEqual(gold, res)
 
+    def test_index_same_as_sorting(self):
+        """Test that the index finds the same objects as sorting all objects by their number of mismatches."""
+        def by_sorting(gold, resp, key):
+            ids = utils.compare.get_sort_ids(gold, key)
+            scored = [(utils.compare.compare_identifiers(ids, utils.compare.get_sort_ids(obj, key)), obj)
+                      for obj in resp[key]]
+            return sorted(scored, key=lambda x: x[0])[0][1]
+
+        rand = random.Random(1)
+        resp = {'datasetAlleleResponses': [{'datasetId': rand.choice('abc'), 'referenceBases': rand.choice('AC'),
+                                            'variantType': rand.choice(['SNP', None]), 'num': num}
+                                           for num in range(50)]}
+        index = utils.compare.ResponseIndex(resp)
+        for _ in range(100):
+            gold = {'datasetId': rand.choice('abcd'), 'referenceBases': rand.choice('ACG')}
+            if rand.random() < 0.5:
+                gold['variantType'] = rand.choice(['SNP', 'MNP'])
+            self.assertIs(index.find(gold, 'datasetAlleleResponses'), by_sorting(gold, resp, 'datasetAlleleResponses'))
+        self.assertEqual(list(index.indexes), ['datasetAlleleResponses'])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,66 @@
+"""Tests for the keep-alive connection pool."""
+import http.server
+import threading
+import unittest
+import urllib.error
+
+import utils.connection_pool
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    """Answer with the port of the client, to tell connections apart."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        """Answer 404 for /missing, 200 otherwise."""
+        body = str(self.client_address[1]).encode()
+        self.send_response(404 if self.path == '/missing' else 200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        """Be quiet."""
+
+
+class TestConnectionPool(unittest.TestCase):
+    """Test the connection pool against a local server."""
+
+    def setUp(self):
+        """Start a server."""
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, args=(0.01,), daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        self.pool = utils.connection_pool.ConnectionPool(size=2, timeout=5)
+
+    def tearDown(self):
+        """Stop the server."""
+        self.pool.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_reuse_connection(self):
+        """Test that consecutive requests use the same connection."""
+        first = self.pool.urlopen(self.url + '/query?a=1')
+        second = self.pool.urlopen(self.url + '/')
+        self.assertEqual(first.getcode(), 200)
+        self.assertEqual(first.info().get_content_type(), 'application/json')
+        self.assertEqual(first.read(), second.read())
+
+    def test_http_error(self):
+        """Test that error responses are raised as HTTPErrors, with the body readable."""
+        with self.assertRaises(urllib.error.HTTPError) as error:
+            self.pool.urlopen(self.url + '/missing')
+        self.assertEqual(error.exception.getcode(), 404)
+        self.assertTrue(error.exception.read())
+
+    def test_bad_url(self):
+        """Test that bad urls are reported as by urllib."""
+        with self.assertRaises(ValueError):
+            self.pool.urlopen('localhost/query')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+"""Tests for exporting the data of the tests."""
+import gzip
+import os
+import tempfile
+import unittest
+
+import utils.export
+
+
+TESTS = ['tests/test-v101-variants.yaml', 'tests/test-v101-datasets.yaml', 'tests/test-v110-mate.yaml']
+
+
+class TestExport(unittest.TestCase):
+    """Test the csv export."""
+
+    def test_unique_lines(self):
+        """Test that repeated lines are left out, and that the order is kept."""
+        self.assertEqual(list(utils.export.unique_lines(['b', 'a', 'b', 'c', 'a'])), ['b', 'a', 'c'])
+
+    def test_export_gzip(self):
+        """Test that the chosen columns of each variant are written once, in the order of the data files."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            output = os.path.join(tmpdir, 'data.tsv.gz')
+            utils.export.export_csv_testdata(TESTS, output, ['referenceName', 'start', 'datasetId'])
+            with gzip.open(output, 'rt') as fileh:
+                lines = fileh.read().splitlines()
+        self.assertEqual(lines[0], '# referenceName\tstart\tdatasetId')
+        self.assertEqual(lines[1], '22\t17302971\tGRCh38:beacon_test:2030-01-01')
+        self.assertEqual(lines[-1], '2\t321680\tGRCh38:beacon_test:2030-01-01')
+        self.assertEqual(len(lines), len(set(lines)))
+
+
+if __name__ == '__main__':
+    unittest.main()
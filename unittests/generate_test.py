@@ -0,0 +1,52 @@
+"""Tests for generating tests from beacon data files."""
+import unittest
+
+import utils.beacondata
+import utils.generate
+import utils.jsonschemas
+
+
+DATA = ['tests/testdata.csv', 'tests/testdata_mate.csv']
+ROW = {'referenceName': '1', 'referenceBases': 'A', 'alternateBases': 'G', 'variantType': 'SNP',
+       'assemblyId': 'GRCh38', 'start': 100, 'end': 101, 'mateName': None, 'datasetId': 'GRCh38:test:2030-01-01'}
+
+
+class TestGenerate(unittest.TestCase):
+    """Test the generated tests and their expected results."""
+
+    def test_valid_tests(self):
+        """Test that the generated tests follow the test schema."""
+        validator = utils.jsonschemas.test_validator('tests/schema.yaml')
+        tests = list(utils.generate.generate_tests(DATA))
+        self.assertTrue(tests)
+        validator.validate(tests)
+        self.assertEqual(len({test['name'] for test in tests}), len(tests))
+
+    def test_limit(self):
+        """Test that no more than `limit` tests are made."""
+        self.assertEqual(len(list(utils.generate.generate_tests(DATA, limit=3))), 3)
+
+    def test_expected_results(self):
+        """Test that a variant at the next position is expected to be found."""
+        index = utils.beacondata.VariantIndex([ROW, {**ROW, 'start': 101, 'end': 102, 'datasetId': 'GRCh38:other:2030-01-01'}])
+        tests = {test['name'].split(':')[0]: test for test in utils.generate.row_tests(index, 'data.csv', 1, ROW)}
+        self.assertEqual(sorted(tests), sorted(f'generated_{kind}' for kind in utils.generate.KINDS))
+        self.assertIn({'property': 'exists', 'assert': 'is_true'}, tests['generated_exact']['results'])
+        self.assertEqual(tests['generated_wrong_allele']['results'], [{'property': 'exists', 'assert': 'is_false'}])
+        self.assertEqual(tests['generated_missing_dataset']['results'], [{'property': 'exists', 'assert': 'is_false'}])
+        # the query is limited to the dataset of the row, where there is no variant at the next position
+        self.assertEqual(tests['generated_off_by_one']['results'], [{'property': 'exists', 'assert': 'is_false'}])
+        index = utils.beacondata.VariantIndex([ROW, {**ROW, 'start': 101, 'end': 102}])
+        tests = {test['name'].split(':')[0]: test for test in utils.generate.row_tests(index, 'data.csv', 1, ROW)}
+        self.assertIn({'property': 'datasetAlleleResponses', 'assert': 'contains',
+                       'data': {'datasetId': ROW['datasetId'], 'exists': True}}, tests['generated_off_by_one']['results'])
+
+    def test_skip_breakends(self):
+        """Test that no tests are made for breakends."""
+        row = {**ROW, 'alternateBases': None, 'variantType': 'BND', 'mateName': '2'}
+        index = utils.beacondata.VariantIndex([row])
+        self.assertEqual(list(utils.generate.row_tests(index, 'data.csv', 1, row)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
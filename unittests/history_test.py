@@ -0,0 +1,69 @@
+"""Tests for the history of the test runs."""
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import utils.history
+import utils.results
+
+
+def make_test(name):
+    """Return a test definition."""
+    return {'name': name, 'query': {'start': len(name)}}
+
+
+def make_result(test, status, duration):
+    """Return a result of a test."""
+    result = utils.results.TestResult(test)
+    result.status = status
+    result.duration = duration
+    return result
+
+
+class TestHistory(unittest.TestCase):
+    """Test the order of the tests."""
+
+    def test_prioritize(self):
+        """Test that failing tests come first, then new ones, then the fastest passing ones."""
+        slow, fast, failing, new = [make_test(name) for name in ['slow', 'fast', 'failing', 'new_test']]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            history = utils.history.History(tmpdir, 'host')
+            history.update(slow, make_result(slow, 'passed', 2.0))
+            history.update(fast, make_result(fast, 'passed', 0.1))
+            history.update(failing, make_result(failing, 'failed', 5.0))
+            history.update(new, make_result(new, 'skipped', 0))
+            history.save()
+
+            history = utils.history.History(tmpdir, 'host')
+            self.assertEqual(history.prioritize([slow, fast, failing, new]), [failing, new, fast, slow])
+            self.assertEqual(history.duration(new), 2.0)
+            self.assertEqual(utils.history.History(tmpdir, 'other').prioritize([slow, fast]), [slow, fast])
+
+    def test_moving_average(self):
+        """Test that old failures count less and less."""
+        test = make_test('test')
+        with tempfile.TemporaryDirectory() as tmpdir:
+            history = utils.history.History(tmpdir, 'host')
+            history.update(test, make_result(test, 'failed', 1.0))
+            for _ in range(3):
+                history.update(test, make_result(test, 'passed', 1.0))
+            self.assertLess(history.failure_rate(test), 0.5)
+            self.assertGreater(history.failure_rate(test), 0)
+
+    def test_median(self):
+        """Test that the median duration of tests without history is found once, and again after changes."""
+        tests = [make_test(f'test{num}') for num in range(5)]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            history = utils.history.History(tmpdir, 'host')
+            self.assertEqual(history.duration(tests[0]), 0.0)
+            for num, test in enumerate(tests[:3]):
+                history.update(test, make_result(test, 'passed', float(num)))
+            with patch('utils.history.sorted', create=True, wraps=sorted) as sort:
+                self.assertEqual([history.duration(test) for test in tests], [0.0, 1.0, 2.0, 1.0, 1.0])
+            sort.assert_called_once()
+            history.update(tests[3], make_result(tests[3], 'passed', 3.0))
+            self.assertEqual(history.duration(tests[4]), 2.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+"""Tests for parsing responses while they are read."""
+import json
+import unittest
+from unittest.mock import patch
+
+import utils.json_stream
+
+
+RESPONSE = {'beaconId': 'test', 'exists': True, 'alleleRequest': {'referenceName': '22', 'start': 16050074},
+            'datasetAlleleResponses': [{'datasetId': f'd{num}', 'note': 'å "quoted"', 'frequency': num / 10}
+                                       for num in range(10)],
+            'error': None}
+
+
+def feed(stream, body, size):
+    """Give the body to the stream in chunks of `size` bytes, return what `close` returns."""
+    for pos in range(0, len(body), size):
+        stream.feed(body[pos:pos + size])
+    return stream.close()
+
+
+class TestListStream(unittest.TestCase):
+    """Test the incremental parser."""
+
+    def test_chunks(self):
+        """Test that the object and the items are the same however the body is split."""
+        body = json.dumps(RESPONSE, ensure_ascii=False).encode('utf-8')
+        for size in [1, 2, 7, 100, len(body)]:
+            items = []
+            stream = utils.json_stream.ListStream('datasetAlleleResponses', items.append)
+            data, parsed = feed(stream, body, size)
+            self.assertEqual(parsed, RESPONSE)
+            self.assertEqual(items, RESPONSE['datasetAlleleResponses'])
+            self.assertEqual(data, body)
+            self.assertTrue(stream.done)
+
+    def test_limit(self):
+        """Test that big bodies are only kept parsed."""
+        body = json.dumps(RESPONSE).encode('utf-8')
+        data, parsed = feed(utils.json_stream.ListStream('datasetAlleleResponses', limit=100), body, 10)
+        self.assertIsNone(data)
+        self.assertEqual(parsed, RESPONSE)
+
+    def test_big_value(self):
+        """Test that a value that spans many chunks is parsed a few times, not once per chunk."""
+        response = {**RESPONSE, 'info': {f'key{num}': 'value ' * 10 for num in range(1000)}}
+        body = json.dumps(response).encode('utf-8')
+        stream = utils.json_stream.ListStream('datasetAlleleResponses')
+        with patch('utils.json_stream.DECODER.raw_decode', wraps=utils.json_stream.DECODER.raw_decode) as raw_decode:
+            data, parsed = feed(stream, body, 100)
+        self.assertEqual(parsed, response)
+        self.assertLess(raw_decode.call_count, 100)
+        # a value bigger than the limit is noticed before the whole of it has arrived
+        stream = utils.json_stream.ListStream('datasetAlleleResponses', limit=1000)
+        for pos in range(0, 3000, 100):
+            stream.feed(body[pos:pos + 100])
+        self.assertIsNotNone(stream.error)
+
+    def test_invalid(self):
+        """Test that invalid json and other values than objects are not parsed, but kept."""
+        for body in [b'[1, 2]', b'{"a": 1 "b": 2}', b'{"a": 1,}', b'{"a": ', b'{"datasetAlleleResponses": [1,]}', b'{} {}', b'<html>']:
+            stream = utils.json_stream.ListStream('datasetAlleleResponses')
+            data, parsed = feed(stream, body, 3)
+            self.assertEqual(data, body)
+            self.assertIsNone(parsed)
+            self.assertFalse(stream.done)
+
+
+if __name__ == '__main__':
+    unittest.main()
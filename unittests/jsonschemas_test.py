@@ -0,0 +1,65 @@
+"""Tests for loading and validating test files."""
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import jsonschema
+
+import utils.jsonschemas
+
+
+class TestLoadTests(unittest.TestCase):
+    """Test the cache of validated test files."""
+
+    def setUp(self):
+        """Copy a test file to a temporary directory."""
+        self.tmpdir = tempfile.mkdtemp()
+        self.testfile = os.path.join(self.tmpdir, 'test.yaml')
+        shutil.copy('tests/test-v101-variants.yaml', self.testfile)
+        utils.jsonschemas.TEST_SUITES.clear()
+        self.cache_dir = patch('utils.jsonschemas.SUITE_CACHE_DIR', os.path.join(self.tmpdir, 'cache', 'suites'))
+        self.cache_dir.start()
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        self.cache_dir.stop()
+        shutil.rmtree(self.tmpdir)
+
+    def test_cached_tests(self):
+        """Test that a file is only parsed once, and that each call gives a new copy of the tests."""
+        first = utils.jsonschemas.load_and_validate_test(self.testfile)
+        # the tests are cached as json in the cache directory, not next to the test file
+        self.assertEqual(sorted(os.listdir(self.tmpdir)), ['cache', 'test.yaml'])
+        self.assertEqual(len(os.listdir(os.path.join(self.tmpdir, 'cache', 'suites'))), 1)
+        utils.jsonschemas.TEST_SUITES.clear()
+        with patch('yaml.load') as yaml_load:
+            second = utils.jsonschemas.load_and_validate_test(self.testfile)
+            self.assertEqual(utils.jsonschemas.validate_test(self.testfile), [])
+        yaml_load.assert_not_called()
+        self.assertEqual(first, second)
+        self.assertIsNot(first[0], second[0])
+
+    def test_changed_file(self):
+        """Test that changes to a test file are noticed."""
+        utils.jsonschemas.load_and_validate_test(self.testfile)
+        with open(self.testfile, 'a') as fileh:
+            fileh.write('- name: bad\n')
+        with self.assertLogs(level='ERROR'), self.assertRaises(jsonschema.ValidationError):
+            utils.jsonschemas.load_and_validate_test(self.testfile)
+        self.assertTrue(utils.jsonschemas.validate_test(self.testfile))
+
+    def test_not_json(self):
+        """Test that tests that json would change are not cached."""
+        with open(self.testfile, 'a') as fileh:
+            fileh.write('- name: dated\n  descr: A date, not a string.\n  date: 2030-01-01\n'
+                        '  results:\n    - property: exists\n      assert: is_true\n')
+        with patch('utils.jsonschemas.test_validator'):
+            tests = utils.jsonschemas.load_and_validate_test(self.testfile)
+        self.assertEqual(str(tests[-1]['date']), '2030-01-01')
+        self.assertFalse(os.path.exists(os.path.join(self.tmpdir, 'cache', 'suites')))
+
+
+if __name__ == '__main__':
+    unittest.main()
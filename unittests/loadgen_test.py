@@ -0,0 +1,103 @@
+"""Tests for sending the queries of the tests as load."""
+import argparse
+import types
+import unittest
+
+import utils.beacondata
+import utils.connection_pool
+import utils.loadgen
+import utils.mock_beacon
+
+
+QUERY = {'referenceName': '22', 'start': 16050074, 'referenceBases': 'A', 'alternateBases': 'G',
+         'assemblyId': 'GRCh38', 'includeDatasetResponses': None}
+TESTS = [{'name': 'query', 'query': QUERY}, {'name': 'info'}, {'name': 'skipped', 'query': QUERY, 'skip': True}]
+
+
+def report(statuses, target=10):
+    """Make a report of one rate, with a sample per status."""
+    samples = [utils.loadgen.Sample(lag=0.0001, latency=0.01, status=status) for status in statuses]
+    return {'target': target, 'sent': len(samples), 'send_time': 1.0, 'elapsed': 1.0, 'samples': samples}
+
+
+class TestLoad(unittest.TestCase):
+    """Test sending queries to the mock beacon, and the reports."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Serve the test data."""
+        index = utils.beacondata.VariantIndex.from_files(['tests/testdata.csv'])
+        cls.server = utils.mock_beacon.MockServer(utils.mock_beacon.MockBeacon(index)).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Stop the server."""
+        cls.server.stop()
+
+    def test_collect_queries(self):
+        """Test that skipped tests are left out, and null values are removed from the queries."""
+        queries = utils.loadgen.collect_queries(TESTS)
+        self.assertEqual(queries, [('query', {key: val for key, val in QUERY.items() if val is not None}), ('/', {})])
+
+    def test_run_rate(self):
+        """Test that all queries are sent, in turns."""
+        queries = utils.loadgen.collect_queries(TESTS)
+        result = utils.loadgen.run_rate(self.server.url, queries, 200, 5, 2)
+        self.assertEqual(result['sent'], 5)
+        self.assertEqual([sample.status for sample in result['samples']], [200] * 5)
+        self.assertTrue(all(sample.latency >= sample.lag for sample in result['samples']))
+
+    def test_run_load(self):
+        """Test that at least one query is sent per rate, also if the duration is too short for it."""
+        settings = types.SimpleNamespace(tests=TESTS, generated=None, host=self.server.url,
+                                         pool=utils.connection_pool.ConnectionPool(2, 5))
+        with self.assertLogs(level='INFO'):
+            reports = utils.loadgen.run_load(settings, [1, 2], duration=0.1, concurrency=2)
+        self.assertEqual([len(result['samples']) for result in reports], [1, 1])
+        settings.pool.close()
+
+    def test_run_load_generated(self):
+        """Test that the queries of generated tests are sent as well."""
+        settings = types.SimpleNamespace(tests=[], generated=iter(TESTS[:1]), host=self.server.url,
+                                         pool=utils.connection_pool.ConnectionPool(2, 5))
+        with self.assertLogs(level='INFO'):
+            reports = utils.loadgen.run_load(settings, [100], count=3, concurrency=2)
+        self.assertEqual([sample.status for sample in reports[0]['samples']], [200] * 3)
+        settings.pool.close()
+
+    def test_send_no_connection(self):
+        """Test that a beacon that can't be reached gives a sample, not an error."""
+        with self.assertLogs(level='ERROR'):
+            sample = utils.loadgen.send('http://127.0.0.1:1', '/', {}, 0)
+        self.assertEqual(sample.status, 'no connection')
+
+    def test_report_without_samples(self):
+        """Test that a rate without queries is reported, and counts as saturated."""
+        empty = report([])
+        with self.assertLogs(level='WARNING') as logs:
+            utils.loadgen.print_report(empty)
+            utils.loadgen.print_saturation([empty])
+        self.assertIn('no queries were sent', '\n'.join(logs.output))
+        self.assertTrue(utils.loadgen.saturated(empty))
+
+    def test_report_errors(self):
+        """Test that failed queries are counted per status."""
+        with self.assertLogs(level='INFO') as logs:
+            utils.loadgen.print_report(report([200, 500, 'no connection', 200]))
+        output = '\n'.join(logs.output)
+        self.assertIn('WARNING:root:  Errors:', output)
+        self.assertIn('50.0%', output)
+        self.assertIn('no connection', output)
+        self.assertFalse(utils.loadgen.saturated(report([200] * 10)))
+        self.assertTrue(utils.loadgen.saturated(report([200] * 5)))
+
+    def test_parse_rate(self):
+        """Test that only positive rates are accepted."""
+        self.assertEqual(utils.loadgen.parse_rate('2.5'), 2.5)
+        for rate in ['0', '-1', 'x', 'nan', 'inf']:
+            with self.assertRaises(argparse.ArgumentTypeError):
+                utils.loadgen.parse_rate(rate)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+"""Tests for the mock beacon."""
+import http.client
+import json
+import unittest
+
+import utils.beacondata
+import utils.mock_beacon
+
+
+class TestMockBeacon(unittest.TestCase):
+    """Test the mock beacon over http."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Serve the test data."""
+        index = utils.beacondata.VariantIndex.from_files(['tests/testdata.csv'])
+        cls.server = utils.mock_beacon.MockServer(utils.mock_beacon.MockBeacon(index)).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Stop the server."""
+        cls.server.stop()
+
+    def get(self, conn, target):
+        """Send a request, return the status and the decoded body."""
+        conn.request('GET', target)
+        response = conn.getresponse()
+        return response.status, json.loads(response.read())
+
+    def test_requests(self):
+        """Test the info endpoint, a query and a bad query on one connection."""
+        conn = http.client.HTTPConnection('127.0.0.1', self.server.port, timeout=5)
+        status, info = self.get(conn, '/')
+        self.assertEqual(status, 200)
+        self.assertEqual(sorted(dataset['id'] for dataset in info['datasets']),
+                         ['GRCh38:beacon_test2:2030-01-01', 'GRCh38:beacon_test:2030-01-01'])
+
+        status, response = self.get(conn, '/query?referenceName=22&start=16577043&referenceBases=TG&alternateBases=AG'
+                                          '&assemblyId=GRCh38&includeDatasetResponses=ALL'
+                                          '&datasetIds=GRCh38:beacon_test2:2030-01-01')
+        self.assertEqual(status, 200)
+        self.assertTrue(response['exists'])
+        self.assertEqual([(dataset['datasetId'], dataset['exists']) for dataset in response['datasetAlleleResponses']],
+                         [('GRCh38:beacon_test2:2030-01-01', True)])
+
+        status, response = self.get(conn, '/query?referenceName=22&start=1&assemblyId=GRCh38&alternateBases=A')
+        self.assertEqual(status, 400)
+        self.assertEqual(response['error']['errorCode'], 400)
+        conn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
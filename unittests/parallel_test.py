@@ -0,0 +1,40 @@
+"""Tests for running tests concurrently."""
+import logging
+import time
+import unittest
+from unittest.mock import patch
+
+import utils.errors as err
+import utils.parallel
+
+
+def slow_test(test):
+    """Log the name of the test, the first tests finish last."""
+    time.sleep(0.01 * (5 - test['num']))
+    logging.warning(test['name'])
+    if test.get('fail'):
+        raise err.BeaconTestError()
+
+
+class TestParallel(unittest.TestCase):
+    """Test the concurrent test runner."""
+
+    @patch('utils.run_test.run_test', side_effect=slow_test)
+    def test_output_in_order(self, _run_test):
+        """Test that the output of the tests is logged in the order of the tests."""
+        tests = [{'name': f'test{num}', 'num': num} for num in range(5)]
+        with self.assertLogs(level='WARNING') as logs:
+            list(utils.parallel.run_tests(tests, workers=3))
+        self.assertEqual([rec.getMessage() for rec in logs.records], [test['name'] for test in tests])
+
+    @patch('utils.run_test.run_test', side_effect=slow_test)
+    def test_stop_on_error(self, _run_test):
+        """Test that a BeaconTestError stops the run after the output of the failing test is logged."""
+        tests = [{'name': f'test{num}', 'num': num, 'fail': num == 1} for num in range(5)]
+        with self.assertLogs(level='WARNING') as logs, self.assertRaises(err.BeaconTestError):
+            list(utils.parallel.run_tests(tests, workers=2))
+        self.assertEqual([rec.getMessage() for rec in logs.records][:2], ['test0', 'test1'])
+
+
+if __name__ == '__main__':
+    unittest.main()
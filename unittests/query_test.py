@@ -2,7 +2,11 @@
 import unittest
 from unittest.mock import patch
 
+import jsonschema
+
 import utils.beacon_query
+import utils.json_stream
+import utils.jsonschemas
 
 
 JSON_RESPONSE = {
@@ -30,6 +34,9 @@ JSON_RESPONSE = {
 
 SETTINGS = {'return_value.use_json_schemas': True, 'return_value.openapi': False,
             'return_value.json_schemas': {'response': JSON_RESPONSE},
+            'return_value.validators': {},
+            'return_value.response_cache': None,
+            'return_value.validation_pool': None,
             'return_value.start_pos': 1}
 
 
@@ -59,7 +66,7 @@ class TestQueries(unittest.TestCase):
             utils.beacon_query.make_query(code=200)
 
     @patch('utils.setup.Settings', **SETTINGS)
-    @patch('utils.beacon_query.BeaconResponse', data='{"bad": "value"}')
+    @patch('utils.beacon_query.BeaconResponse', data='{"bad": "value"}', **{'json.return_value': {"bad": "value"}})
     @patch('logging.warning')
     def test_validate(self, warnings, resp, _setup):
         """
@@ -73,6 +80,24 @@ class TestQueries(unittest.TestCase):
         utils.beacon_query.validate(req, resp, path='', query=req)
         warnings.assert_called()
 
+    @patch('utils.setup.Settings', **SETTINGS)
+    def test_reuse_validator(self, settings):
+        """Test that the JSON schema validator is only compiled once."""
+        settings().validators = {}
+        with patch('jsonschema.Draft4Validator', wraps=jsonschema.Draft4Validator) as compiled:
+            for _ in range(2):
+                warnings = utils.jsonschemas.validate('{"bad": "value"}', 'response', settings(), path='query')
+                self.assertTrue(warnings)
+        compiled.assert_called_once()
+
+    def test_big_invalid_stream(self):
+        """Test that a big response that is not json fails the test, and does not stop the run."""
+        resp = utils.beacon_query.BeaconResponse.__new__(utils.beacon_query.BeaconResponse)
+        resp.status_code, resp.data = 502, b'<html>Bad gateway</html>' * 100
+        stream = utils.json_stream.ListStream('datasetAlleleResponses', limit=100)
+        with self.assertRaisesRegex(AssertionError, 'status code 502'):
+            resp.read_stream(stream)
+
     @patch('utils.setup.Settings', **SETTINGS)
     def test_make_offset(self, _settings):
         """Test that shifting from 0-based to 1-based positions works."""
@@ -0,0 +1,76 @@
+"""Tests for the result reporters."""
+import json
+import os
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+
+import utils.reporters
+import utils.results
+
+
+def make_results():
+    """Return a passed, a failed and a skipped result."""
+    passed = utils.results.TestResult({'name': 'passing'})
+    passed.warnings = ['OpenAPI: <bad>']
+    passed.timings = {'ttfb': 0.5}
+    failed = utils.results.TestResult({'name': 'failing # 2'})
+    failed.fail(['wrong count', 'missing "x"'])
+    skipped = utils.results.TestResult({'name': 'skipping'})
+    skipped.status = 'skipped'
+    return [passed, failed, skipped]
+
+
+class TestReporters(unittest.TestCase):
+    """Test that each reporter writes a valid report."""
+
+    def setUp(self):
+        """Make a directory for the reports."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def write(self, kind):
+        """Write a report of the example results, return its path."""
+        path = os.path.join(self.tmpdir.name, kind)
+        reporter, = utils.reporters.open_reporters([utils.reporters.parse_report(f'{kind}:{path}')])
+        for result in make_results():
+            reporter.add(result)
+        reporter.close()
+        return path
+
+    def test_jsonl(self):
+        """Test that there is one json record per line."""
+        with open(self.write('jsonl')) as fileh:
+            records = [json.loads(line) for line in fileh]
+        self.assertEqual([record['status'] for record in records], ['passed', 'failed', 'skipped'])
+        self.assertEqual(records[0]['warnings'], ['OpenAPI: <bad>'])
+        self.assertEqual(records[0]['timings'], {'ttfb': 0.5})
+        self.assertEqual(records[1]['errors'], ['wrong count', 'missing "x"'])
+
+    def test_junit(self):
+        """Test that the xml is well formed."""
+        suite = ET.parse(self.write('junit')).getroot().find('testsuite')
+        cases = suite.findall('testcase')
+        self.assertEqual(len(cases), 3)
+        self.assertEqual(cases[0].find('system-err').text, 'OpenAPI: <bad>')
+        self.assertEqual(cases[1].find('failure').get('message'), 'wrong count')
+        self.assertIsNotNone(cases[2].find('skipped'))
+
+    def test_tap(self):
+        """Test the test lines and the plan."""
+        with open(self.write('tap')) as fileh:
+            lines = fileh.read().splitlines()
+        self.assertEqual(lines[0], 'TAP version 13')
+        self.assertIn('ok 1 - passing', lines)
+        self.assertIn(r'not ok 2 - failing \# 2', lines)
+        self.assertIn('ok 3 - skipping # SKIP skipped', lines)
+        self.assertEqual(lines[-1], '1..3')
+
+    def test_bad_argument(self):
+        """Test that unknown kinds are rejected."""
+        with self.assertRaises(Exception):
+            utils.reporters.parse_report('html:out.html')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+"""Tests for the cache of beacon responses."""
+import threading
+import unittest
+
+import utils.response_cache
+
+
+class TestResponseCache(unittest.TestCase):
+    """Test that queries are sent once."""
+
+    def test_concurrent(self):
+        """Test that concurrent requests for the same key wait for the first one."""
+        cache = utils.response_cache.ResponseCache()
+        calls = []
+        started = threading.Event()
+
+        def fetch():
+            calls.append(1)
+            started.set()
+            release.wait()
+            return 'response'
+
+        release = threading.Event()
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.response('key', fetch))) for _ in range(4)]
+        threads[0].start()
+        started.wait()
+        for thread in threads[1:]:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ['response'] * 4)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual((cache.hits, cache.misses), (3, 1))
+
+    def test_errors_not_cached(self):
+        """Test that a failed request is tried again."""
+        cache = utils.response_cache.ResponseCache()
+
+        def fail():
+            raise ValueError()
+
+        with self.assertRaises(ValueError):
+            cache.response('key', fail)
+        self.assertEqual(cache.response('key', lambda: 'response'), 'response')
+
+    def test_warnings(self):
+        """Test that a response is only validated once."""
+        cache = utils.response_cache.ResponseCache()
+        cache.response('key', lambda: 'response')
+        validated = []
+        for _ in range(2):
+            self.assertEqual(cache.warnings('key', lambda: validated.append(1) or ['warning']), ['warning'])
+        self.assertEqual(len(validated), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+"""Tests for the cache of passed tests."""
+import tempfile
+import types
+import unittest
+
+import utils.result_cache
+import utils.results
+
+
+TEST = {'name': 'test', 'query': {'start': 1}, 'results': []}
+
+
+def result(status='passed', warnings=()):
+    """Return a result of the test."""
+    res = utils.results.TestResult(TEST)
+    res.status = status
+    res.warnings = list(warnings)
+    return res
+
+
+class TestResultCache(unittest.TestCase):
+    """Test which tests are considered unchanged."""
+
+    def test_passed(self):
+        """Test that only tests that passed without warnings are remembered, per fingerprint."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = utils.result_cache.ResultCache(tmpdir, 'a')
+            self.assertFalse(cache.unchanged(TEST))
+            cache.update(TEST, result())
+            cache.save()
+            self.assertTrue(utils.result_cache.ResultCache(tmpdir, 'a').unchanged(TEST))
+            self.assertFalse(utils.result_cache.ResultCache(tmpdir, 'b').unchanged(TEST))
+            self.assertFalse(utils.result_cache.ResultCache(tmpdir, 'a').unchanged({**TEST, 'query': {'start': 2}}))
+
+            for res in [result('failed'), result(warnings=['OpenAPI: bad'])]:
+                cache = utils.result_cache.ResultCache(tmpdir, 'a')
+                cache.update(TEST, result())
+                cache.update(TEST, res)
+                cache.save()
+                self.assertFalse(utils.result_cache.ResultCache(tmpdir, 'a').unchanged(TEST))
+
+    def test_fingerprint(self):
+        """Test that the fingerprint changes with the beacon's data, but not with other info."""
+        settings = types.SimpleNamespace(host_name=lambda: 'http://beacon', version='v101', spec_hash='abc', json_schemas={},
+                                         use_json_schemas=True, check_result=True, start_pos=0)
+        info = {'id': 'beacon', 'apiVersion': '1.0.1', 'welcomeUrl': 'http://a',
+                'datasets': [{'id': 'd1', 'variantCount': 5}, {'id': 'd2', 'variantCount': 1}]}
+        first = utils.result_cache.fingerprint(settings, info)
+        self.assertEqual(first, utils.result_cache.fingerprint(settings, {**info, 'welcomeUrl': 'http://b',
+                                                                          'datasets': info['datasets'][::-1]}))
+        self.assertNotEqual(first, utils.result_cache.fingerprint(settings, {**info, 'datasets': [{'id': 'd1', 'variantCount': 6}]}))
+        settings.start_pos = 1
+        self.assertNotEqual(first, utils.result_cache.fingerprint(settings, info))
+
+
+if __name__ == '__main__':
+    unittest.main()
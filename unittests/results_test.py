@@ -0,0 +1,37 @@
+"""Tests for the test results and their timings."""
+import unittest
+
+import utils.results
+
+
+class TestTimings(unittest.TestCase):
+    """Test the per phase timings."""
+
+    def test_timed(self):
+        """Test that time is added to the current result only."""
+        with utils.results.timed('compare'):
+            pass
+        result = utils.results.TestResult({'name': 'test'})
+        with utils.results.collect(result):
+            with utils.results.timed('compare'):
+                pass
+            utils.results.add_time('compare', 1)
+            utils.results.add_time('connect', 0.5)
+        self.assertGreaterEqual(result.timings['compare'], 1)
+        self.assertEqual(result.timings['connect'], 0.5)
+        self.assertIsNone(utils.results.current())
+
+    def test_summarize(self):
+        """Test that missing phases count as zero."""
+        records = [{'name': 'a', 'duration': 2, 'timings': {'connect': 1}},
+                   {'name': 'b', 'duration': 1, 'timings': {}}]
+        summary = utils.results.summarize_timings(records)
+        self.assertEqual(summary['connect']['count'], 2)
+        self.assertEqual(summary['connect']['total'], 1)
+        self.assertEqual(summary['connect']['p50'], 0)
+        self.assertEqual(summary['duration']['total'], 3)
+        self.assertEqual(set(summary), set(utils.results.PHASES + ['duration']))
+
+
+if __name__ == '__main__':
+    unittest.main()
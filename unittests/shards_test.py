@@ -0,0 +1,77 @@
+"""Tests for splitting the tests over shards."""
+import argparse
+import json
+import os
+import tempfile
+import unittest
+
+import utils.history
+import utils.results
+import utils.shards
+
+
+def make_test(name):
+    """Return a test definition."""
+    return {'name': name, 'query': {'start': len(name)}}
+
+
+class TestShards(unittest.TestCase):
+    """Test the partition of the tests and the merge of the reports."""
+
+    def test_parse_shard(self):
+        """Test valid and invalid shard arguments."""
+        self.assertEqual(utils.shards.parse_shard('2/3'), (2, 3))
+        for spec in ['0/3', '4/3', '1', 'a/b']:
+            with self.assertRaises(argparse.ArgumentTypeError):
+                utils.shards.parse_shard(spec)
+
+    def test_partition(self):
+        """Test that the shards cover all tests once, balanced by duration, in the original order."""
+        tests = [make_test(f'test{num}') for num in range(7)]
+        shards, loads = utils.shards.partition(tests, 3)
+        self.assertEqual([len(shard) for shard in shards], [3, 2, 2])
+        self.assertEqual(sorted(test['name'] for shard in shards for test in shard), sorted(test['name'] for test in tests))
+
+        durations = {utils.results.test_key(test): 6.0 if num == 3 else 1.0 for num, test in enumerate(tests)}
+        shards, loads = utils.shards.partition(tests, 3, durations)
+        self.assertEqual(shards[0], [tests[3]])
+        self.assertEqual([round(load, 6) for load in loads], [6.0, 3.0, 3.0])
+        for shard in shards:
+            self.assertEqual(shard, [test for test in tests if test in shard])
+        self.assertEqual(utils.shards.partition(tests, 3, durations), (shards, loads))
+
+    def test_read_timings(self):
+        """Test that the durations of the tests are read from reports, tests without one take the median."""
+        tests = [make_test(name) for name in ['a', 'bb', 'ccc', 'dddd']]
+        records = [{'key': utils.results.test_key(test), 'name': test['name'], 'status': status, 'duration': duration}
+                   for test, status, duration in zip(tests, ['passed', 'failed', 'skipped'], [4.0, 1.0, 0.0])]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filepath = os.path.join(tmpdir, 'report.jsonl')
+            with open(filepath, 'w') as fileh:
+                fileh.writelines(json.dumps(record) + '\n' for record in records)
+            durations = utils.shards.read_timings([filepath])
+        self.assertEqual(durations, {records[0]['key']: 4.0, records[1]['key']: 1.0})
+        # ccc and dddd take the median, 4 s
+        shards, loads = utils.shards.partition(tests, 2, durations)
+        self.assertEqual(shards, [[tests[0], tests[3]], [tests[1], tests[2]]])
+        self.assertEqual(loads, [8.0, 5.0])
+
+    def test_merge_reports(self):
+        """Test that the reports of the shards add up, and go to the history."""
+        records = [[{'name': 'a', 'key': 'a:1', 'status': 'failed', 'duration': 1.0, 'latency': 0.5, 'timings': {},
+                     'errors': ['wrong'], 'warnings': ['bad'], 'query_warnings': [], 'response_warnings': ['bad']}],
+                   [{'name': 'b', 'key': 'b:1', 'status': 'unchanged', 'duration': 0.0, 'latency': 0.0, 'timings': {},
+                     'errors': [], 'warnings': [], 'query_warnings': [], 'response_warnings': []}]]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filepaths = []
+            for num, shard in enumerate(records):
+                filepaths.append(os.path.join(tmpdir, f'shard{num}.jsonl'))
+                with open(filepaths[-1], 'w') as fileh:
+                    fileh.writelines(json.dumps(record) + '\n' for record in shard)
+            history = utils.history.History(tmpdir, 'host')
+            merged = utils.shards.merge_reports(filepaths, history)
+            self.assertEqual(merged['errors'], 1)
+            self.assertEqual(merged['warnings'], ['bad'])
+            self.assertEqual(merged['unchanged'], 1)
+            self.assertEqual([record['name'] for record in merged['timings']], ['a'])
+            self.assertEqual(list(history.tests), ['a:1'])
@@ -0,0 +1,128 @@
+"""Tests for the cache of specifications and schemas."""
+import http.server
+import tempfile
+import threading
+import unittest
+import urllib.error
+from unittest.mock import patch
+
+import yaml
+from openapi_core.shortcuts import RequestValidator
+
+import utils.beacon_query
+import utils.setup
+import utils.spec_cache
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    """Serve a file with an ETag, count the downloads."""
+
+    downloads = 0
+
+    def do_GET(self):
+        """Answer 304 if the client has the current version."""
+        if self.headers.get('If-None-Match') == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        Handler.downloads += 1
+        body = b'{"type": "object"}'
+        self.send_response(200)
+        self.send_header('ETag', '"v1"')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        """Be quiet."""
+
+
+class TestSpecCache(unittest.TestCase):
+    """Test downloading and caching."""
+
+    def setUp(self):
+        """Start a server, make an empty cache."""
+        Handler.downloads = 0
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, args=(0.01,), daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/schema.json'
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        """Stop the server, remove the cache."""
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmpdir.cleanup()
+
+    def test_revalidate(self):
+        """Test that a cached file is revalidated, not downloaded again."""
+        cache = utils.spec_cache.SpecCache(self.tmpdir.name, 'v101')
+        self.assertEqual(cache.fetch(self.url), b'{"type": "object"}')
+        cache = utils.spec_cache.SpecCache(self.tmpdir.name, 'v101')
+        self.assertEqual(cache.fetch(self.url), b'{"type": "object"}')
+        self.assertEqual(Handler.downloads, 1)
+
+    def test_offline(self):
+        """Test that offline mode only uses the cache."""
+        offline = utils.spec_cache.SpecCache(self.tmpdir.name, 'v101', offline=True)
+        with self.assertRaises(urllib.error.URLError):
+            offline.fetch(self.url)
+        utils.spec_cache.SpecCache(self.tmpdir.name, 'v101').fetch(self.url)
+        offline = utils.spec_cache.SpecCache(self.tmpdir.name, 'v101', offline=True)
+        self.assertEqual(offline.fetch(self.url), b'{"type": "object"}')
+        # other versions have their own entries
+        with self.assertRaises(urllib.error.URLError):
+            utils.spec_cache.SpecCache(self.tmpdir.name, 'v110', offline=True).fetch(self.url)
+
+    def test_pickle_spec(self):
+        """Test that a parsed spec is cached and can be used to validate requests."""
+        with open('integrationtests/beacon_spec.yaml') as fileh:
+            y_spec = yaml.load(fileh, Loader=yaml.SafeLoader)
+        # avoid remote references
+        for name in ['DataUseConditions', 'AdamDataUse']:
+            y_spec['components']['schemas'][name] = {'type': 'object'}
+        content = yaml.dump(y_spec)
+        cache = utils.spec_cache.SpecCache(self.tmpdir.name, 'v101')
+        self.assertIsNone(cache.load_spec(content))
+        spec = utils.setup.parse_spec(content, cache)
+        cached = cache.load_spec(content)
+        self.assertIsNotNone(cached)
+        with patch('utils.setup.Settings'):
+            req = utils.beacon_query.BeaconRequest('http://localhost', 'GET', 'query', args={'start': 'x'})
+        errors = [[str(error) for error in RequestValidator(parsed).validate(req).errors] for parsed in (spec, cached)]
+        self.assertTrue(errors[0])
+        self.assertEqual(errors[0], errors[1])
+
+    def test_pickle_schema(self):
+        """Test that a Schema is made again with the same attributes."""
+        from openapi_core.schema.schemas.models import Schema
+        item = Schema('string', schema_format='date', pattern='^[0-9-]+$', min_length=10, nullable=True)
+        schema = Schema('object', properties={'date': item}, required=['date'], additional_properties=False,
+                        extensions={'x-beacon': 1}, _source={'type': 'object'})
+        cache = utils.spec_cache.SpecCache(self.tmpdir.name, 'v101')
+        cache.save_spec('schema', schema)
+        cached = cache.load_spec('schema')
+        self.assertIsInstance(cached, Schema)
+        self.assertEqual(cached.__dict__, {'type': 'object'})
+        self.assertEqual((cached.type, cached.required, cached.additional_properties, cached.extensions),
+                         (schema.type, ['date'], False, {'x-beacon': 1}))
+        date = cached.properties['date']
+        self.assertEqual((date.type, date.format, date.pattern.pattern, date.min_length, date.nullable, date.has_default()),
+                         (item.type, 'date', '^[0-9-]+$', 10, True, False))
+
+    def test_pickle_unknown_schema(self):
+        """Test that a Schema with an argument that is not kept is not cached."""
+        from openapi_core.schema.schemas.models import Schema
+
+        class NewSchema(Schema):
+            def __init__(self, schema_type=None, hidden=None):
+                super().__init__(schema_type)
+
+        cache = utils.spec_cache.SpecCache(self.tmpdir.name, 'v101')
+        with patch('openapi_core.schema.schemas.models.Schema', NewSchema), self.assertLogs(level='WARNING'):
+            cache.save_spec('schema', NewSchema('object'))
+        self.assertIsNone(cache.load_spec('schema'))
+
+
+if __name__ == '__main__':
+    unittest.main()
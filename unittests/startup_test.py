@@ -0,0 +1,28 @@
+"""Tests for the start up time of the tester."""
+import subprocess
+import sys
+import unittest
+
+import utils.startup
+
+
+class TestStartup(unittest.TestCase):
+    """Test that the slow packages are not imported at start up."""
+
+    def test_no_slow_imports(self):
+        """Test that importing the tester does not import openapi_core, jsonschema, werkzeug or numpy."""
+        code = 'import sys, beacon_api_tester; print(" ".join(sys.modules))'
+        modules = subprocess.run([sys.executable, '-c', code], stdout=subprocess.PIPE, universal_newlines=True,
+                                 check=True).stdout.split()
+        for package in ['openapi_core', 'jsonschema', 'werkzeug', 'numpy']:
+            self.assertNotIn(package, modules)
+
+    def test_measure(self):
+        """Test that the imports of a command are measured."""
+        wall, imports, modules = utils.startup.measure(None, False)
+        self.assertGreater(wall, imports)
+        self.assertIn('encodings', modules)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+"""Tests for the timing statistics."""
+import unittest
+
+import utils.stats
+
+
+class TestStats(unittest.TestCase):
+    """Test percentiles and histograms."""
+
+    def test_percentile(self):
+        """Test the nearest rank percentiles."""
+        values = list(range(1, 101))
+        self.assertEqual(utils.stats.percentile(values, 50), 50)
+        self.assertEqual(utils.stats.percentile(values, 99), 99)
+        self.assertEqual(utils.stats.percentile(values, 100), 100)
+        self.assertEqual(utils.stats.percentile([3], 95), 3)
+        self.assertIsNone(utils.stats.percentile([], 50))
+
+    def test_summarize(self):
+        """Test that the summary contains the throughput, when the wall time is known."""
+        summary = utils.stats.summarize([0.3, 0.1, 0.2], wall_time=2)
+        self.assertEqual(summary['p50'], 0.2)
+        self.assertEqual(summary['max'], 0.3)
+        self.assertEqual(summary['throughput'], 1.5)
+        self.assertNotIn('throughput', utils.stats.summarize([]))
+
+    def test_histogram(self):
+        """Test that timings are counted in the right buckets."""
+        self.assertEqual(utils.stats.histogram([0.0005, 0.001, 0.004, 7], [0.001, 0.005, 1]), [1, 2, 0, 1])
+
+
+if __name__ == '__main__':
+    unittest.main()
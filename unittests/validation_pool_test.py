@@ -0,0 +1,46 @@
+"""Tests for the validation in worker processes."""
+import time
+import types
+import unittest
+
+import utils.beacon_query
+import utils.errors as err
+import utils.results
+import utils.validation_pool
+
+
+SCHEMAS = {'query': {'type': 'object', 'required': ['referenceName']},
+           'response': {'type': 'object', 'required': ['exists']}}
+
+
+class TestValidationPool(unittest.TestCase):
+    """Test that the workers find the same errors as the tests would."""
+
+    def test_check(self):
+        """Test that the errors and the timings of the validation are sent back."""
+        settings = types.SimpleNamespace(json_schemas=SCHEMAS, use_json_schemas=True, version='v101', host='http://beacon')
+        pool = utils.validation_pool.ValidationPool(1, settings, '')
+        try:
+            resp = utils.beacon_query.BeaconResponse.__new__(utils.beacon_query.BeaconResponse)
+            resp.data, resp.parsed = '{"beaconId": "test"}', None
+            result = utils.results.TestResult({'name': 'test'})
+            with utils.results.collect(result):
+                warnings = pool.check(None, resp, 'query', {'start': 1})
+            self.assertIsInstance(warnings, utils.beacon_query.ValidationWarnings)
+            self.assertEqual(warnings.query, ["JSON schema: field '': 'referenceName' is a required property"])
+            self.assertEqual(warnings.response, ["JSON schema: field '': 'exists' is a required property"])
+            self.assertEqual(warnings.messages, warnings.query + warnings.response)
+            self.assertIn('json_schema', result.timings)
+        finally:
+            pool.close()
+
+    def test_setup_error(self):
+        """Test that a process that can't be set up stops the pool at once, with the reason."""
+        settings = types.SimpleNamespace(json_schemas={}, use_json_schemas=False, version='v101', host='http://beacon')
+        start = time.perf_counter()
+        with self.assertLogs(level='ERROR') as logs:
+            with self.assertRaises(err.BeaconTestError):
+                utils.validation_pool.ValidationPool(2, settings, 'openapi: 3.0.0\n')
+        self.assertLess(time.perf_counter() - start, utils.validation_pool.READY_TIMEOUT / 2)
+        self.assertTrue(any('Error in specificaton' in line for line in logs.output), logs.output)
+        self.assertIn('ERROR:root:Could not start the validation processes', logs.output)
@@ -0,0 +1,105 @@
+"""Tests for extracting records from vcf files."""
+import gzip
+import io
+import os
+import struct
+import tempfile
+import unittest
+import zlib
+from unittest.mock import patch
+
+import utils.vcf
+
+
+HEADER = b'##fileformat=VCFv4.2\n#CHROM\tPOS\tID\tREF\tALT\n'
+RECORDS = [f'22\t{pos}\trs{pos}\tA\tG\n'.encode() for pos in range(100, 400)]
+
+
+def bgzip(data, block_size=1000):
+    """Compress data in the bgzip format, using small blocks."""
+    out = b''
+    for start in range(0, len(data), block_size):
+        chunk = data[start:start + block_size]
+        compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+        cdata = compressor.compress(chunk) + compressor.flush()
+        out += struct.pack('<4BI2BH2sHH', 31, 139, 8, 4, 0, 0, 255, 6, b'BC', 2, len(cdata) + 25)
+        out += cdata + struct.pack('<2I', zlib.crc32(chunk), len(chunk))
+    # end of file marker
+    return out + bytes.fromhex('1f8b08040000000000ff0600424302001b0003000000000000000000')
+
+
+class TestVcf(unittest.TestCase):
+    """Test vcf extraction, with and without index."""
+
+    def setUp(self):
+        """Make a temporary directory."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        self.tmpdir.cleanup()
+
+    def write(self, name, content):
+        """Write a file to the temporary directory."""
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, 'wb') as fileh:
+            fileh.write(content)
+        return path
+
+    def extract(self, path, ids):
+        """Extract records, return the output and the found ids."""
+        out = io.BytesIO()
+        found = utils.vcf.extract(path, ids, out)
+        return out.getvalue(), found
+
+    def check_extract(self, path):
+        """Check that only the wanted records are extracted, the second time using the index."""
+        wanted = {'rs150', 'rs399', 'rs101', 'missing'}
+        expected = HEADER + RECORDS[1] + RECORDS[50] + RECORDS[299]
+        self.assertEqual(self.extract(path, wanted), (expected, wanted - {'missing'}))
+        self.assertTrue(os.path.isfile(path + utils.vcf.INDEX_SUFFIX))
+        with patch('utils.vcf.extract_all') as extract_all:
+            self.assertEqual(self.extract(path, wanted), (expected, wanted - {'missing'}))
+        extract_all.assert_not_called()
+
+    def test_plain(self):
+        """Test extracting from a plain vcf."""
+        self.check_extract(self.write('test.vcf', HEADER + b''.join(RECORDS)))
+
+    def test_bgzip(self):
+        """Test extracting from a bgzip compressed vcf, where records span over blocks."""
+        self.check_extract(self.write('test.vcf.gz', bgzip(HEADER + b''.join(RECORDS))))
+
+    def test_gzip(self):
+        """Test extracting from a gzip compressed vcf, which is read in full each time, without an index."""
+        path = self.write('test.vcf.gz', gzip.compress(HEADER + b''.join(RECORDS)))
+        wanted = {'rs150', 'rs399', 'missing'}
+        for _ in range(2):
+            self.assertEqual(self.extract(path, wanted), (HEADER + RECORDS[50] + RECORDS[299], wanted - {'missing'}))
+        self.assertFalse(os.path.exists(path + utils.vcf.INDEX_SUFFIX))
+
+    def test_changed_file(self):
+        """Test that the index of a file that has changed is not used, but made again."""
+        path = self.write('test.vcf', HEADER + b''.join(RECORDS))
+        self.extract(path, {'rs150'})
+        self.write('test.vcf', HEADER + b''.join(RECORDS[:10]))
+        self.assertIsNone(utils.vcf.lookup_index(path, {'rs150'}))
+        self.assertEqual(self.extract(path, {'rs150', 'rs105'}), (HEADER + RECORDS[5], {'rs105'}))
+        self.assertEqual(utils.vcf.lookup_index(path, {'rs150', 'rs105'}), {'rs105': [len(HEADER) + len(b''.join(RECORDS[:5]))]})
+
+    def test_truncated_gzip(self):
+        """Test that a gzip file that ends within its header is opened as gzip, not looked into."""
+        fileh, seekable = utils.vcf.open_vcf(self.write('test.vcf.gz', b'\x1f\x8b\x08'))
+        with fileh:
+            self.assertFalse(seekable)
+            with self.assertRaises(EOFError):
+                fileh.readline()
+
+    def test_all(self):
+        """Test extracting all records."""
+        path = self.write('test.vcf', HEADER + b''.join(RECORDS))
+        self.assertEqual(self.extract(path, {'*'})[0], HEADER + b''.join(RECORDS))
+
+
+if __name__ == '__main__':
+    unittest.main()
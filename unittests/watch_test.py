@@ -0,0 +1,79 @@
+"""Tests for running the tests again when they change."""
+import os
+import tempfile
+import types
+import unittest
+
+import utils.watch
+
+
+TEST = '''
+- name: {name}
+  descr: A test.
+  query:
+    referenceName: "22"
+    start: {start}
+  results:
+    - property: exists
+      assert: is_true
+  beacondata: data.csv
+'''
+
+
+class TestWatch(unittest.TestCase):
+    """Test finding the changed files and the tests to run again."""
+
+    def setUp(self):
+        """Write a test file and a data file."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.testfile = os.path.join(self.tmpdir.name, 'test.yaml')
+        self.datafile = os.path.join(self.tmpdir.name, 'data.csv')
+        self.write(self.testfile, TEST.format(name='first', start=1) + TEST.format(name='second', start=2)[1:])
+        self.write(self.datafile, '# referenceName,start\n22,1\n')
+
+    def tearDown(self):
+        """Remove the files."""
+        self.tmpdir.cleanup()
+
+    def write(self, path, content):
+        """Write a file, with a new modification time."""
+        with open(path, 'w') as fileh:
+            fileh.write(content)
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000))
+
+    def test_file_watcher(self):
+        """Test that only the changed files are found, once."""
+        watcher = utils.watch.FileWatcher([self.testfile, self.datafile])
+        self.assertEqual(watcher.changed(), [])
+        self.write(self.datafile, '# referenceName,start\n22,2\n')
+        self.assertEqual(watcher.changed(), [self.datafile])
+        self.assertEqual(watcher.changed(), [])
+
+    def test_changed_tests(self):
+        """Test that the changed tests, and the tests of changed data files, are run again."""
+        runs = []
+        watch = utils.watch.Watch(types.SimpleNamespace(test=[self.testfile]), runs.append)
+        self.assertEqual(watch.watcher.changed(), [])
+        self.write(self.testfile, TEST.format(name='first', start=1) + TEST.format(name='second', start=3)[1:])
+        watch.update(watch.watcher.changed())
+        self.assertEqual([[test['name'] for test in tests] for tests in runs], [['second']])
+        self.write(self.datafile, '# referenceName,start\n22,2\n')
+        watch.update(watch.watcher.changed())
+        self.assertEqual([test['name'] for test in runs[-1]], ['first', 'second'])
+
+    def test_invalid_test_file(self):
+        """Test that a test file that can't be read is skipped, until it is fixed."""
+        runs = []
+        watch = utils.watch.Watch(types.SimpleNamespace(test=[self.testfile]), runs.append)
+        with self.assertLogs(level='ERROR'):
+            self.write(self.testfile, 'garbage: [')
+            watch.update(watch.watcher.changed())
+        self.assertEqual(runs, [])
+        self.write(self.testfile, TEST.format(name='first', start=5))
+        watch.update(watch.watcher.changed())
+        self.assertEqual([test['name'] for test in runs[-1]], ['first'])
+
+
+if __name__ == '__main__':
+    unittest.main()
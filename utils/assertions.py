@@ -0,0 +1,202 @@
+"""Checks of the responses, compiled per test.
+
+The checks of a test are grouped by the property of the response that they look at.
+All `contains` and `not_contains` checks of a property are evaluated together, in one
+pass over the list. The errors are the same as when checking one at a time: the error
+of the first failing check (in the order of the test) is raised.
+
+The pass over a list can also be done while the response is read (see `list_pass`).
+"""
+import operator
+
+import utils.compare
+import utils.errors as err
+
+
+LENGTH_OPS = {'length_gt': (operator.gt, 'greater than'),
+              'length_lt': (operator.lt, 'lesser than'),
+              'length_eq': (operator.eq, 'equal to')
+              }
+BOOL_CHECKS = ['is_true', 'is_false']
+LIST_CHECKS = ['contains', 'not_contains']
+
+
+class Assertions():
+    """The checks of a test."""
+
+    def __init__(self, checks):
+        """Group the checks by property. Checks that are not about the response body (eg. status codes) are left out."""
+        self.checks = [check for check in checks
+                       if check['assert'] in LENGTH_OPS or check['assert'] in BOOL_CHECKS or check['assert'] in LIST_CHECKS]
+        self.by_property = {}
+        for num, check in enumerate(self.checks):
+            self.by_property.setdefault(check['property'], []).append(num)
+
+    def list_pass(self, prop):
+        """Return a ListPass for the contains and not_contains checks of a property, to be fed the items of the list.
+
+        Give it to `check` once the whole list has been fed.
+        """
+        list_pass = ListPass(prop, None)
+        for num in self.by_property.get(prop, []):
+            if self.checks[num]['assert'] == 'contains':
+                list_pass.add_gold(num, self.checks[num]['data'])
+            elif self.checks[num]['assert'] == 'not_contains':
+                list_pass.add_exclude(num, self.checks[num]['data'])
+        return list_pass
+
+    def check(self, response, index=None, fed=None):
+        """Check the response. `index` is a ResponseIndex of it, `fed` the ListPasses (by property) that already went through their lists.
+
+        Raise AssertionError or ResponseError for the first failing check.
+        """
+        if index is None:
+            index = utils.compare.ResponseIndex(response)
+        fed = fed or {}
+        failures = {}
+        for prop, nums in self.by_property.items():
+            failures.update(self.check_property(response, prop, nums, index, fed.get(prop)))
+        for num in sorted(failures):
+            raise failures[num]
+
+    def check_property(self, response, prop, nums, index, fed=None):
+        """Evaluate the checks of one property. Return the errors by check number."""
+        failures = {}
+        if prop not in response:
+            for num in nums:
+                if self.checks[num]['assert'] == 'contains':
+                    failures[num] = AssertionError(f'Bad response, could not find {prop} in {response}')
+                else:
+                    failures[num] = KeyError(prop)
+            return failures
+
+        value = response[prop]
+        list_pass = fed if fed is not None else ListPass(prop, index)
+        for num in nums:
+            check = self.checks[num]
+            try:
+                if check['assert'] in LENGTH_OPS:
+                    check_length(check, value)
+                elif check['assert'] in BOOL_CHECKS:
+                    check_bool(check, value)
+                elif check['assert'] == 'contains':
+                    assert value, f'Too few elements, could not find {check["data"]}'
+                    if fed is None:
+                        list_pass.add_gold(num, check['data'])
+                elif fed is None:
+                    list_pass.add_exclude(num, check['data'])
+            except Exception as error:
+                failures[num] = error
+
+        if list_pass.needed():
+            # keep the errors of the checks above
+            failures = {**list_pass.run(None if fed is not None else value), **failures}
+        return failures
+
+
+class ListPass():
+    """The contains and not_contains checks of one list, evaluated while going through the list once.
+
+    The objects are given one at a time to `feed`, and the results are collected by `finish`.
+    """
+
+    def __init__(self, key, index):
+        """Set up a pass over response[key]. Without an index (a ResponseIndex), all objects are compared."""
+        self.key = key
+        self.index = index
+        # an error raised while feeding, see `raise_error`
+        self.error = None
+        # check number -> (gold, object found by the index)
+        self.matched = {}
+        # check number -> [gold, gold identifiers, best object, its score]
+        self.pending = {}
+        # check number -> (excluded values, errors)
+        self.excludes = {}
+
+    def add_gold(self, num, gold):
+        """Add a contains check."""
+        match = self.index.exact(gold, self.key) if self.index is not None else None
+        if match is not None:
+            self.matched[num] = (gold, match)
+        else:
+            self.pending[num] = [gold, utils.compare.get_sort_ids(gold, self.key), {}, None]
+
+    def add_exclude(self, num, exclude):
+        """Add a not_contains check."""
+        self.excludes[num] = (exclude, [])
+
+    def checks(self):
+        """Return the numbers of all checks in the pass."""
+        return list(self.matched) + list(self.pending) + list(self.excludes)
+
+    def needed(self):
+        """Check whether the list has to be gone through."""
+        return bool(self.matched or self.pending or self.excludes)
+
+    def feed(self, obj):
+        """Look at the next object of the list. An error is kept until `raise_error`, so that it is raised by the checks."""
+        if self.error is not None:
+            return
+        try:
+            self.compare(obj)
+        except Exception as error:
+            self.error = error
+
+    def raise_error(self):
+        """Raise the error of `feed`, if any."""
+        if self.error is not None:
+            raise self.error
+
+    def compare(self, obj):
+        """Compare the next object of the list to the checks."""
+        if self.pending:
+            obj_id = utils.compare.get_sort_ids(obj, self.key)
+            for state in self.pending.values():
+                if state[3] == 0:
+                    # already found an exact match
+                    continue
+                score = utils.compare.compare_identifiers(state[1], obj_id)
+                if state[3] is None or score < state[3]:
+                    state[2], state[3] = obj, score
+        for exclude, errors in self.excludes.values():
+            errors.extend(utils.compare.not_in(obj, exclude))
+
+    def run(self, objects=None):
+        """Go through the objects (unless they have been fed already), return the errors by check number."""
+        try:
+            for obj in objects or []:
+                self.feed(obj)
+            self.raise_error()
+            return self.finish()
+        except Exception as error:
+            return {num: error for num in self.checks()}
+
+    def finish(self):
+        """Return the errors by check number."""
+        failures = {}
+        matches = list(self.matched.items()) + [(num, (state[0], state[2])) for num, state in self.pending.items()]
+        for num, (gold, match) in matches:
+            errors = utils.compare.compare_obj(gold, match)
+            if errors:
+                failures[num] = err.ResponseError(errors)
+        for num, (_exclude, errors) in self.excludes.items():
+            if errors:
+                failures[num] = err.ResponseError(errors)
+        return failures
+
+
+def check_length(check, value):
+    """Check the length of a list."""
+    lop, txt = LENGTH_OPS[check['assert']]
+    assert lop(len(value), check['length']), \
+        f"Bad length of field {check['property']}" \
+        f"should be {txt} {check['length']}, but is {len(value)}"
+
+
+def check_bool(check, value):
+    """Check that a value is true or false."""
+    err_msg = f"Bad value of field {check['property']}" \
+              f"should be 'false', but is {value}"
+    if check['assert'] == 'is_false':
+        value = not value
+    assert value, err_msg
@@ -2,83 +2,131 @@
 
 Uses jsonschemas and openapi_core to validate against the api specification, alos compares of the status code.
 Gives warnings when the validation fails.
+
+openapi_core and werkzeug take long to import, so they are imported when they are first used.
 """
+import collections
 import json
 import logging
+import time
 import urllib.request
 import urllib.parse
 
-from openapi_core.unmarshalling.schemas.exceptions import InvalidSchemaValue
-from openapi_core.shortcuts import RequestValidator, ResponseValidator
-from openapi_core.validation.request.datatypes import OpenAPIRequest
-from openapi_core.validation.response.datatypes import OpenAPIResponse
-from werkzeug.datastructures import ImmutableMultiDict
-
 import utils.errors as err
+import utils.results
 import utils.setup
 import utils.jsonschemas
 
 
-def call_beacon(path='query', query=None, ignore_schemas=False, code=200):
-    """Make a query to the beacon and validate against the schemas."""
-    request, response = make_query(path=path, query=query, code=code)
+ValidationWarnings = collections.namedtuple('ValidationWarnings', ['query', 'response', 'messages'])
+
+
+def call_beacon(path='query', query=None, ignore_schemas=False, code=200, stream=None):
+    """Make a query to the beacon and validate against the schemas. Return the parsed response.
+
+    With a `stream` (utils.json_stream.ListStream), the response is parsed while it is read.
+    """
+    request, response = make_query(path=path, query=query, code=code, stream=stream)
     if not ignore_schemas:
         validate(request, response, path, query)
-    return json.loads(response.data)
+    return response.json()
 
 
-def make_query(path='query', query=None, code=200):
-    """Make a query to the beacon."""
+def make_query(path='query', query=None, code=200, stream=None):
+    """Make a query to the beacon. With a response cache, the response to the same query may be reused."""
     settings = utils.setup.Settings()
     query = {} if query is None else query
     req = BeaconRequest(settings.host, 'GET', path, args=query)
-    resp = BeaconResponse(req)
+    if settings.response_cache is None:
+        resp = BeaconResponse(req, stream)
+    else:
+        resp = settings.response_cache.response(req.cache_key(), lambda: BeaconResponse(req, stream))
     assert resp.status_code == code, f"Bad status code. Got {resp.status_code}, expected {code}"
     return req, resp
 
 
 def validate(req, resp, path, query):
-    """Validate a query and its response."""
+    """Validate a query and its response, report the specification errors."""
+    settings = utils.setup.Settings()
+    check = check_schemas if settings.validation_pool is None else settings.validation_pool.check
+    if settings.response_cache is None:
+        warnings = check(req, resp, path, query)
+    else:
+        warnings = settings.response_cache.warnings(req.cache_key(), lambda: check(req, resp, path, query))
+    report_warnings(warnings)
+    return resp.json()
+
+
+def check_schemas(req, resp, path, query):
+    """Validate a query and its response. Return the specification errors as ValidationWarnings."""
     settings = utils.setup.Settings()
-    warnings = []
+    warnings = ValidationWarnings([], [], [])
     if settings.openapi:
+        from openapi_core.unmarshalling.schemas.exceptions import InvalidSchemaValue
+        req_validator, resp_validator = openapi_validators(settings)
+
         # check that the query complies to the api spec
-        validator = RequestValidator(settings.openapi)
-        result = validator.validate(req)
-        settings.query_warnings += map(str, result.errors)
-        warnings.extend(['OpenApi: ' + str(x) for x in result.errors])
+        with utils.results.timed('openapi_request'):
+            result = req_validator.validate(req)
+        warnings.query.extend(map(str, result.errors))
+        warnings.messages.extend(['OpenApi: ' + str(x) for x in result.errors])
 
         # check that the response complies to the api spec
-        validator = ResponseValidator(settings.openapi)
-        result = validator.validate(req, resp)
-        settings.warnings += map(str, result.errors)
-        for error in result.errors:
+        if resp.data is None:
+            # openapi_core needs the raw body
+            logging.warning('The response was too big to be kept (--stream_responses), not validated against the OpenAPI specification')
+            errors = []
+        else:
+            with utils.results.timed('openapi_response'):
+                errors = resp_validator.validate(req, resp).errors
+        warnings.response.extend(map(str, errors))
+        for error in errors:
             if isinstance(error, InvalidSchemaValue):
                 warning = f'OpenAPI:\n\tAt object {error.value}\n\t'
                 warning += "\n\t".join(prettify_schemaerror(error))
-                warnings.append(warning)
+                warnings.messages.append(warning)
             else:
-                warnings.append(f'OpenAPI: {str(error)}')
+                warnings.messages.append(f'OpenAPI: {str(error)}')
 
     if settings.use_json_schemas:
         if path != '/' and query is not None:
             # validate query against jsons schemas
             q_warns = utils.jsonschemas.validate(query, 'query', settings)
-            warnings.extend(q_warns)
-            settings.query_warnings += q_warns
+            warnings.messages.extend(q_warns)
+            warnings.query.extend(q_warns)
 
         # validate response against jsons schemas
-        warns = utils.jsonschemas.validate(resp.data, 'response', settings, path)
-        warnings.extend(warns)
-        settings.warnings += warns
-    for warning in warnings:
-        logging.warning(warning)
+        try:
+            body = resp.json()
+        except ValueError:
+            # reported as invalid by the schema validation
+            body = resp.data
+        warns = utils.jsonschemas.validate(body, 'response', settings, path)
+        warnings.messages.extend(warns)
+        warnings.response.extend(warns)
+    return warnings
 
-    return json.loads(resp.data)
 
+def openapi_validators(settings):
+    """Return the request and response validators of the OpenAPI specification, build them the first time."""
+    from openapi_core.shortcuts import RequestValidator, ResponseValidator
+    return utils.jsonschemas.cached_validator(
+        settings, ('openapi', id(settings.openapi)),
+        lambda: (RequestValidator(settings.openapi), ResponseValidator(settings.openapi)))
 
-class BeaconRequest(OpenAPIRequest):
-    """Wrapper for a Request.
+
+def report_warnings(warnings):
+    """Count and log the specification errors of a query."""
+    settings = utils.setup.Settings()
+    settings.add_query_warnings(warnings.query)
+    settings.add_warnings(warnings.response)
+    for warning in warnings.messages:
+        logging.warning(warning)
+    utils.results.add_warnings(warnings)
+
+
+class BeaconRequest():
+    """Wrapper for a Request, with the attributes of an openapi_core OpenAPIRequest.
 
     The url can be opened using the open method
     """
@@ -87,6 +135,7 @@ class BeaconRequest(OpenAPIRequest):
                  view_args=None, headers=None, data=None,
                  mimetype='application/json'):
         """Set up a Request object."""
+        from werkzeug.datastructures import ImmutableMultiDict
         make_offset(args)
         self.host_url = host
         self.path = path
@@ -110,17 +159,31 @@ class BeaconRequest(OpenAPIRequest):
             url = url[:-1]
         return url
 
-    def open(self):
-        """Open the url."""
+    def url(self):
+        """Get the url to open."""
         url = '/'.join([self.host_url, self.path_pattern])
         if url.endswith('//'):
             url = url[:-1]
         query = urllib.parse.urlencode(self.parameters['query'])
         if query:
             url += f'?{query}'
+        return url
+
+    def cache_key(self):
+        """Identify the request, regardless of the order of the query parameters."""
+        return (self.host_url, self.path_pattern, tuple(sorted((key, str(val)) for key, val in self.parameters['query'].items(multi=True))))
+
+    def open(self, on_chunk=None):
+        """Open the url. With `on_chunk`, the body may be given to it in chunks as it is read (see ConnectionPool.urlopen)."""
+        url = self.url()
         logging.info('Open %s', url)
+        pool = utils.setup.Settings().pool
         try:
-            res = urllib.request.urlopen(url)
+            if pool is not None:
+                res = pool.urlopen(url, on_chunk=on_chunk)
+            else:
+                with utils.results.timed('ttfb'):
+                    res = urllib.request.urlopen(url)
         except ValueError:
             logging.error('Url can not be opened: %s', url)
             raise err.BeaconTestError()
@@ -136,18 +199,31 @@ class BeaconRequest(OpenAPIRequest):
         return res
 
 
-class BeaconResponse(OpenAPIResponse):
-    """Wrapper for a Response.
+class BeaconResponse():
+    """Wrapper for a Response, with the attributes of an openapi_core OpenAPIResponse.
 
     Stores the response body, error code and the content type
     """
 
-    def __init__(self, request):
-        """Set up a response object."""
+    def __init__(self, request, stream=None):
+        """Set up a response object. The response is read from the beacon, or from a cassette when replaying.
+
+        With a `stream` (utils.json_stream.ListStream), the body is parsed while it is read.
+        """
         self.error = False
+        # the parsed body, see `json`
+        self.parsed = None
+        settings = utils.setup.Settings()
+        if settings.cassette is not None and settings.cassette_mode == 'replay':
+            settings.cassette.play(request, self)
+            self.elapsed = 0.0
+            self.read_stream(stream)
+            return
+        start = time.perf_counter()
         try:
-            response = request.open()
-            self.data = response.read()
+            response = request.open(stream.feed if stream is not None else None)
+            with utils.results.timed('body'):
+                self.data = response.read()
             self.status_code = response.getcode()
             self.mimetype = response.info().get_content_type()
 
@@ -156,6 +232,41 @@ class BeaconResponse(OpenAPIResponse):
             self.mimetype = error.info().get_content_type()
             self.data = error.read()
             self.error = True
+        self.read_stream(stream)
+        self.elapsed = time.perf_counter() - start
+        utils.results.add_latency(self.elapsed)
+        if settings.cassette is not None:
+            settings.cassette.add(request, self)
+
+    def read_stream(self, stream):
+        """Get the body from the stream it was given to. Bodies that were read in full are given to the stream now.
+
+        Raises AssertionError, which fails the test, if the body is neither json nor small enough to be kept.
+        """
+        if stream is None:
+            return
+        if not stream.fed and self.data:
+            stream.feed(self.data)
+        with utils.results.timed('json_decode'):
+            data, self.parsed = stream.close()
+        if data is None and self.parsed is None:
+            raise AssertionError(f'The response (status code {self.status_code}) is not a json object, '
+                                 f'and too big to be kept: {stream.error}')
+        self.data = data
+
+    def json(self):
+        """Return the parsed body. It is parsed once, and shared by all that look at the response."""
+        if self.parsed is None:
+            with utils.results.timed('json_decode'):
+                self.parsed = json.loads(self.data)
+        return self.parsed
+
+    def __getstate__(self):
+        """Leave out the parsed body when the raw body is kept (eg. for the validation processes), it is smaller."""
+        state = dict(self.__dict__)
+        if state['data'] is not None:
+            state['parsed'] = None
+        return state
 
 
 def make_offset(args):
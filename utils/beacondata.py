@@ -0,0 +1,191 @@
+"""Read the beacon data files of the tests (`beacondata`) and search them like a beacon does.
+
+The data files are csv (or tsv) files, with the column names in the first line:
+
+    # referenceName,referenceBases,alternateBases,variantType,assemblyId,start,end,mateName,datasetId
+
+The variants are kept in an interval index: per referenceName, sorted by start position.
+"""
+import bisect
+import collections
+import logging
+
+import utils.errors as err
+
+
+INT_FIELDS = ['start', 'end', 'variantCount', 'callCount', 'sampleCount']
+FLOAT_FIELDS = ['frequency']
+NULL_VALUES = ['None', '']
+
+
+def get_separator(filepath):
+    """Return the column separator of a data file."""
+    return '\t' if str(filepath).endswith('.tsv') else ','
+
+
+def read_rows(filepath):
+    """Read the variants of a data file, one dict at a time."""
+    sep = get_separator(filepath)
+    with open(filepath) as fileh:
+        header = fileh.readline()
+        if not header.startswith('#'):
+            logging.error(f'No header in {filepath}')
+            raise err.BeaconTestError()
+        columns = [column.strip() for column in header.lstrip('#').split(sep)]
+        for num, line in enumerate(fileh, 2):
+            if not line.strip() or line.startswith('#'):
+                continue
+            values = line.rstrip('\r\n').split(sep)
+            if len(values) != len(columns):
+                logging.error(f'{filepath}, line {num}: expected {len(columns)} columns, got {len(values)}')
+                raise err.BeaconTestError()
+            yield parse_row(dict(zip(columns, values)))
+
+
+def parse_row(row):
+    """Convert the values of a row to the right types."""
+    for key, val in row.items():
+        if val in NULL_VALUES:
+            row[key] = None
+        elif key in INT_FIELDS:
+            row[key] = int(val)
+        elif key in FLOAT_FIELDS:
+            row[key] = float(val)
+    return row
+
+
+def variant_type(row):
+    """Return the variant type of a row, guess it from the bases if it's not given."""
+    if row.get('variantType'):
+        return row['variantType']
+    ref, alt = row.get('referenceBases') or '', row.get('alternateBases') or ''
+    if len(ref) == len(alt) == 1:
+        return 'SNP'
+    if len(ref) == len(alt):
+        return 'MNP'
+    return 'INS' if len(alt) > len(ref) else 'DEL'
+
+
+Query = collections.namedtuple('Query', ['referenceName', 'start', 'end', 'startMin', 'startMax', 'endMin', 'endMax',
+                                         'referenceBases', 'alternateBases', 'variantType', 'assemblyId', 'mateName',
+                                         'datasetIds'])
+Query.__new__.__defaults__ = (None,) * len(Query._fields)
+
+
+def make_query(params):
+    """Make a Query of the (parsed) parameters of a query. Other parameters are left out."""
+    return Query(**{key: params.get(key) for key in Query._fields})
+
+
+class VariantIndex():
+    """The variants of one or more data files, indexed by position.
+
+    Breakends (variantType BND) are stored once for each end, so that they are found
+    from either chromosome. The other end is not in the data file, so its referenceBases
+    are unknown (None).
+    """
+
+    def __init__(self, rows=()):
+        """Index the rows."""
+        # referenceName -> variants, and their start positions once sorted
+        self.variants = {}
+        self.starts = {}
+        # datasetId -> assemblyId and number of variants
+        self.datasets = {}
+        self.add(rows)
+
+    @classmethod
+    def from_files(cls, filepaths):
+        """Read and index data files."""
+        index = cls()
+        for filepath in filepaths:
+            index.add(read_rows(filepath))
+        return index
+
+    def add(self, rows):
+        """Add variants to the index."""
+        for row in rows:
+            if row.get('end') is None and row.get('start') is not None and row.get('referenceBases'):
+                # like the beacons, use the end of the reference bases
+                row = {**row, 'end': row['start'] + len(row['referenceBases'])}
+            dataset = self.datasets.setdefault(row.get('datasetId'), {'assemblyId': row.get('assemblyId'), 'variants': 0})
+            dataset['variants'] += 1
+            if variant_type(row) == 'BND' and row.get('mateName'):
+                mate = {**row, 'referenceName': row['mateName'], 'mateName': row['referenceName'],
+                        'start': row.get('end'), 'end': row.get('start'), 'referenceBases': None}
+                pair = [row, mate]
+            else:
+                pair = [row]
+            for variant in pair:
+                self.insert({**variant, 'pair': pair})
+
+    def insert(self, variant):
+        """Add one variant. The index is sorted again on the next search."""
+        self.variants.setdefault(variant['referenceName'], []).append(variant)
+        self.starts.pop(variant['referenceName'], None)
+
+    def overlapping(self, reference_name, start_min, start_max):
+        """Return the variants on a chromosome that start between start_min and start_max (inclusive)."""
+        if reference_name not in self.variants:
+            return []
+        if reference_name not in self.starts:
+            variants = self.variants[reference_name]
+            variants.sort(key=start_position)
+            self.starts[reference_name] = [start_position(variant) for variant in variants]
+        starts = self.starts[reference_name]
+        first = bisect.bisect_left(starts, start_min)
+        last = bisect.bisect_right(starts, start_max)
+        return self.variants[reference_name][first:last]
+
+    def search(self, query):
+        """Return the variants that match a query.
+
+        For mate queries, all ends of the matching breakends are returned.
+        """
+        if query.start is not None:
+            start_min = start_max = query.start
+        else:
+            start_min, start_max = query.startMin, query.startMax
+        found, seen = [], set()
+        for variant in self.overlapping(query.referenceName, start_min, start_max):
+            if not matches_position(variant, query):
+                continue
+            if query.mateName is not None and variant.get('mateName') != query.mateName:
+                continue
+            for hit in variant['pair']:
+                if matches_allele(hit, query) and id(hit) not in seen:
+                    seen.add(id(hit))
+                    found.append(hit)
+        return found
+
+
+def start_position(variant):
+    """Return the start of a variant, for sorting. Unknown starts come first."""
+    return variant['start'] if variant['start'] is not None else -1
+
+
+def matches_position(variant, query):
+    """Check the end position of a variant."""
+    end = variant.get('end')
+    if query.start is not None:
+        return query.end is None or end == query.end
+    if query.endMin is not None and (end is None or end < query.endMin):
+        return False
+    if query.endMax is not None and (end is None or end > query.endMax):
+        return False
+    return True
+
+
+def matches_allele(variant, query):
+    """Check the assembly, dataset, bases and type of a variant. `N` and unknown bases match anything."""
+    if variant.get('assemblyId') != query.assemblyId:
+        return False
+    if query.datasetIds and variant.get('datasetId') not in query.datasetIds:
+        return False
+    for key in ['referenceBases', 'alternateBases']:
+        wanted = getattr(query, key)
+        if wanted not in (None, 'N') and variant.get(key) is not None and variant.get(key) != wanted:
+            return False
+    if query.variantType is not None and variant_type(variant) != query.variantType:
+        return False
+    return True
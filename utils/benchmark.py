@@ -0,0 +1,102 @@
+"""Run the same tests against several beacons in parallel, and compare them.
+
+Each host is tested in its own process, with its own settings. The processes report
+the status and latency of each test back, which are shown side by side.
+"""
+import argparse
+import logging
+import multiprocessing
+import time
+
+import coloredlogs
+
+import config.config
+import utils.errors as err
+import utils.parallel
+import utils.setup
+import utils.stats
+
+
+def run_hosts(c_args):
+    """Test all hosts given in the arguments (`all` for all configured hosts), print a comparison."""
+    hosts = c_args.compare_hosts
+    if 'all' in hosts:
+        hosts = list(config.config.HOSTS)
+    logging.info(f'Testing {", ".join(hosts)}...')
+    with multiprocessing.get_context('spawn').Pool(len(hosts)) as pool:
+        reports = pool.starmap(run_host, [(c_args, host) for host in hosts])
+    print_comparison(reports)
+    return reports
+
+
+def run_host(c_args, host):
+    """Run the tests against one host, `repeat` times. Return a report."""
+    coloredlogs.install(level='WARNING', fmt=f'[{host}] %(levelname)s: %(message)s')
+    # the hosts would overwrite each other's cassettes, and the processes of the pool can't start more processes
+    c_args = argparse.Namespace(**{**vars(c_args), 'host': host, 'record': None, 'replay': None, 'validation_processes': 0})
+    settings = utils.setup.Settings()
+    report = {'host': host, 'url': None, 'tests': [], 'wall_time': 0.0, 'failure': None}
+    try:
+        settings.set_args(c_args)
+    except err.BeaconTestError:
+        report['failure'] = 'Could not set up the tests'
+        return report
+    report['url'] = settings.host
+    # the generated tests are made once, and run in each repeat
+    tests = settings.tests + list(settings.generated or [])
+    report['tests'] = [{'name': test['name'], 'status': 'skipped', 'latencies': []} for test in tests]
+
+    start = time.perf_counter()
+    # the repeats find the same specification errors, count those of the first pass
+    warnings = None
+    try:
+        for _ in range(c_args.repeat):
+            for test, result in zip(report['tests'], utils.parallel.run_tests(tests, settings.workers)):
+                if result.status == 'skipped':
+                    continue
+                test['latencies'].append(result.latency)
+                if test['status'] != 'failed':
+                    test['status'] = result.status
+            if warnings is None:
+                warnings = list(settings.warnings)
+    except err.BeaconTestError:
+        report['failure'] = 'Testing stopped unexpectedly'
+    report['wall_time'] = time.perf_counter() - start
+    if warnings is None:
+        warnings = settings.warnings
+    report['warnings'] = len(warnings)
+    report['unique_warnings'] = len(set(warnings))
+    return report
+
+
+def print_comparison(reports):
+    """Print the results of each host side by side."""
+    logging.info(f'\n\n{"":_^40}')
+    logging.info('Host comparison (latencies in ms):\n')
+    logging.info(f'  {"host":12} {"passed":>7} {"failed":>7} {"p50":>8} {"p95":>8} {"p99":>8} {"req/s":>8} {"spec errors":>12}')
+    for report in reports:
+        if report['failure']:
+            logging.error(f'  {report["host"]:12} {report["failure"]}')
+            continue
+        latencies = [lat for test in report['tests'] for lat in test['latencies']]
+        summary = utils.stats.summarize(latencies, report['wall_time'])
+        statuses = [test['status'] for test in report['tests']]
+        logging.info(f'  {report["host"]:12} {statuses.count("passed"):7} {statuses.count("failed"):7} '
+                     f'{utils.stats.in_ms(summary["p50"]):>8} {utils.stats.in_ms(summary["p95"]):>8} '
+                     f'{utils.stats.in_ms(summary["p99"]):>8} {summary.get("throughput", 0):8.1f} '
+                     f'{report["warnings"]:5} ({report["unique_warnings"]} unique)')
+
+    reports = [report for report in reports if not report['failure']]
+    if not reports:
+        return
+    logging.info('\nPer test (status, p50/p95 latency in ms), * marks tests with different results:\n')
+    logging.info(f'  {"":3} {"test":30} ' + ' '.join(f'{report["host"]:>22}' for report in reports))
+    for num, tests in enumerate(zip(*[report['tests'] for report in reports])):
+        cells = []
+        for test in tests:
+            summary = utils.stats.summarize(test['latencies'])
+            cells.append(f'{test["status"]:>7} {utils.stats.in_ms(summary["p50"]):>7}/{utils.stats.in_ms(summary["p95"]):<6}')
+        differs = '*' if len({test['status'] for test in tests}) > 1 else ' '
+        log = logging.warning if differs == '*' else logging.info
+        log(f'{differs} {num + 1:3} {tests[0]["name"][:30]:30} ' + ' '.join(cells))
+    logging.info('\n')
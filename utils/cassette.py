@@ -0,0 +1,106 @@
+"""Cassettes: files with recorded beacon responses.
+
+With `--record`, every response from the beacon is saved in a cassette. With `--replay`,
+the responses are read from the cassette instead of the beacon, so the tests can be run
+without any network access.
+
+A cassette is a gzip compressed file with one json object per line. The first line is a
+header, the others are the responses, identified by the path and the query parameters
+(not the host, so that a cassette can be replayed whatever the host is called).
+"""
+import base64
+import gzip
+import json
+import logging
+import threading
+
+import utils.errors as err
+
+
+FORMAT_VERSION = 1
+
+
+def request_key(request):
+    """Identify a request by its path and query, as a json serializable list."""
+    _host, path, query = request.cache_key()
+    return [path, [list(param) for param in query]]
+
+
+def encode_body(data):
+    """Return the body as text if possible, base64 otherwise, and the encoding used."""
+    try:
+        return data.decode('utf-8'), 'utf-8'
+    except UnicodeDecodeError:
+        return base64.b64encode(data).decode('ascii'), 'base64'
+
+
+def decode_body(text, encoding):
+    """Reverse encode_body."""
+    if encoding == 'base64':
+        return base64.b64decode(text)
+    return text.encode('utf-8')
+
+
+class Recorder():
+    """Write the responses to a new cassette."""
+
+    def __init__(self, filepath, host):
+        """Create the cassette."""
+        self.filepath = filepath
+        self.fileh = gzip.open(filepath, 'wt', encoding='utf-8')
+        self.fileh.write(json.dumps({'cassette': FORMAT_VERSION, 'host': host}) + '\n')
+        self.keys = set()
+        self.lock = threading.Lock()
+
+    def add(self, request, response):
+        """Save a response, unless one has already been saved for the same request."""
+        key = request_key(request)
+        body, encoding = encode_body(response.data)
+        line = json.dumps({'request': key, 'status': response.status_code, 'mimetype': response.mimetype,
+                           'error': response.error, 'body': body, 'encoding': encoding})
+        with self.lock:
+            if json.dumps(key) in self.keys:
+                return
+            self.keys.add(json.dumps(key))
+            self.fileh.write(line + '\n')
+
+    def close(self):
+        """Finish the cassette."""
+        with self.lock:
+            self.fileh.close()
+        logging.info(f'Recorded {len(self.keys)} responses in {self.filepath}')
+
+
+class Player():
+    """Serve the responses from a cassette."""
+
+    def __init__(self, filepath):
+        """Read the cassette."""
+        self.responses = {}
+        try:
+            with gzip.open(filepath, 'rt', encoding='utf-8') as fileh:
+                header = json.loads(fileh.readline())
+                if header.get('cassette') != FORMAT_VERSION:
+                    raise ValueError(f'unknown format {header.get("cassette")}')
+                for line in fileh:
+                    record = json.loads(line)
+                    self.responses[json.dumps(record['request'])] = record
+        except (OSError, ValueError) as error:
+            logging.error(f'Could not read the cassette {filepath}: {error}')
+            raise err.BeaconTestError()
+        self.host = header.get('host')
+        logging.info(f'Replaying {len(self.responses)} responses recorded from {self.host}')
+
+    def play(self, request, response):
+        """Fill in a response from the cassette."""
+        record = self.responses.get(json.dumps(request_key(request)))
+        if record is None:
+            logging.error('No recorded response for %s', request.url())
+            raise err.BeaconTestError()
+        response.status_code = record['status']
+        response.mimetype = record['mimetype']
+        response.error = record['error']
+        response.data = decode_body(record['body'], record['encoding'])
+
+    def close(self):
+        """Nothing to clean up."""
@@ -0,0 +1,227 @@
+"""Beacon data files (`beacondata`) in columns, to compute the expected results of queries over large files.
+
+The variants are kept in numpy arrays: the text fields as codes of their distinct values, the
+positions and counts as integers (-1 if unknown), the frequency as floats (nan if unknown). A
+query is answered with masks over the variants of its chromosome and start positions, so that
+the counts of the matching variants (`counts` in the tests) can be computed for big files.
+
+The matching is the same as in utils.beacondata.VariantIndex, which is used by the mock beacon.
+numpy is in the requirements, but only imported when there are counts to check. Without it, checking
+the counts of the tests fails.
+"""
+import array
+import logging
+import math
+from pathlib import Path
+
+import utils.beacondata
+import utils.errors as err
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+TEXT_FIELDS = ['assemblyId', 'datasetId', 'referenceBases', 'alternateBases', 'variantType']
+COUNT_FIELDS = ['variantCount', 'callCount', 'sampleCount']
+# Code of unknown (None) text values and value of unknown positions and counts
+UNKNOWN = -1
+
+
+class Codes():
+    """The distinct values of a text field, and the code of each."""
+
+    def __init__(self):
+        """Start with no values."""
+        self.codes = {}
+
+    def encode(self, value):
+        """Return the code of a value, add it if it is new."""
+        if value is None:
+            return UNKNOWN
+        return self.codes.setdefault(value, len(self.codes))
+
+    def get(self, value):
+        """Return the code of a value, or None if no variant has it."""
+        if value is None:
+            return UNKNOWN
+        return self.codes.get(value)
+
+
+class VariantColumns():
+    """The variants of one or more data files, in columns.
+
+    The rows hold the fields of each variant. The ends hold the positions: one per variant, and
+    another one for breakends (variantType BND), so that they are found from either chromosome.
+    The ends are sorted by chromosome and start position.
+    """
+
+    def __init__(self, rows=()):
+        """Read the rows into columns."""
+        if numpy is None:
+            logging.error('Install numpy to compute the results of the data files')
+            raise err.BeaconTestError()
+        self.codes = {field: Codes() for field in TEXT_FIELDS + ['referenceName']}
+        fields = {field: array.array('q') for field in TEXT_FIELDS + COUNT_FIELDS}
+        fields['mate'] = array.array('b')
+        fields['frequency'] = array.array('d')
+        ends = {field: array.array('q') for field in ['row', 'referenceName', 'mateName', 'start', 'end']}
+        num = -1
+        for num, row in enumerate(rows):
+            self.add_row(row, num, fields, ends)
+        self.size = num + 1
+        self.fields = {field: numpy.frombuffer(values, dtype=values.typecode) for field, values in fields.items()}
+        order = numpy.lexsort((ends['start'], ends['referenceName']))
+        self.ends = {field: numpy.frombuffer(values, dtype=values.typecode)[order] for field, values in ends.items()}
+
+    @classmethod
+    def from_files(cls, filepaths):
+        """Read data files."""
+        return cls(row for filepath in filepaths for row in utils.beacondata.read_rows(filepath))
+
+    def add_row(self, row, num, fields, ends):
+        """Add the fields of one variant, and its ends."""
+        end = row.get('end')
+        if end is None and row.get('start') is not None and row.get('referenceBases'):
+            # like the beacons, use the end of the reference bases
+            end = row['start'] + len(row['referenceBases'])
+        variant_type = utils.beacondata.variant_type(row)
+        for field in TEXT_FIELDS:
+            fields[field].append(self.codes[field].encode(variant_type if field == 'variantType' else row.get(field)))
+        for field in COUNT_FIELDS:
+            fields[field].append(known(row.get(field)))
+        fields['frequency'].append(row['frequency'] if row.get('frequency') is not None else math.nan)
+        has_mate = variant_type == 'BND' and bool(row.get('mateName'))
+        fields['mate'].append(has_mate)
+        positions = [(row.get('referenceName'), row.get('mateName'), row.get('start'), end)]
+        if has_mate:
+            positions.append((row['mateName'], row.get('referenceName'), end, row.get('start')))
+        names = self.codes['referenceName']
+        for reference_name, mate_name, start, stop in positions:
+            ends['row'].append(num)
+            ends['referenceName'].append(names.encode(reference_name))
+            ends['mateName'].append(names.encode(mate_name))
+            ends['start'].append(known(start))
+            ends['end'].append(known(stop))
+
+    def hits(self, query):
+        """Return the numbers of the rows that match a query (a utils.beacondata.Query), in order."""
+        first, last = self.window(query)
+        ends = {field: values[first:last] for field, values in self.ends.items()}
+        mask = numpy.ones(last - first, dtype=bool)
+        if query.start is not None:
+            if query.end is not None:
+                mask &= ends['end'] == query.end
+        else:
+            if query.endMin is not None:
+                mask &= ends['end'] >= query.endMin
+            if query.endMax is not None:
+                mask &= (ends['end'] <= query.endMax) & (ends['end'] != UNKNOWN)
+        if query.mateName is not None:
+            mask &= ends['mateName'] == self.codes['referenceName'].get(query.mateName)
+        rows = numpy.unique(ends['row'][mask])
+        return rows[self.allele_mask(query, rows)]
+
+    def window(self, query):
+        """Return the range of the ends on the chromosome of a query that start at the right positions."""
+        code = self.codes['referenceName'].get(query.referenceName)
+        if code is None:
+            return 0, 0
+        names = self.ends['referenceName']
+        first, last = numpy.searchsorted(names, code, 'left'), numpy.searchsorted(names, code, 'right')
+        if query.start is not None:
+            start_min = start_max = query.start
+        else:
+            start_min, start_max = query.startMin, query.startMax
+        starts = self.ends['start'][first:last]
+        if start_min is not None:
+            first += numpy.searchsorted(starts, start_min, 'left')
+            starts = self.ends['start'][first:last]
+        if start_max is not None:
+            last = first + numpy.searchsorted(starts, start_max, 'right')
+        return int(first), int(last)
+
+    def allele_mask(self, query, rows):
+        """Return which of the rows match the assembly, datasets, bases and type of a query.
+
+        The other end of a breakend has unknown reference bases, so it matches any.
+        """
+        fields = {field: values[rows] for field, values in self.fields.items()}
+        mask = fields['assemblyId'] == self.code('assemblyId', query.assemblyId)
+        if query.datasetIds:
+            codes = [self.codes['datasetId'].get(dataset_id) for dataset_id in query.datasetIds]
+            mask &= numpy.isin(fields['datasetId'], [code for code in codes if code is not None])
+        for key in ['referenceBases', 'alternateBases']:
+            wanted = getattr(query, key)
+            if wanted not in (None, 'N'):
+                matches = (fields[key] == UNKNOWN) | (fields[key] == self.code(key, wanted))
+                if key == 'referenceBases':
+                    matches |= fields['mate'].astype(bool)
+                mask &= matches
+        if query.variantType is not None:
+            mask &= fields['variantType'] == self.code('variantType', query.variantType)
+        return mask
+
+    def code(self, field, value):
+        """Return the code of a value, or a code that no variant has."""
+        code = self.codes[field].get(value)
+        return code if code is not None else len(self.codes[field].codes)
+
+    def counts(self, query):
+        """Return the counts of the variants that match a query: the sums of COUNT_FIELDS, and the frequency.
+
+        Unknown counts are left out of the sums, a sum is None if no matching variant has the count.
+        The frequency is the one of the variant if there is one, otherwise variantCount / callCount.
+        """
+        rows = self.hits(query)
+        counts = {}
+        for field in COUNT_FIELDS:
+            values = self.fields[field][rows]
+            values = values[values != UNKNOWN]
+            counts[field] = int(values.sum()) if len(values) else None
+        if len(rows) == 1 and not math.isnan(self.fields['frequency'][rows[0]]):
+            counts['frequency'] = float(self.fields['frequency'][rows[0]])
+        elif counts['variantCount'] is not None and counts['callCount']:
+            counts['frequency'] = counts['variantCount'] / counts['callCount']
+        else:
+            counts['frequency'] = None
+        return counts
+
+
+def known(value):
+    """Return an integer value, or UNKNOWN."""
+    return value if value is not None else UNKNOWN
+
+
+def check_counts(testfile, tests, data=None):
+    """Compare the `counts` of the tests to the counts of their data files. Return a list of errors.
+
+    The data files are read once and kept in `data` (path -> VariantColumns).
+    """
+    data = data if data is not None else {}
+    messages = []
+    for test in tests:
+        if not (test.get('counts') and test.get('query') and test.get('beacondata')):
+            continue
+        if numpy is None:
+            messages.append(f'{testfile}: the counts of the tests can not be checked, numpy is not installed '
+                            '(pip3 install -r requirements.txt)')
+            return messages
+        filepath = str(Path(testfile).parent / test['beacondata'])
+        if filepath not in data:
+            data[filepath] = VariantColumns.from_files([filepath])
+        counts = data[filepath].counts(utils.beacondata.make_query(test['query']))
+        for field in COUNT_FIELDS + ['frequency']:
+            expected = test['counts'].get(field)
+            if expected is not None and not numbers_match(expected, counts[field]):
+                messages.append(f'{testfile}: test {test["name"]}: {field} is {expected}, '
+                                f'but {counts[field]} in {test["beacondata"]}')
+    return messages
+
+
+def numbers_match(expected, actual):
+    """Compare a count or frequency."""
+    if actual is None:
+        return False
+    return math.isclose(expected, actual, rel_tol=1e-9)
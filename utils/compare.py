@@ -10,13 +10,18 @@ SORT_BY = {
 }
 
 
-def assert_partly_in(gold, response, key):
-    """Compare two objects to see that everything in the gold object is also in the other."""
+def assert_partly_in(gold, response, key, index=None):
+    """Compare two objects to see that everything in the gold object is also in the other.
+
+    `index` is a ResponseIndex of the response, to be shared between several comparisons.
+    """
     #  find best match
     #  collect all diffs for this match
     assert key in response, f'Bad response, could not find {key} in {response}'
     assert response[key], f'Too few elements, could not find {gold}'
-    comparable = find_matching_object(gold, response, key)
+    if index is None:
+        index = ResponseIndex(response)
+    comparable = index.find(gold, key)
     errors = compare_obj(gold, comparable)
     if errors:
         raise err.ResponseError(errors)
@@ -32,31 +37,82 @@ def assert_not_in(exclude, response, key):
         raise err.ResponseError(errors)
 
 
+class ResponseIndex():
+    """Find the objects of a response that best match gold objects.
+
+    For the keys in SORT_BY, the identifiers of all objects in the list are indexed the
+    first time the key is looked up, so that exact matches are found without going
+    through the list again.
+    """
+
+    def __init__(self, response):
+        """Set up an empty index of the response."""
+        self.response = response
+        self.indexes = {}
+
+    def find(self, gold, key):
+        """Return the object that best matches the gold object, see `find_matching_object`."""
+        match = self.exact(gold, key)
+        if match is not None:
+            return match
+        return best_match(gold, self.response[key], key)
+
+    def exact(self, gold, key):
+        """Return the first object with the same identifiers as the gold object, or None."""
+        if key not in SORT_BY:
+            return None
+        try:
+            return self.index(key).get(tuple(get_sort_ids(gold, key)))
+        except TypeError:
+            # unhashable identifiers
+            return None
+
+    def index(self, key):
+        """Return the index of the objects in the list, by their identifiers."""
+        if key not in self.indexes:
+            index = {}
+            for obj in self.response[key]:
+                try:
+                    # the first object wins, like in the linear search
+                    index.setdefault(tuple(get_sort_ids(obj, key)), obj)
+                except TypeError:
+                    continue
+            self.indexes[key] = index
+        return self.indexes[key]
+
+
 def find_matching_object(gold, resp, key):
-    """Compare to objects by a given set of identifiers. Return the number of mismatches."""
-    def find_best_match(alist):
-        """Sort by fst (identifier), return snd (an object)."""
-        if not alist:
-            return {}
-        return sorted(alist, key=lambda x: x[0])[0][1]
-
-    def get_sort_ids(obj):
-        """Sort by normalized key."""
-        if key in SORT_BY:
-            sorters = SORT_BY.get(key)
-        else:
-            sorters = obj.keys()
-        return [normalize(obj.get(sorter)) for sorter in sorters]
-
-    def compare_identifiers(gold, cmp):
-        """Compare to objects by a given set of identifiers. Return the number of mismatches."""
-        gold_id = get_sort_ids(gold)
-        cmp_id = get_sort_ids(cmp)
-        if gold_id == cmp_id:
-            return 0
-        return len([1 for (g, c) in zip(gold_id, cmp_id) if g != c])
-
-    return find_best_match([(compare_identifiers(gold, obj), obj) for obj in resp[key]])
+    """Find the object in resp[key] that has the fewest identifiers that differ from the gold object."""
+    return ResponseIndex(resp).find(gold, key)
+
+
+def best_match(gold, alist, key):
+    """Return the first object with the fewest mismatching identifiers, or {} for empty lists."""
+    gold_id = get_sort_ids(gold, key)
+    best, best_score = {}, None
+    for obj in alist:
+        score = compare_identifiers(gold_id, get_sort_ids(obj, key))
+        if best_score is None or score < best_score:
+            best, best_score = obj, score
+            if not score:
+                break
+    return best
+
+
+def get_sort_ids(obj, key):
+    """Return the normalized identifiers of an object in a list."""
+    if key in SORT_BY:
+        sorters = SORT_BY.get(key)
+    else:
+        sorters = obj.keys()
+    return [normalize(obj.get(sorter)) for sorter in sorters]
+
+
+def compare_identifiers(gold_id, cmp_id):
+    """Compare two lists of identifiers. Return the number of mismatches."""
+    if gold_id == cmp_id:
+        return 0
+    return len([1 for (g, c) in zip(gold_id, cmp_id) if g != c])
 
 
 def compare_obj(gold, obj):
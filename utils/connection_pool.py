@@ -0,0 +1,181 @@
+"""Keep-alive connections to the beacons.
+
+`urllib.request.urlopen` opens a new connection (and for https, does a new TLS handshake)
+for each request. The pool keeps the connections to each host open and reuses them.
+Responses are read in full before the connection is given back to the pool. The body
+can be handed over in chunks as it is read, eg. to parse it at the same time (see utils.json_stream).
+"""
+import http.client
+import io
+import queue
+import sys
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import utils.results
+
+
+REDIRECTS = (301, 302, 303, 307, 308)
+MAX_REDIRECTS = 10
+# bytes read at a time, when the body is handed over in chunks
+CHUNK_SIZE = 64 * 1024
+# Mimic urllib, so that the beacons see the same requests as before
+HEADERS = {'User-Agent': f'Python-urllib/{sys.version_info[0]}.{sys.version_info[1]}',
+           'Connection': 'keep-alive'}
+
+
+class PooledResponse():
+    """A response that has been read in full. Has the same interface as the responses from urllib."""
+
+    def __init__(self, url, status, headers, body):
+        """Set up a response object."""
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def read(self):
+        """Return the response body."""
+        return self.body
+
+    def getcode(self):
+        """Return the http status code."""
+        return self.status
+
+    def info(self):
+        """Return the response headers."""
+        return self.headers
+
+
+class HostPool():
+    """Connections to one host. At most `size` connections are used at the same time."""
+
+    def __init__(self, scheme, netloc, size, timeout):
+        """Set up an empty pool."""
+        if scheme == 'https':
+            self.connection_class = http.client.HTTPSConnection
+        else:
+            self.connection_class = http.client.HTTPConnection
+        self.netloc = netloc
+        self.timeout = timeout
+        self.idle = queue.LifoQueue()
+        self.slots = threading.BoundedSemaphore(size)
+
+    def request(self, method, selector, on_chunk=None):
+        """Send a request, return the response and its body.
+
+        With `on_chunk`, the body is given to it in chunks instead, and the returned body is None.
+        """
+        received = []
+        if on_chunk is not None:
+            def receive(chunk):
+                received.append(len(chunk))
+                on_chunk(chunk)
+        else:
+            receive = None
+        with self.slots:
+            try:
+                conn, reused = self.idle.get_nowait(), True
+            except queue.Empty:
+                conn, reused = self.new_connection(), False
+            try:
+                response, body = self.send(conn, method, selector, receive)
+            except (http.client.HTTPException, ConnectionError):
+                conn.close()
+                if not reused or received:
+                    raise
+                # the server may have closed the idle connection, try once more with a new one
+                conn = self.new_connection()
+                response, body = self.send(conn, method, selector, receive)
+            if response.will_close:
+                conn.close()
+            else:
+                self.idle.put(conn)
+        return response, body
+
+    def new_connection(self):
+        """Make a new (not yet connected) connection."""
+        return self.connection_class(self.netloc, timeout=self.timeout)
+
+    @staticmethod
+    def send(conn, method, selector, on_chunk=None):
+        """Send a request on a connection and read the full response. The body of redirects is never given to `on_chunk`."""
+        try:
+            if conn.sock is None:
+                with utils.results.timed('connect'):
+                    conn.connect()
+            with utils.results.timed('ttfb'):
+                conn.request(method, selector, headers=HEADERS)
+                response = conn.getresponse()
+            with utils.results.timed('body'):
+                if on_chunk is None or response.status in REDIRECTS:
+                    return response, response.read()
+                while True:
+                    chunk = response.read(CHUNK_SIZE)
+                    if not chunk:
+                        return response, None
+                    on_chunk(chunk)
+        except Exception:
+            conn.close()
+            raise
+
+    def close(self):
+        """Close all idle connections."""
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class ConnectionPool():
+    """Connections to all hosts."""
+
+    def __init__(self, size=10, timeout=60):
+        """Set up the pool. `size` is the number of connections per host, `timeout` is in seconds."""
+        self.size = size
+        self.timeout = timeout
+        self.hosts = {}
+        self.lock = threading.Lock()
+        self.proxies = urllib.request.getproxies()
+
+    def urlopen(self, url, redirects=0, on_chunk=None):
+        """Open a url. Raise the same errors as urllib.request.urlopen.
+
+        With `on_chunk`, the body is given to it in chunks as it is read (see HostPool.request), and not
+        kept in the response. Responses through a proxy are read in full, and not given to `on_chunk`.
+        """
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.netloc:
+            raise ValueError(f'unknown url type: {url}')
+        if parts.scheme in self.proxies and not urllib.request.proxy_bypass(parts.hostname):
+            # leave proxy handling to urllib
+            return urllib.request.urlopen(url, timeout=self.timeout)
+
+        selector = urllib.parse.urlunsplit(('', '', parts.path or '/', parts.query, ''))
+        try:
+            response, body = self.host_pool(parts.scheme, parts.netloc).request('GET', selector, on_chunk)
+        except (http.client.HTTPException, OSError) as error:
+            raise urllib.error.URLError(error)
+
+        location = response.getheader('Location')
+        if response.status in REDIRECTS and location and redirects < MAX_REDIRECTS:
+            return self.urlopen(urllib.parse.urljoin(url, location), redirects + 1, on_chunk)
+        if response.status >= 400:
+            raise urllib.error.HTTPError(url, response.status, response.reason, response.msg, io.BytesIO(body or b''))
+        return PooledResponse(url, response.status, response.msg, body)
+
+    def host_pool(self, scheme, netloc):
+        """Get the pool for a host, create it if needed."""
+        with self.lock:
+            if (scheme, netloc) not in self.hosts:
+                self.hosts[(scheme, netloc)] = HostPool(scheme, netloc, self.size, self.timeout)
+            return self.hosts[(scheme, netloc)]
+
+    def close(self):
+        """Close all idle connections."""
+        with self.lock:
+            for pool in self.hosts.values():
+                pool.close()
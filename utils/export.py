@@ -1,47 +1,87 @@
+import gzip
+import hashlib
 import logging
+import sys
 import tempfile
 from pathlib import Path
 import yaml
 import config.config
+import utils.beacondata
 import utils.jsonschemas
+import utils.vcf
 
 
-def export_csv_testdata(filepaths):
-    """Export data in csv from a list of test file paths."""
-    sep = get_separator('csv')
-    schema_path = config.config.TEST_SPEC
-    schema = yaml.load(open(schema_path), Loader=yaml.SafeLoader)
-    variants_headers = schema['definitions']['datafields'].keys()
+def export_csv_testdata(filepaths, output='-', columns=None):
+    """Write the variants of the data files of some tests to `output` (a path, `-` for stdout).
 
-    variants = []
-    for testfile in filepaths:
-        testyaml = utils.jsonschemas.load_and_validate_test(testfile)
-        variant = extract_data(testyaml, variants_headers, sep)
-        variants += variant
+    The rows are written as they are read, in the order of the tests, each distinct row once.
+    The format is tsv if `output` ends with .tsv (or .tsv.gz), otherwise csv; .gz files are
+    compressed. `columns` defaults to the data fields of the test schema.
+    """
+    sep = get_separator('tsv' if output.replace('.gz', '').endswith('.tsv') else 'csv')
+    if columns is None:
+        with open(config.config.TEST_SPEC) as schema_file:
+            schema = yaml.load(schema_file, Loader=yaml.SafeLoader)
+        columns = list(schema['definitions']['datafields'].keys())
+
+    if output == '-':
+        fileh = sys.stdout
+    elif output.endswith('.gz'):
+        fileh = gzip.open(output, 'wt')
+    else:
+        fileh = open(output, 'w')
+    written = 0
+    try:
+        fileh.write(f'# {sep.join(columns)}\n')
+        for line in unique_lines(extract_rows(filepaths, columns, sep)):
+            fileh.write(line + '\n')
+            written += 1
+    finally:
+        if fileh is not sys.stdout:
+            fileh.close()
+    logging.info(f'>> Wrote {written} variants to {output}.')
+
+
+def extract_rows(filepaths, columns, sep):
+    """Yield the variants of the data files of the tests as lines. Each data file is only read once."""
+    seen = set()
+    for datafile in data_file_paths(filepaths):
+        if datafile in seen:
+            continue
+        seen.add(datafile)
+        for row in utils.beacondata.read_rows(datafile):
+            yield sep.join(str(row.get(column)) for column in columns)
 
-    variant_header = [f"# {sep.join(variants_headers)}"]
-    output = '\n'.join(variant_header + list(set(variants)))
-    return output
 
+def unique_lines(lines):
+    """Yield the lines that have not been seen before, in order.
 
-def export_vcf_testdata(filepaths):
-    """Extract all vcf lines that a test refers to."""
-    refs = get_vcf_references(filepaths)
-    data = []
-    for filep, ids in refs.items():
-        metadata, info = get_vcf_data(filep, ids)
-        if info:
-            data.append((filep, metadata, info))
-    return data
+    Only a 64-bit hash of each line is kept, to use little memory also for big exports.
+    """
+    seen = set()
+    for line in lines:
+        digest = hashlib.blake2b(line.encode(), digest_size=8).digest()
+        if digest not in seen:
+            seen.add(digest)
+            yield line
 
 
-def extract_data(testyaml, variants_headers, sep):
-    """Extract the data (for the beacon's database) from a test file."""
-    variants = []
-    for test in testyaml:
-        if 'beacondata' in test:
-            variants.extend(extract_variants(test['beacondata'], variants_headers, sep))
-    return variants
+def export_vcf_testdata(filepaths, print_metadata):
+    """Extract all vcf lines that the tests refer to, write them to one new vcf file per data file."""
+    refs = get_vcf_references(filepaths)
+    for filep, ids in refs.items():
+        path = find_vcf_file(filep)
+        if path is None:
+            continue
+        fh = tempfile.NamedTemporaryFile(dir='.', prefix='testdata_', suffix='.vcf', delete=False)
+        logging.info(f'>> Writing from {filep} to {Path(fh.name).name}.')
+        with fh:
+            matched_id = utils.vcf.extract(path, ids, fh, print_metadata)
+        if not matched_id and '*' not in ids:
+            logging.info(f'>> Nothing found in {filep}, removing {Path(fh.name).name}.')
+            Path(fh.name).unlink()
+        if len(matched_id) < len(ids - {'*'}):
+            logging.warning(f'No vcf matches for id {", ".join(ids.difference(matched_id, {"*"}))}')
 
 
 def extract_metadata(beacondata, headers, separator):
@@ -55,17 +95,6 @@ def extract_metadata(beacondata, headers, separator):
     return meta
 
 
-def extract_variants(beacondata, headers, separator):
-    """Extract the variants from the test file."""
-    meta = []
-    for dataset in beacondata.get('variants', []):
-        data, output = dataset['variant'], []
-        for header in headers:
-            output.append(str(data.get(header)))
-        meta.append(separator.join(output))
-    return meta
-
-
 def get_separator(out_format):
     """
     Define how elements should be separated.
@@ -77,26 +106,15 @@ def get_separator(out_format):
     return '\t'
 
 
-def get_vcf_data(filep, ids):
-    """Extract relevant lines from a vcf."""
+def find_vcf_file(filep):
+    """Find a vcf file, either at the given path or in the testdata directory."""
     path = Path(filep)
-    metadata, info = [], []
-    matched_id = set()
     if not path.exists():
         path = 'testdata' / Path(filep)
         if not path.exists():
             logging.warning(f'vcf file {path} not found')
-            return metadata, info
-    for line in open(path):
-        if line.startswith('#'):
-            metadata.append(line)
-            continue
-        matched_id.update(vcf_match_id(line, ids))
-        if '*' in ids or matched_id:
-            info.append(line)
-    if len(matched_id) < len(ids):
-        logging.warning(f'No vcf matches for id {", ".join(ids.difference(matched_id))}')
-    return metadata, info
+            return None
+    return path
 
 
 def get_vcf_references(filepaths):
@@ -113,34 +131,21 @@ def get_vcf_references(filepaths):
     return refs
 
 
-def print_vcf_files(data, print_metadata):
-    """Print data to a vcf file."""
-    for name, metadata, info in data:
-        fh = tempfile.NamedTemporaryFile(dir='.', prefix='testdata_', suffix='.vcf', delete=False)
-        logging.info(f'>> Writing from {name} to {Path(fh.name).name}.')
-        for line in metadata:
-            if not line.startswith('##') or print_metadata:
-                fh.file.write(line.encode())
-        fh.file.write(''.join(info).encode())
-        fh.close()
+def show_data_files(testfiles):
+    """Print all names of all test data files used by the given tests."""
+    print('\n'.join(data_files(testfiles)))
 
 
-def vcf_match_id(line, ids):
-    """Check whether the ids on a vcf line matches any of the given ones."""
-    try:
-        lineids = line.split('\t')[2].split(',')
-    except IndexError:
-        logging.warning(f'Could not find id in vcf line {line}')
-    return ids.intersection(lineids)
+def data_files(testfiles):
+    """Return the paths of all test data files used by the given tests."""
+    return sorted(set(data_file_paths(testfiles)))
 
 
-def show_data_files(testfiles):
-    """Print all names of all test data files used by the given tests."""
-    datafiles = set()
+def data_file_paths(testfiles):
+    """Yield the path of the data file of each test that has one, in order."""
     for testfile in testfiles:
         testdir = Path(testfile).parent
         testyaml = utils.jsonschemas.load_and_validate_test(testfile)
         for test in testyaml:
             if 'beacondata' in test:
-                datafiles.add(str(testdir / test['beacondata']))
-    print('\n'.join(datafiles))
+                yield str(testdir / test['beacondata'])
@@ -0,0 +1,98 @@
+"""Generate tests from beacon data files (`beacondata`).
+
+Each variant in the data files gives a few tests (KINDS), some that should find it and some
+that should not: the exact variant, the position after it, a range around it, another
+alternate allele and a dataset that does not exist. The expected results are found by
+searching all variants in the files (utils.beacondata.VariantIndex), like the mock beacon
+does, so that eg. another variant at the next position is expected to be found.
+
+The tests are made one at a time, while they are run. Breakends (BND) are left out, they
+are covered by the mate tests.
+"""
+import logging
+import os
+
+import utils.beacondata
+
+
+KINDS = ['exact', 'off_by_one', 'range', 'wrong_allele', 'missing_dataset']
+DESCRIPTIONS = {'exact': 'Query a variant of the data file',
+                'off_by_one': 'Query the position after a variant of the data file',
+                'range': 'Query a range around a variant of the data file',
+                'wrong_allele': 'Query another alternate allele than the one of a variant of the data file',
+                'missing_dataset': 'Query a variant of the data file in a dataset that does not exist'}
+# Bases before and after a variant in range queries
+RANGE_WINDOW = 10
+BASES = ['A', 'C', 'G', 'T']
+
+
+def generate_tests(filepaths, limit=0):
+    """Yield tests for the variants in the data files, at most `limit` (0: no limit)."""
+    logging.info(f'Indexing {", ".join(filepaths)} for the generated tests')
+    index = utils.beacondata.VariantIndex.from_files(filepaths)
+    count = 0
+    for filepath in filepaths:
+        for num, row in enumerate(utils.beacondata.read_rows(filepath), 1):
+            for test in row_tests(index, filepath, num, row):
+                yield test
+                count += 1
+                if count == limit:
+                    return
+
+
+def row_tests(index, filepath, num, row):
+    """Yield the tests of one variant (the `num`:th of the file)."""
+    if row.get('start') is None or not row.get('referenceBases') or utils.beacondata.variant_type(row) == 'BND':
+        return
+    queries = make_queries(row)
+    for kind in KINDS:
+        if queries.get(kind) is None:
+            continue
+        yield {'name': f'generated_{kind}:{os.path.basename(filepath)}:{num}',
+               'descr': f'{DESCRIPTIONS[kind]} ({row["referenceName"]}:{row["start"]} '
+                        f'{row["referenceBases"]}>{row.get("alternateBases") or row.get("variantType")}).',
+               'query': queries[kind],
+               'results': expected_results(index, queries[kind]),
+               'beacondata': str(filepath)}
+
+
+def make_queries(row):
+    """Return the queries of each kind for a variant. Kinds that don't apply to the variant are left out."""
+    exact = {'includeDatasetResponses': 'HIT',
+             'assemblyId': row.get('assemblyId'),
+             'referenceName': row['referenceName'],
+             'start': row['start'],
+             'referenceBases': row['referenceBases']}
+    if row.get('end') is not None:
+        exact['end'] = row['end']
+    if row.get('alternateBases'):
+        exact['alternateBases'] = row['alternateBases']
+    else:
+        exact['variantType'] = utils.beacondata.variant_type(row)
+    if row.get('datasetId'):
+        exact['datasetIds'] = [row['datasetId']]
+
+    queries = {'exact': exact,
+               'off_by_one': {**exact, 'start': row['start'] + 1}}
+    if row.get('end') is not None:
+        queries['off_by_one']['end'] = row['end'] + 1
+        queries['range'] = {**{key: val for key, val in exact.items() if key not in ('start', 'end')},
+                            'startMin': max(0, row['start'] - RANGE_WINDOW), 'startMax': row['start'] + RANGE_WINDOW,
+                            'endMin': max(0, row['end'] - RANGE_WINDOW), 'endMax': row['end'] + RANGE_WINDOW}
+    other_bases = [base for base in BASES if base not in (row.get('alternateBases'), row['referenceBases'])]
+    if row.get('alternateBases') in BASES and other_bases:
+        queries['wrong_allele'] = {**exact, 'alternateBases': other_bases[0]}
+    if row.get('datasetId'):
+        queries['missing_dataset'] = {**exact, 'datasetIds': [f'{row["datasetId"]}:missing']}
+    return queries
+
+
+def expected_results(index, query):
+    """Return the checks of a query: which datasets have a matching variant, or that none has."""
+    hits = index.search(utils.beacondata.make_query(query))
+    if not hits:
+        return [{'property': 'exists', 'assert': 'is_false'}]
+    datasets = sorted({hit['datasetId'] for hit in hits if hit.get('datasetId')})
+    return [{'property': 'exists', 'assert': 'is_true'}] + \
+           [{'property': 'datasetAlleleResponses', 'assert': 'contains', 'data': {'datasetId': dataset_id, 'exists': True}}
+            for dataset_id in datasets]
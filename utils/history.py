@@ -0,0 +1,78 @@
+"""Durations and failures of the tests in earlier runs, per host.
+
+Used to run the tests that failed recently, and the fast ones, first (`--prioritize`),
+so that a broken beacon is noticed quickly.
+"""
+import json
+import os
+import time
+
+import utils.results
+import utils.spec_cache
+
+
+HISTORY_FILE = 'history.json'
+# Weight of the latest run in the moving averages
+ALPHA = 0.3
+# Failure rate assumed for tests without history, they are likely new and being worked on
+NEW_TEST_FAILURE_RATE = 0.5
+
+
+class History():
+    """The history of the tests against one host."""
+
+    def __init__(self, directory, host):
+        """Read the history."""
+        self.path = os.path.join(directory, HISTORY_FILE)
+        self.host = host
+        try:
+            with open(self.path) as fileh:
+                self.hosts = json.load(fileh)
+        except (OSError, ValueError):
+            self.hosts = {}
+        self.tests = self.hosts.setdefault(host, {})
+        # the median duration, for tests without history. Found when needed, and again after changes
+        self.median = None
+
+    def update(self, test, result):
+        """Add the result of a test that was run."""
+        self.add(utils.results.test_key(test), test['name'], result.status, result.duration)
+
+    def add(self, key, name, status, duration):
+        """Add the status and duration (seconds) of a test run. Only passed and failed tests are counted."""
+        if status not in ('passed', 'failed'):
+            return
+        failed = 1.0 if status == 'failed' else 0.0
+        self.median = None
+        entry = self.tests.get(key)
+        if entry is None:
+            entry = self.tests[key] = {'name': name, 'runs': 0, 'duration': duration, 'failure_rate': failed}
+        entry['runs'] += 1
+        entry['duration'] = ALPHA * duration + (1 - ALPHA) * entry['duration']
+        entry['failure_rate'] = ALPHA * failed + (1 - ALPHA) * entry['failure_rate']
+        entry['last_run'] = time.time()
+        if failed:
+            entry['last_failure'] = entry['last_run']
+
+    def duration(self, test):
+        """Return the expected duration of a test (seconds), the median of all tests if it has no history."""
+        entry = self.tests.get(utils.results.test_key(test))
+        if entry is not None:
+            return entry['duration']
+        if self.median is None:
+            durations = sorted(entry['duration'] for entry in self.tests.values())
+            self.median = durations[len(durations) // 2] if durations else 0.0
+        return self.median
+
+    def failure_rate(self, test):
+        """Return the recent failure rate of a test."""
+        entry = self.tests.get(utils.results.test_key(test))
+        return entry['failure_rate'] if entry is not None else NEW_TEST_FAILURE_RATE
+
+    def prioritize(self, tests):
+        """Return the tests ordered by recent failures (most first), then by duration (fastest first)."""
+        return sorted(tests, key=lambda test: (-round(self.failure_rate(test), 2), self.duration(test)))
+
+    def save(self):
+        """Write the history."""
+        utils.spec_cache.write_file(self.path, json.dumps(self.hosts, indent=1).encode())
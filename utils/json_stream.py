@@ -0,0 +1,203 @@
+"""Parse json responses while they arrive.
+
+A beacon response is an object, with one list that may be very long (`datasetAlleleResponses`).
+`ListStream` is given the body in chunks, as they are read from the connection. It parses the
+object one value at a time, and hands over each item of the list as soon as it is complete,
+so that the checks of the list can run while the rest of the body is still arriving. The
+values are parsed by the json module, so the body is parsed at full speed. A value that is cut off
+at the end of a chunk is only parsed again once its closing bracket or quote may have arrived, and
+at least as much text as was tried before has been added, so that big values that span many chunks
+are parsed a few times at most, not once per chunk.
+
+The raw body is kept as well, up to a limit. Bigger bodies are only kept in their parsed form.
+"""
+import codecs
+import json
+import re
+
+
+WHITESPACE = re.compile(r'\s*')
+DECODER = json.JSONDecoder()
+# The last character of the values that start with these
+CLOSERS = {'{': '}', '[': ']', '"': '"'}
+
+
+class ListStream():
+    """Parse a json object incrementally, hand over the items of `prop` (a list) one at a time."""
+
+    def __init__(self, prop, on_item=None, limit=None):
+        """Set up the parser.
+
+        on_item - is called with each item of the list, once it is complete
+        limit   - number of bytes of the raw body to keep, None for all of it
+        """
+        self.prop = prop
+        self.on_item = on_item
+        self.limit = limit
+        self.chunks = []
+        self.size = 0
+        # the text to parse, from `pos`, and the text that has arrived since it was last parsed
+        self.text = ''
+        self.pos = 0
+        self.pending = []
+        self.pending_size = 0
+        # the pending text needed, and the closing character to look for, before the cut off value is tried again
+        self.wait_size = 0
+        self.closer = None
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.state = 'start'
+        self.key = None
+        self.obj = None
+        self.items = None
+        self.error = None
+        self.closed = False
+
+    @property
+    def fed(self):
+        """Check whether any data has been given."""
+        return self.size > 0
+
+    @property
+    def done(self):
+        """Check whether the whole body has been parsed."""
+        return self.closed and self.error is None
+
+    def feed(self, chunk):
+        """Parse the next part of the body."""
+        self.size += len(chunk)
+        if self.chunks is not None:
+            if self.limit is not None and self.size > self.limit:
+                self.chunks = None
+            else:
+                self.chunks.append(chunk)
+        if self.error is None:
+            text = self.decoder.decode(chunk)
+            self.pending.append(text)
+            self.pending_size += len(text)
+            if self.closer is not None and self.closer in text:
+                self.closer = None
+            over_limit = self.limit is not None and self.pending_size > self.limit
+            if (self.pending_size >= self.wait_size and self.closer is None) or over_limit:
+                self.parse(final=False)
+
+    def close(self):
+        """Parse the end of the body. Return the raw body (None if it was too big) and the parsed object.
+
+        If the body is not a valid json object, the parsed object is None and the error is kept in `error`.
+        """
+        self.closed = True
+        if self.error is None:
+            self.pending.append(self.decoder.decode(b'', final=True))
+            self.parse(final=True)
+            if self.error is None and (self.state != 'end' or self.text[self.pos:].strip()):
+                self.error = ValueError('Unexpected end of json object')
+        data = b''.join(self.chunks) if self.chunks is not None else None
+        return data, self.obj if self.error is None else None
+
+    def parse(self, final):
+        """Parse as much of the text as possible. The text that has not been parsed is kept for the next chunk."""
+        # the parsed text is dropped here, once per parse, instead of after each value
+        self.text = self.text[self.pos:] + ''.join(self.pending)
+        self.pending, self.pending_size, self.wait_size, self.closer = [], 0, 0, None
+        pos = 0
+        try:
+            while True:
+                pos = WHITESPACE.match(self.text, pos).end()
+                if pos == len(self.text):
+                    break
+                new_pos = self.step(pos, final)
+                if new_pos is None:
+                    break
+                pos = new_pos
+        except ValueError as error:
+            # not json (or not an object): let the caller parse the raw body, to get the usual errors
+            self.error = error
+            self.text, self.pos = '', 0
+            return
+        self.pos = pos
+
+    def step(self, pos, final):
+        """Parse the next token or value at `pos`. Return the position after it, or None if more text is needed."""
+        char = self.text[pos]
+        if self.state == 'start':
+            if char != '{':
+                raise ValueError('Not a json object')
+            self.obj = {}
+            self.state = 'first_key'
+            return pos + 1
+        if self.state in ('first_item', 'next_item', 'item'):
+            return self.step_list(char, pos, final)
+        if self.state in ('first_key', 'next') and char == '}':
+            self.state = 'end'
+            return pos + 1
+        if self.state == 'next':
+            self.expect(char, ',')
+            self.state = 'key'
+            return pos + 1
+        if self.state in ('first_key', 'key'):
+            self.expect(char, '"')
+            decoded = self.decode(pos, final)
+            if decoded is None:
+                return None
+            self.key, end = decoded
+            self.state = 'colon'
+            return end
+        if self.state == 'colon':
+            self.expect(char, ':')
+            self.state = 'value'
+            return pos + 1
+        if self.state == 'value':
+            if self.key == self.prop and char == '[':
+                self.items = self.obj[self.key] = []
+                self.state = 'first_item'
+                return pos + 1
+            decoded = self.decode(pos, final)
+            if decoded is None:
+                return None
+            self.obj[self.key], end = decoded
+            self.state = 'next'
+            return end
+        raise ValueError(f'Unexpected {char!r} after the end of the json object')
+
+    def step_list(self, char, pos, final):
+        """Parse the next token or item of the list, see `step`."""
+        if self.state in ('first_item', 'next_item') and char == ']':
+            self.state = 'next'
+            return pos + 1
+        if self.state == 'next_item':
+            self.expect(char, ',')
+            self.state = 'item'
+            return pos + 1
+        decoded = self.decode(pos, final)
+        if decoded is None:
+            return None
+        item, end = decoded
+        self.items.append(item)
+        if self.on_item is not None:
+            self.on_item(item)
+        self.state = 'next_item'
+        return end
+
+    def decode(self, pos, final):
+        """Return the json value at `pos` and the position after it, or None if it may not be complete yet."""
+        try:
+            value, end = DECODER.raw_decode(self.text, pos)
+        except ValueError:
+            if final:
+                raise
+            if self.limit is not None and len(self.text) - pos > self.limit:
+                raise ValueError(f'A json value is bigger than {self.limit} bytes')
+            # wait for the end of the value, and for at least as much text again
+            self.wait_size = len(self.text) - pos
+            self.closer = CLOSERS.get(self.text[pos])
+            return None
+        # a number at the end of the text may go on in the next chunk
+        if end == len(self.text) and not final:
+            return None
+        return value, end
+
+    @staticmethod
+    def expect(char, expected):
+        """Check the next character."""
+        if char != expected:
+            raise ValueError(f'Expected {expected!r}, got {char!r}')
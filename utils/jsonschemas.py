@@ -3,32 +3,47 @@ Jsonschema validation.
 
 Validates info objects, queries and responses.
 Needs to use jsonschema v2.6.0 because of opencore_api
+jsonschema is imported when a validator is first compiled, since it is slow to import.
 """
+import hashlib
 import json
 import logging
 import os.path
+import threading
 
 import config.config
-import jsonschema
 import yaml
 
 import utils.errors as errors
+import utils.results
+import utils.spec_cache
+
+
+# Bump when the format of the cached test suites changes
+SUITE_CACHE_VERSION = b'2'
+# Parsed test schemas, by path: (file stamp, content hash, compiled validator)
+TEST_SCHEMAS = {}
+# Validated test suites as json, by cache key
+TEST_SUITES = {}
+# Where the validated test suites are cached
+SUITE_CACHE_DIR = os.path.join(config.config.CACHE_DIR, 'suites')
 
 
 def validate(inp, inp_type, settings, path=''):
     """
     Validate against a schema.
 
-    inp      - is a representation (dictionary or string) of a json object
+    inp      - is a json object, or its representation (string or bytes)
     inp_type - is either `query` or `repsonse`
     settings - is an object containing schemas and specs
     path     - is the url of the query (either '/' or 'query')
     Returns a list of error messages
     """
     errs = []
-    if not isinstance(inp, dict):
+    if isinstance(inp, (str, bytes, bytearray)):
         try:
-            inp = json.loads(inp)
+            with utils.results.timed('json_decode'):
+                inp = json.loads(inp)
         except json.decoder.JSONDecodeError:
             return [f"Input not a valid json object. {inp}"]
 
@@ -51,31 +66,139 @@ def validate(inp, inp_type, settings, path=''):
         logging.warning('No JSON schema for %s, not validating', schema)
         return []
 
-    validator = jsonschema.Draft4Validator(jschema)  # , format_checker=jsonschema.FormatChecker())
+    validator, lock = schema_validator(settings, schema)
     logging.info('Validate JSON to schema %s', schema)
-    for err in validator.iter_errors(inp, jschema):
+    with lock, utils.results.timed('json_schema'):
+        # the validator's ref resolver keeps a scope stack, so it can only be used by one thread at a time
+        validation_errors = list(validator.iter_errors(inp, jschema))
+    for err in validation_errors:
         # join path, skipping list indices
         path = '.'.join([p for p in err.path if isinstance(p, str)])
         errs.append(f"JSON schema: field '{path}': " + err.message)
     return errs
 
 
+def schema_validator(settings, schema):
+    """Return the validator of one of the JSON schemas in the settings, and its lock."""
+    jschema = settings.json_schemas[schema]
+    return cached_validator(settings, ('json', schema, id(jschema)), lambda: make_validator(jschema))
+
+
+def make_validator(jschema):
+    """Compile a validator for a JSON schema.
+
+    The validator keeps its ref resolver, which caches the resolved references,
+    so it should be reused for all validations against this schema.
+    """
+    import jsonschema
+    resolver = jsonschema.RefResolver.from_schema(jschema)
+    validator = jsonschema.Draft4Validator(jschema, resolver=resolver)  # , format_checker=jsonschema.FormatChecker())
+    return validator, threading.Lock()
+
+
+def cached_validator(settings, key, factory):
+    """Return the validator stored in the settings under `key`, build it using `factory()` the first time."""
+    with settings.lock:
+        if key not in settings.validators:
+            settings.validators[key] = factory()
+        return settings.validators[key]
+
+
+def load_test_schema(schema):
+    """Read a test schema, return its hash. Each schema is only read once, unless the file changes."""
+    stat = os.stat(schema)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    if schema not in TEST_SCHEMAS or TEST_SCHEMAS[schema][0] != stamp:
+        with open(schema, 'rb') as fileh:
+            content = fileh.read()
+        TEST_SCHEMAS[schema] = (stamp, hashlib.sha256(content).digest(), content, None)
+    return TEST_SCHEMAS[schema][1]
+
+
+def test_validator(schema):
+    """Return the validator of a test schema. It is only compiled when a test file needs to be validated."""
+    load_test_schema(schema)
+    stamp, schema_hash, content, validator = TEST_SCHEMAS[schema]
+    if validator is None:
+        import jsonschema
+        validator = jsonschema.Draft7Validator(yaml.load(content, Loader=yaml.SafeLoader))
+        TEST_SCHEMAS[schema] = (stamp, schema_hash, content, validator)
+    return validator
+
+
+def suite_cache_path(key):
+    """Return the path of a cached test suite. The key is the hash of the test file, the schema and the format."""
+    return os.path.join(SUITE_CACHE_DIR, f'{key.hex()}.json')
+
+
+def load_cached_suite(filepath, key):
+    """Return the tests of a file if they have been validated before, None otherwise."""
+    if key not in TEST_SUITES:
+        try:
+            with open(suite_cache_path(key), 'rb') as fileh:
+                TEST_SUITES[key] = fileh.read()
+        except OSError:
+            return None
+    try:
+        # decode every time, so that each caller gets its own copy of the tests
+        return json.loads(TEST_SUITES[key])
+    except ValueError as exc:
+        logging.debug(f'Could not read the cached tests for {filepath}: {exc}')
+        del TEST_SUITES[key]
+        return None
+
+
+def save_cached_suite(filepath, key, tests):
+    """Store tests that have passed the validation.
+
+    They are stored as json, which is only data, unlike pickle. Tests with values that json does
+    not keep as they are (eg. dates, or numbers as keys) are not cached.
+    """
+    try:
+        content = json.dumps(tests).encode()
+    except (TypeError, ValueError):
+        return
+    if json.loads(content) != tests:
+        return
+    TEST_SUITES[key] = content
+    try:
+        utils.spec_cache.write_file(suite_cache_path(key), content)
+    except OSError as exc:
+        logging.debug(f'Could not cache the tests in {filepath}: {exc}')
+
+
+def read_test(filepath, schema):
+    """Read a test file. Return its content and its cache key."""
+    schema_hash = load_test_schema(schema)
+    with open(filepath, 'rb') as fileh:
+        content = fileh.read()
+    key = hashlib.sha256(SUITE_CACHE_VERSION + schema_hash + content).digest()
+    return content, key
+
+
 def load_and_validate_test(filepath, schema=''):
-    """Validate that a yaml file with tests is ok, return the test as json."""
+    """Validate that a yaml file with tests is ok, return the test as json.
+
+    Validated tests are cached in CACHE_DIR, keyed by the hashes of the test file and the schema,
+    so that unchanged files are neither parsed nor validated again.
+    """
     schema = schema or config.config.TEST_SPEC
     if not os.path.isfile(filepath):
         logging.error(f'No such file {filepath}')
         raise errors.TestError(f'No such file {filepath}')
-    with open(schema) as fileh:
-        json_schema = yaml.load(fileh, Loader=yaml.SafeLoader)
-    with open(filepath) as fileh:
-        json_test = yaml.load(fileh, Loader=yaml.SafeLoader)
+    content, key = read_test(filepath, schema)
+    json_test = load_cached_suite(filepath, key)
+    if json_test is not None:
+        logging.debug(f'Using cached tests for {filepath}')
+        return json_test
+
+    json_test = yaml.load(content, Loader=yaml.SafeLoader)
     try:
-        validator = jsonschema.Draft7Validator(json_schema)
-        validator.validate(json_test)
+        test_validator(schema).validate(json_test)
     except Exception:
         logging.error(f'The test {filepath} is not valid:')
         raise
+    save_cached_suite(filepath, key, json_test)
     logging.debug(f'Return {json_test}')
     return json_test
 
@@ -83,21 +206,36 @@ def load_and_validate_test(filepath, schema=''):
 def validate_test(filepath, schema=''):
     """Validate a yaml file, return a list errors."""
     schema = schema or config.config.TEST_SPEC
-    with open(schema) as fileh:
-        json_schema = yaml.load(fileh, Loader=yaml.SafeLoader)
-    with open(filepath) as fileh:
-        json_test = yaml.load(fileh, Loader=yaml.SafeLoader)
-    validator = jsonschema.Draft7Validator(json_schema)
-    return list(validator.iter_errors(json_test))
+    content, key = read_test(filepath, schema)
+    if load_cached_suite(filepath, key) is not None:
+        # the file has already passed the validation
+        return []
+    json_test = yaml.load(content, Loader=yaml.SafeLoader)
+    return list(test_validator(schema).iter_errors(json_test))
 
 
 def run_testvalidaton(validate_tests):
     """Run the validation of a list of files, print the errors."""
     num_errors = 0
+    data = {}
     for testfile in validate_tests:
         errs = validate_test(testfile)
         for err in errs:
             print(err.path)
             print(err.message)
         num_errors += len(errs)
+        if not errs:
+            messages = check_counts(testfile, load_and_validate_test(testfile), data)
+            for message in messages:
+                print(message)
+            num_errors += len(messages)
     print(f'Totally {num_errors} errors')
+
+
+def check_counts(testfile, tests, data):
+    """Compare the expected counts of the tests to their data files, see utils.columns.check_counts."""
+    if not any('counts' in test for test in tests):
+        return []
+    # numpy is only imported when there are counts to check
+    import utils.columns
+    return utils.columns.check_counts(testfile, tests, data)
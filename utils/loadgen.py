@@ -0,0 +1,174 @@
+"""Replay the queries of the tests as load on a beacon.
+
+The queries are sent at a fixed rate (open loop), regardless of how fast the beacon
+answers. Latencies are measured from the time each query was scheduled to be sent,
+so that waiting for a free connection counts as well. When several rates are given,
+they are run one after another, to find the rate at which the beacon saturates.
+"""
+import argparse
+import collections
+import concurrent.futures
+import itertools
+import logging
+import math
+import time
+
+import utils.beacon_query
+import utils.connection_pool
+import utils.errors as err
+import utils.run_test
+import utils.stats
+
+
+# Upper bounds (seconds) of the latency histogram buckets
+HISTOGRAM_BOUNDS = [0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5]
+# A rate is sustained if at least this part of it is achieved
+SUSTAINED = 0.95
+
+Sample = collections.namedtuple('Sample', ['lag', 'latency', 'status'])
+
+
+def parse_rate(rate):
+    """Parse a rate in queries per second (a finite number > 0). Used as an argparse type."""
+    try:
+        qps = float(rate)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'Expected a number, got {rate}')
+    if not (math.isfinite(qps) and qps > 0):
+        raise argparse.ArgumentTypeError(f'The rate must be a positive number, got {rate}')
+    return qps
+
+
+def collect_queries(tests):
+    """Return the (path, query) of each test that is not skipped."""
+    queries = []
+    for test in tests:
+        if test.get('skip', False):
+            continue
+        if 'query' in test:
+            queries.append(('query', utils.run_test.prepare_query(test['query'])))
+        else:
+            queries.append(('/', {}))
+    return queries
+
+
+def run_load(settings, rates, duration=10, count=0, concurrency=50):
+    """Send the queries of the loaded and generated tests at each of the given rates (queries per second).
+
+    Each rate is kept for `duration` seconds, or until `count` queries are sent.
+    Return a list of reports, one per rate.
+    """
+    queries = collect_queries(itertools.chain(settings.tests, settings.generated or []))
+    if not queries:
+        logging.error('No queries to send')
+        return []
+    # the connections of the old pool are closed, the new one is big enough for all waiting queries
+    settings.pool.close()
+    settings.pool = utils.connection_pool.ConnectionPool(size=max(concurrency, settings.pool.size),
+                                                         timeout=settings.pool.timeout)
+    logger = logging.getLogger()
+    level = logger.level
+    reports = []
+    for qps in rates:
+        # at least one query per rate, also for short durations
+        total = count or max(1, int(qps * duration))
+        logging.info(f'Sending {total} queries at {qps} queries/s...')
+        # don't log every query
+        logger.setLevel(max(level, logging.WARNING))
+        try:
+            reports.append(run_rate(settings.host, queries, qps, total, concurrency))
+        finally:
+            logger.setLevel(level)
+    for report in reports:
+        print_report(report)
+    print_saturation(reports)
+    return reports
+
+
+def run_rate(host, queries, qps, total, concurrency):
+    """Send `total` queries at the given rate. Return a report."""
+    futures = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+        start = time.perf_counter()
+        for num in range(total):
+            scheduled = start + num / qps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            path, query = queries[num % len(queries)]
+            futures.append(pool.submit(send, host, path, query, scheduled))
+        sent = time.perf_counter() - start
+    elapsed = time.perf_counter() - start
+    samples = [future.result() for future in futures]
+    return {'target': qps, 'sent': total, 'send_time': sent, 'elapsed': elapsed, 'samples': samples}
+
+
+def send(host, path, query, scheduled):
+    """Send one query, return a Sample."""
+    started = time.perf_counter()
+    try:
+        req = utils.beacon_query.BeaconRequest(host, 'GET', path, args=dict(query))
+        status = utils.beacon_query.BeaconResponse(req).status_code
+    except err.BeaconTestError:
+        status = 'no connection'
+    return Sample(lag=started - scheduled, latency=time.perf_counter() - scheduled, status=status)
+
+
+def saturated(report):
+    """Check whether the beacon could not keep up with the rate.
+
+    That is the case if the achieved rate is too low, or if queries wait longer
+    for a free connection than for the beacon's answers. A rate without answers is saturated.
+    """
+    if not report['samples']:
+        return True
+    lags = sorted(sample.lag for sample in report['samples'])
+    latencies = sorted(sample.latency for sample in report['samples'])
+    achieved = len(report['samples']) / report['elapsed']
+    return achieved < SUSTAINED * report['target'] or \
+        utils.stats.percentile(lags, 50) > utils.stats.percentile(latencies, 50) / 2
+
+
+def print_report(report):
+    """Print the result of one rate."""
+    samples = report['samples']
+    if not samples:
+        logging.warning(f'Target: {report["target"]} queries/s, no queries were sent')
+        return
+    latencies = [sample.latency for sample in samples]
+    summary = utils.stats.summarize(latencies, report['elapsed'])
+    statuses = collections.Counter(sample.status for sample in samples)
+    failed = sum(num for status, num in statuses.items() if not isinstance(status, int) or status >= 400)
+    logging.info(f'\n\n{"":_^40}')
+    logging.info(f'Target: {report["target"]} queries/s, sent {report["sent"]} queries '
+                 f'({report["sent"] / report["send_time"]:.1f}/s)\n')
+    logging.info(f'  {"Achieved:":27} {summary["throughput"]:.1f} queries/s')
+    logging.info(f'  {"Latency (ms):":27} p50 {utils.stats.in_ms(summary["p50"])}  p95 {utils.stats.in_ms(summary["p95"])}  '
+                 f'p99 {utils.stats.in_ms(summary["p99"])}  max {utils.stats.in_ms(summary["max"])}')
+    lag = utils.stats.summarize([sample.lag for sample in samples])
+    logging.info(f'  {"Wait for connection (ms):":27} p50 {utils.stats.in_ms(lag["p50"])}  p99 {utils.stats.in_ms(lag["p99"])}')
+    log = logging.warning if failed else logging.info
+    log(f'  {"Errors:":27} {failed / len(samples):.1%}')
+    for status, num in sorted(statuses.items(), key=str):
+        logging.info(f'    {str(status):25} {num}')
+    logging.info('  Latency histogram:')
+    counts = utils.stats.histogram(latencies, HISTOGRAM_BOUNDS)
+    labels = [f'< {utils.stats.in_ms(bound)} ms' for bound in HISTOGRAM_BOUNDS] + [f'>= {utils.stats.in_ms(HISTOGRAM_BOUNDS[-1])} ms']
+    for label, num in zip(labels, counts):
+        if num:
+            logging.info(f'    {label:>14} {num:8} {"#" * max(1, round(40 * num / len(samples)))}')
+
+
+def print_saturation(reports):
+    """Print the first rate that the beacon could not keep up with."""
+    logging.info(f'\n{"":_^40}')
+    for prev, report in zip([None] + reports, reports):
+        if saturated(report):
+            if prev is None:
+                logging.warning(f'Saturated already at {report["target"]} queries/s')
+            else:
+                logging.warning(f'Saturation point: between {prev["target"]} and {report["target"]} queries/s')
+            break
+    else:
+        logging.info(f'Not saturated at {reports[-1]["target"]} queries/s')
+    logging.info('\n')
@@ -0,0 +1,259 @@
+"""A beacon serving the test data files, to test against when no real beacon is available.
+
+The beacon answers `/` and `/query` as described in the Beacon API specification
+(see integrationtests/beacon_spec.yaml). It runs on asyncio, either in a thread of the
+tester itself (`--host mock`) or on its own (`--mock_beacon PORT`). Since it answers
+from memory, it also shows how much time the tester itself needs per test.
+"""
+import asyncio
+import json
+import logging
+import threading
+import urllib.parse
+
+import config.config
+import utils.beacondata
+import utils.export
+
+
+BEACON_ID = 'beacon-api-tester.mock'
+API_VERSION = '1.0.1'
+DATE = '2030-01-01T00:00:00Z'
+INT_PARAMS = ['start', 'end', 'startMin', 'startMax', 'endMin', 'endMax']
+RANGE_PARAMS = ['startMin', 'startMax', 'endMin', 'endMax']
+REQUIRED_PARAMS = ['referenceName', 'referenceBases', 'assemblyId']
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed'}
+
+
+class QueryError(Exception):
+    """A query that the beacon can not answer."""
+
+
+class MockBeacon():
+    """The answers of the beacon, given the data."""
+
+    def __init__(self, index):
+        """Serve the variants in a VariantIndex."""
+        self.index = index
+
+    def respond(self, method, target):
+        """Answer a request. Return the http status and the response object."""
+        url = urllib.parse.urlsplit(target)
+        path = url.path.rstrip('/')
+        if path not in ('', '/query'):
+            return 404, self.error_response(404, f'Unknown path {url.path}')
+        if method != 'GET':
+            return 405, self.error_response(405, f'Method {method} not allowed')
+        if not path:
+            return 200, self.info()
+        params = urllib.parse.parse_qs(url.query, keep_blank_values=True)
+        try:
+            request = parse_query(params)
+        except QueryError as error:
+            return 400, self.error_response(400, str(error))
+        return 200, self.query(request)
+
+    def info(self):
+        """Return the beacon's info object."""
+        datasets = [{'id': dataset_id, 'name': dataset_id,
+                     'assemblyId': dataset['assemblyId'],
+                     'createDateTime': DATE,
+                     'updateDateTime': DATE,
+                     'variantCount': dataset['variants'],
+                     'info': {'accessType': 'PUBLIC'}}
+                    for dataset_id, dataset in self.index.datasets.items() if dataset_id]
+        return {'id': BEACON_ID,
+                'name': 'Beacon API tester mock beacon',
+                'apiVersion': API_VERSION,
+                'organization': {'id': 'beacon-api-tester', 'name': 'Beacon API tester'},
+                'datasets': datasets}
+
+    def query(self, request):
+        """Return the answer to an allele request."""
+        query = utils.beacondata.make_query(request)
+        hits = self.index.search(query)
+        include = request.get('includeDatasetResponses', 'NONE')
+        responses = []
+        if include in ('HIT', 'ALL'):
+            responses.extend(hit_response(hit) for hit in hits)
+        if include in ('MISS', 'ALL'):
+            found = {hit['datasetId'] for hit in hits}
+            responses.extend({'datasetId': dataset_id, 'exists': False, 'info': {'accessType': 'PUBLIC'}}
+                             for dataset_id in self.queried_datasets(query) if dataset_id not in found)
+        return {'beaconId': BEACON_ID,
+                'apiVersion': API_VERSION,
+                'exists': bool(hits),
+                'alleleRequest': request,
+                'datasetAlleleResponses': responses if include != 'NONE' else None,
+                'error': None}
+
+    def queried_datasets(self, query):
+        """Return the ids of the datasets that a query is about."""
+        if query.datasetIds:
+            return query.datasetIds
+        return [dataset_id for dataset_id, dataset in self.index.datasets.items()
+                if dataset_id and dataset['assemblyId'] == query.assemblyId]
+
+    @staticmethod
+    def error_response(code, message):
+        """Return an answer with an error. The request is left out, since it may not be a valid allele request."""
+        return {'beaconId': BEACON_ID,
+                'apiVersion': API_VERSION,
+                'exists': None,
+                'error': {'errorCode': code, 'errorMessage': message}}
+
+
+def parse_query(params):
+    """Check the query parameters, and convert them to the right types."""
+    request = {key: val[-1] for key, val in params.items() if key != 'datasetIds'}
+    missing = [key for key in REQUIRED_PARAMS if not request.get(key)]
+    if missing:
+        raise QueryError(f'Missing mandatory parameter {", ".join(missing)}')
+    if not (request.get('alternateBases') or request.get('variantType')):
+        raise QueryError('Either alternateBases or variantType is required')
+    for key in INT_PARAMS:
+        if key in request:
+            try:
+                request[key] = int(request[key])
+            except ValueError:
+                raise QueryError(f'{key} must be an integer')
+    if 'start' in request and any(key in request for key in RANGE_PARAMS):
+        raise QueryError('start can not be combined with startMin, startMax, endMin or endMax')
+    if 'start' not in request and not all(key in request for key in RANGE_PARAMS):
+        raise QueryError('Either start or startMin, startMax, endMin and endMax are required')
+    if 'datasetIds' in params:
+        request['datasetIds'] = [dataset_id for val in params['datasetIds'] for dataset_id in val.split(',') if dataset_id]
+    return request
+
+
+def hit_response(hit):
+    """Return the dataset allele response of a matching variant."""
+    response = {'datasetId': hit['datasetId'],
+                'exists': True,
+                'referenceName': hit['referenceName'],
+                'referenceBases': hit.get('referenceBases'),
+                'alternateBases': hit.get('alternateBases'),
+                'variantType': utils.beacondata.variant_type(hit),
+                'start': hit['start'],
+                'end': hit.get('end'),
+                'mateName': hit.get('mateName'),
+                'variantCount': hit.get('variantCount'),
+                'callCount': hit.get('callCount'),
+                'sampleCount': hit.get('sampleCount'),
+                'frequency': hit.get('frequency'),
+                'externalUrl': '',
+                'note': '',
+                'info': {'accessType': 'PUBLIC'}}
+    return {key: val for key, val in response.items() if val is not None}
+
+
+class MockServer():
+    """Serve a MockBeacon over http, with keep-alive connections."""
+
+    def __init__(self, beacon, host='127.0.0.1', port=0):
+        """Set up the server. Port 0 picks a free port."""
+        self.beacon = beacon
+        self.host = host
+        self.port = port
+        self.loop = None
+        self.server = None
+        self.thread = None
+
+    @property
+    def url(self):
+        """Get the url of the running server."""
+        return f'http://{self.host}:{self.port}'
+
+    def listen(self):
+        """Create an event loop and open the socket."""
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.server = self.loop.run_until_complete(asyncio.start_server(self.handle, self.host, self.port))
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    def serve_forever(self):
+        """Serve in the current thread until interrupted."""
+        self.listen()
+        logging.info(f'Serving the mock beacon on {self.url}')
+        try:
+            self.loop.run_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+    def start(self):
+        """Serve in a background thread. Return when the server is listening."""
+        ready = threading.Event()
+
+        def run():
+            self.listen()
+            ready.set()
+            self.loop.run_forever()
+            self.close()
+
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+        ready.wait()
+        return self
+
+    def stop(self):
+        """Stop a server started with `start`."""
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+    def close(self):
+        """Close the socket and the event loop."""
+        self.server.close()
+        self.loop.run_until_complete(self.server.wait_closed())
+        self.loop.close()
+
+    async def handle(self, reader, writer):
+        """Answer the requests on one connection."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                if int(headers.get('content-length', 0)):
+                    await reader.readexactly(int(headers['content-length']))
+
+                status, response = self.beacon.respond(method, target)
+                body = json.dumps(response).encode('utf-8')
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                writer.write(f'HTTP/1.1 {status} {REASONS[status]}\r\n'
+                             'Content-Type: application/json\r\n'
+                             f'Content-Length: {len(body)}\r\n'
+                             f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n'.encode('latin-1') + body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+def data_files(c_args):
+    """Return the data files to serve: the ones given, the ones of the tests and of the generated tests, or the default ones."""
+    if c_args.mock_data:
+        return c_args.mock_data
+    filepaths = utils.export.data_files(c_args.test or [])
+    filepaths += [filepath for filepath in c_args.generate or [] if filepath not in filepaths]
+    return filepaths or config.config.MOCK_DATA
+
+
+def make_server(c_args, port=0):
+    """Load the data files and set up a server for them."""
+    filepaths = data_files(c_args)
+    logging.info(f'Loading {", ".join(filepaths)} into the mock beacon')
+    index = utils.beacondata.VariantIndex.from_files(filepaths)
+    return MockServer(MockBeacon(index), port=port)
@@ -0,0 +1,84 @@
+"""Run tests concurrently.
+
+Each test runs in a worker thread. The log records a test produces are held back
+and written once the test is done, in the same order as the tests were given,
+so that the output looks the same as for a serial run.
+"""
+import collections
+import concurrent.futures
+import logging
+import threading
+
+import utils.errors as err
+import utils.run_test
+
+
+_LOCAL = threading.local()
+
+
+class BufferingFilter(logging.Filter):
+    """Collect the log records of threads that have a buffer instead of emitting them."""
+
+    def filter(self, record):
+        """Keep the record if the current thread is buffering."""
+        records = getattr(_LOCAL, 'records', None)
+        if records is None:
+            return True
+        records.append(record)
+        return False
+
+
+def run_buffered(test):
+    """Run one test in a worker thread. Return its log records, its result and a possible BeaconTestError."""
+    records = _LOCAL.records = []
+    try:
+        return records, utils.run_test.run_test(test), None
+    except err.BeaconTestError as exc:
+        return records, None, exc
+    finally:
+        _LOCAL.records = None
+
+
+def run_tests(tests, workers=1):
+    """Run the tests, yield their results in order.
+
+    With more than one worker, the tests are run using `workers` threads and the output
+    of each test is logged in order. At most 2*`workers` tests are scheduled at any time,
+    so `tests` may be any iterable.
+    Raises BeaconTestError as soon as the output of a failing test has been logged.
+    """
+    if workers <= 1:
+        for test in tests:
+            yield utils.run_test.run_test(test)
+        return
+
+    logger = logging.getLogger()
+    log_filter = BufferingFilter()
+    logger.addFilter(log_filter)
+    tests = iter(tests)
+    pending = collections.deque()
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+            try:
+                for test in tests:
+                    pending.append(pool.submit(run_buffered, test))
+                    if len(pending) >= 2 * workers:
+                        yield flush(pending.popleft(), logger)
+                while pending:
+                    yield flush(pending.popleft(), logger)
+            finally:
+                # don't start the remaining tests if the run is stopped
+                for waiting in pending:
+                    waiting.cancel()
+    finally:
+        logger.removeFilter(log_filter)
+
+
+def flush(future, logger):
+    """Wait for a test to finish, log its output and return its result."""
+    records, result, exc = future.result()
+    for record in records:
+        logger.handle(record)
+    if exc is not None:
+        raise exc
+    return result
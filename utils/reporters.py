@@ -0,0 +1,131 @@
+"""Machine readable reports of the test results.
+
+Each reporter writes one record per test as soon as the test is done, and flushes
+the file, so that the reports can be read while the tests are still running.
+Nothing but the file handle is kept in memory.
+"""
+import argparse
+import json
+from xml.sax.saxutils import escape, quoteattr
+
+import utils.results
+
+
+# Tests that were not run
+SKIPPED = ['skipped', 'unchanged']
+
+
+class Reporter():
+    """Base class for reporters. Subclasses implement `start`, `write` and `end`."""
+
+    def __init__(self, filepath):
+        """Open the report file and write its header."""
+        self.fileh = open(filepath, 'w')
+        self.count = 0
+        self.start()
+        self.fileh.flush()
+
+    def add(self, result):
+        """Write the record of one finished test."""
+        self.count += 1
+        self.write(utils.results.report_record(result))
+        self.fileh.flush()
+
+    def close(self):
+        """Write the footer and close the file."""
+        self.end()
+        self.fileh.close()
+
+    def start(self):
+        """Write the start of the report."""
+
+    def write(self, record):
+        """Write one record."""
+        raise NotImplementedError
+
+    def end(self):
+        """Write the end of the report."""
+
+
+class JsonLinesReporter(Reporter):
+    """One json object per line."""
+
+    def write(self, record):
+        """Write the record as one line."""
+        self.fileh.write(json.dumps(record) + '\n')
+
+
+class JUnitReporter(Reporter):
+    """JUnit XML. The number of tests is not known in advance, so the testsuite element has no counts."""
+
+    def start(self):
+        """Open the testsuite element."""
+        self.fileh.write('<?xml version="1.0" encoding="UTF-8"?>\n<testsuites>\n<testsuite name="beacon-api-tester">\n')
+
+    def write(self, record):
+        """Write a testcase element."""
+        self.fileh.write(f'  <testcase name={quoteattr(record["name"])} classname="beacon" time="{record["duration"]:.6f}">\n')
+        if record['status'] in SKIPPED:
+            self.fileh.write(f'    <skipped message="{record["status"]}"/>\n')
+        elif record['status'] == 'failed':
+            message = record['errors'][0] if record['errors'] else 'failed'
+            self.fileh.write(f'    <failure message={quoteattr(message)}>{escape(chr(10).join(record["errors"]))}</failure>\n')
+        if record['warnings']:
+            self.fileh.write(f'    <system-err>{escape(chr(10).join(record["warnings"]))}</system-err>\n')
+        timings = ' '.join(f'{phase}={seconds:.6f}' for phase, seconds in record['timings'].items())
+        self.fileh.write(f'    <system-out>latency={record["latency"]:.6f} {escape(timings)}</system-out>\n')
+        self.fileh.write('  </testcase>\n')
+
+    def end(self):
+        """Close the testsuite element."""
+        self.fileh.write('</testsuite>\n</testsuites>\n')
+
+
+class TapReporter(Reporter):
+    """Test Anything Protocol, version 13. The plan is written at the end."""
+
+    def start(self):
+        """Write the version line."""
+        self.fileh.write('TAP version 13\n')
+
+    def write(self, record):
+        """Write a test line, with a yaml block for the details."""
+        name = record['name'].replace('#', r'\#')
+        if record['status'] in SKIPPED:
+            self.fileh.write(f'ok {self.count} - {name} # SKIP {record["status"]}\n')
+            return
+        status = 'not ok' if record['status'] == 'failed' else 'ok'
+        self.fileh.write(f'{status} {self.count} - {name}\n')
+        details = {'duration_ms': round(record['duration'] * 1000, 3),
+                   'latency_ms': round(record['latency'] * 1000, 3),
+                   'timings_ms': {phase: round(seconds * 1000, 3) for phase, seconds in record['timings'].items()},
+                   'errors': record['errors'],
+                   'warnings': record['warnings']}
+        # json is valid yaml, one document per line
+        self.fileh.write('  ---\n')
+        for key, value in details.items():
+            if value or value == 0:
+                self.fileh.write(f'  {key}: {json.dumps(value)}\n')
+        self.fileh.write('  ...\n')
+
+    def end(self):
+        """Write the plan."""
+        self.fileh.write(f'1..{self.count}\n')
+
+
+REPORTERS = {'junit': JUnitReporter,
+             'jsonl': JsonLinesReporter,
+             'tap': TapReporter}
+
+
+def parse_report(spec):
+    """Parse a `kind:path` argument. Used as an argparse type."""
+    kind, sep, filepath = spec.partition(':')
+    if not sep or kind not in REPORTERS or not filepath:
+        raise argparse.ArgumentTypeError(f'Expected KIND:FILE, where KIND is one of {", ".join(REPORTERS)}, got {spec}')
+    return kind, filepath
+
+
+def open_reporters(specs):
+    """Open a reporter for each (kind, path)."""
+    return [REPORTERS[kind](filepath) for kind, filepath in specs or []]
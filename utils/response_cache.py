@@ -0,0 +1,67 @@
+"""Responses of the beacon, shared between tests that send the same query.
+
+Only used with `--cache_responses`. The cache lives as long as the test run. When several
+tests send the same query at the same time, only one of them calls the beacon, and the
+others wait for its response.
+"""
+import threading
+
+
+class Entry():
+    """The response to one query, and the specification errors found in it."""
+
+    def __init__(self):
+        """Set up an entry that is waiting for its response."""
+        self.ready = threading.Event()
+        self.lock = threading.Lock()
+        self.response = None
+        self.error = None
+        self.warnings = None
+
+
+class ResponseCache():
+    """Responses by query."""
+
+    def __init__(self):
+        """Set up an empty cache."""
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def response(self, key, fetch):
+        """Return the response for the key, call `fetch` to get it if it's not cached yet.
+
+        Errors raised by `fetch` are not cached, the next call tries again.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            owner = entry is None
+            if owner:
+                entry = self.entries[key] = Entry()
+                self.misses += 1
+            else:
+                self.hits += 1
+        if owner:
+            try:
+                entry.response = fetch()
+            except BaseException as error:
+                entry.error = error
+                with self.lock:
+                    del self.entries[key]
+                raise
+            finally:
+                entry.ready.set()
+        entry.ready.wait()
+        if entry.error is not None:
+            raise entry.error
+        return entry.response
+
+    def warnings(self, key, validate):
+        """Return the specification errors of the cached response, call `validate` to find them the first time."""
+        with self.lock:
+            entry = self.entries[key]
+        with entry.lock:
+            if entry.warnings is None:
+                entry.warnings = validate()
+            return entry.warnings
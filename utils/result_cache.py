@@ -0,0 +1,104 @@
+"""Remember which tests passed, to only rerun the changed ones (`--changed_only`).
+
+A test is skipped if it passed, without specification errors, in an earlier run with
+the same inputs: the same test definition, host, specifications and schemas, options,
+and the same beacon (as far as its info endpoint tells: versions, update times and counts).
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+
+import config.config
+import utils.beacon_query
+import utils.errors as err
+import utils.spec_cache
+
+
+RESULTS_FILE = 'results.json'
+# Number of fingerprints (combinations of beacon, specifications and options) to remember
+MAX_FINGERPRINTS = 20
+# Fields of the beacon info that tell whether its data may have changed
+INFO_FIELDS = ['id', 'apiVersion', 'version', 'createDateTime', 'updateDateTime']
+DATASET_FIELDS = ['id', 'version', 'assemblyId', 'updateDateTime', 'variantCount', 'callCount', 'sampleCount']
+
+
+def digest(content):
+    """Return the sha256 of a string, bytes or json serializable object."""
+    if not isinstance(content, (str, bytes)):
+        content = json.dumps(content, sort_keys=True, default=str)
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    return hashlib.sha256(content).hexdigest()
+
+
+def beacon_state(info):
+    """Return the parts of the beacon info that change when the beacon or its data changes."""
+    state = {key: info.get(key) for key in INFO_FIELDS}
+    state['datasets'] = sorted(([dataset.get(key) for key in DATASET_FIELDS] for dataset in info.get('datasets') or []),
+                               key=str)
+    return state
+
+
+def fingerprint(settings, info):
+    """Return a hash of everything but the test definitions that the results depend on."""
+    return digest({'host': settings.host_name(),
+                   'version': settings.version,
+                   'spec': settings.spec_hash,
+                   'schemas': digest(settings.json_schemas) if settings.use_json_schemas else None,
+                   'check_result': settings.check_result,
+                   'start_pos': settings.start_pos,
+                   'beacon': beacon_state(info)})
+
+
+def open_cache(settings):
+    """Return the result cache for the current settings and beacon, or None if the beacon info is not available."""
+    info = get_beacon_info()
+    if info is None:
+        return None
+    return ResultCache(config.config.CACHE_DIR, fingerprint(settings, info))
+
+
+def get_beacon_info():
+    """Ask the beacon for its info. Return None if it can not be done."""
+    try:
+        _req, resp = utils.beacon_query.make_query(path='/')
+        return json.loads(resp.data)
+    except (err.BeaconTestError, AssertionError, ValueError) as error:
+        logging.warning(f'Could not get the beacon info ({error}), running all tests')
+        return None
+
+
+class ResultCache():
+    """The tests that passed, per fingerprint."""
+
+    def __init__(self, directory, fingerprint):
+        """Read the stored results."""
+        self.path = os.path.join(directory, RESULTS_FILE)
+        self.fingerprint = fingerprint
+        try:
+            with open(self.path) as fileh:
+                self.results = json.load(fileh)
+        except (OSError, ValueError):
+            self.results = {}
+        self.passed = self.results.get(fingerprint, {}).get('tests', {})
+
+    def unchanged(self, test):
+        """Check whether a test passed before with the same inputs."""
+        return digest(test) in self.passed
+
+    def update(self, test, result):
+        """Store the result of a test that was run."""
+        key = digest(test)
+        if result.status == 'passed' and not result.warnings:
+            self.passed[key] = {'name': result.name, 'passed': time.time()}
+        else:
+            self.passed.pop(key, None)
+
+    def save(self):
+        """Write the results, forget the oldest fingerprints."""
+        self.results[self.fingerprint] = {'used': time.time(), 'tests': self.passed}
+        latest = sorted(self.results, key=lambda key: self.results[key].get('used', 0), reverse=True)[:MAX_FINGERPRINTS]
+        self.results = {key: self.results[key] for key in latest}
+        utils.spec_cache.write_file(self.path, json.dumps(self.results, indent=1).encode())
@@ -0,0 +1,148 @@
+"""The results of single tests.
+
+While a test is running, its result object is available to the code it calls
+(eg. the beacon queries) via `current()`, which is used to record timings.
+"""
+import contextlib
+import hashlib
+import json
+import threading
+import time
+
+import utils.stats
+
+
+_LOCAL = threading.local()
+
+# The timed phases of a test, in order
+PHASES = ['connect', 'ttfb', 'body', 'json_decode', 'openapi_request',
+          'openapi_response', 'json_schema', 'compare']
+PHASE_NAMES = {'connect': 'Connect',
+               'ttfb': 'Time to first byte',
+               'body': 'Body read',
+               'json_decode': 'JSON decode',
+               'openapi_request': 'OpenAPI request validation',
+               'openapi_response': 'OpenAPI response validation',
+               'json_schema': 'JSON schema validation',
+               'compare': 'Result comparison'}
+
+
+class TestResult():
+    """The outcome of one test."""
+
+    def __init__(self, test):
+        """Set up a passing result."""
+        self.name = test['name']
+        self.key = test_key(test)
+        self.status = 'passed'
+        self.errors = []
+        # specification errors found in the queries and responses, as logged
+        self.warnings = []
+        # the same errors as counted in the summary
+        self.query_warnings = []
+        self.response_warnings = []
+        # seconds spent waiting for the beacon
+        self.latency = 0.0
+        # seconds for the whole test
+        self.duration = 0.0
+        # seconds per phase
+        self.timings = {}
+
+    def fail(self, messages):
+        """Mark the test as failed."""
+        self.status = 'failed'
+        self.errors.extend(messages)
+
+
+def test_key(test):
+    """Identify a test between runs. Names are not unique across test files, so the query is included."""
+    query = json.dumps(test.get('query'), sort_keys=True, default=str)
+    return f'{test["name"]}:{hashlib.sha256(query.encode()).hexdigest()[:12]}'
+
+
+def current():
+    """Return the result of the test running in this thread, if any."""
+    return getattr(_LOCAL, 'result', None)
+
+
+@contextlib.contextmanager
+def collect(result):
+    """Make `result` the current result, time the block."""
+    _LOCAL.result = result
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result.duration = time.perf_counter() - start
+        _LOCAL.result = None
+
+
+@contextlib.contextmanager
+def timed(phase):
+    """Add the time spent in the block to the given phase of the current result."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_time(phase, time.perf_counter() - start)
+
+
+def add_time(phase, seconds):
+    """Add time to a phase of the current result."""
+    result = current()
+    if result is not None:
+        result.timings[phase] = result.timings.get(phase, 0.0) + seconds
+
+
+def add_warnings(warnings):
+    """Add specification errors (utils.beacon_query.ValidationWarnings) to the current result."""
+    result = current()
+    if result is not None:
+        result.warnings.extend(warnings.messages)
+        result.query_warnings.extend(warnings.query)
+        result.response_warnings.extend(warnings.response)
+
+
+def add_latency(seconds):
+    """Add time spent waiting for the beacon to the current result."""
+    result = current()
+    if result is not None:
+        result.latency += seconds
+
+
+def timing_record(result):
+    """Return the timings of a result as a json serializable dict."""
+    return {'name': result.name,
+            'key': result.key,
+            'status': result.status,
+            'duration': result.duration,
+            'latency': result.latency,
+            'timings': dict(result.timings)}
+
+
+def report_record(result):
+    """Return everything about a result as a json serializable dict."""
+    return {**timing_record(result), 'errors': result.errors, 'warnings': result.warnings,
+            'query_warnings': result.query_warnings, 'response_warnings': result.response_warnings}
+
+
+def summarize_timings(records):
+    """Summarize each phase over the given timing records.
+
+    Tests that did not go through a phase (eg. no new connection was needed) count as 0 seconds.
+    """
+    summary = {}
+    for phase in PHASES + ['duration']:
+        if phase == 'duration':
+            values = [record['duration'] for record in records]
+        else:
+            values = [record['timings'].get(phase, 0.0) for record in records]
+        summary[phase] = utils.stats.summarize(values)
+        summary[phase]['total'] = sum(values)
+    return summary
+
+
+def export_timings(records, filepath):
+    """Write the timings of each test and their summary to a json file."""
+    with open(filepath, 'w') as fileh:
+        json.dump({'summary': summarize_timings(records), 'tests': records}, fileh, indent=2)
@@ -1,46 +1,77 @@
 """Module for running tests, specified in yml."""
 
 import logging
-import operator
 
 from utils.beacon_query import call_beacon
+import utils.assertions
 import utils.errors as err
-from utils.compare import assert_partly_in, assert_not_in
+from utils.compare import ResponseIndex
+import utils.json_stream
+import utils.results
 import utils.setup
 
 
+# The list of the responses that is checked while it is read, with --stream_responses
+STREAM_PROPERTY = 'datasetAlleleResponses'
+
+
 def run_test(test):
-    """Call the beacon as specified in the test and check the result."""
+    """Call the beacon as specified in the test and check the result. Return a TestResult."""
     logging.info(f"Running test {test['name']}")
     logging.debug(f"{test.get('descr', '')}")
     logging.debug(f"Assuming that this data is present in your beacon: {test.get('data', [])}")
     settings = utils.setup.Settings()
+    result = utils.results.TestResult(test)
     if test.get('skip', False):
-        return
-    try:
-        status_code, ignore_schemas = prepare_call(test)
-        if 'query' not in test:
-            resp = call_beacon(path='/', code=status_code, ignore_schemas=ignore_schemas)
-        else:
-            query = prepare_query(test['query'])
-            resp = call_beacon(query=query, code=status_code, ignore_schemas=ignore_schemas)
-
-        if settings.check_result:
-            for check in test['results']:
-                assert_test(check, resp)
-
-    except err.ResponseError as r_error:
-        # errors from the comparisons of a response, contains a list of errors to report
-        logging.error('Test "%s" did not pass: """%s"""', test['name'], test['descr'])
-        for err_msg in r_error.messages:
-            settings.errors += 1
-            logging.error(err_msg)
-
-    except AssertionError as a_error:
-        # other errors
-        logging.error('Test "%s" did not pass: """%s"""', test['name'], test['descr'])
-        logging.error(str(a_error))
-        settings.errors += 1
+        result.status = 'skipped'
+        return result
+    with utils.results.collect(result):
+        try:
+            status_code, ignore_schemas = prepare_call(test)
+            assertions = utils.assertions.Assertions(test['results'])
+            stream, list_pass = None, None
+            if 'query' not in test:
+                resp = call_beacon(path='/', code=status_code, ignore_schemas=ignore_schemas)
+            else:
+                query = prepare_query(test['query'])
+                stream, list_pass = make_stream(assertions)
+                resp = call_beacon(query=query, code=status_code, ignore_schemas=ignore_schemas, stream=stream)
+
+            if settings.check_result:
+                # a response from the response cache was not streamed in this test
+                fed = {STREAM_PROPERTY: list_pass} if stream is not None and stream.done else None
+                with utils.results.timed('compare'):
+                    assertions.check(resp, ResponseIndex(resp), fed)
+
+        except err.ResponseError as r_error:
+            # errors from the comparisons of a response, contains a list of errors to report
+            logging.error('Test "%s" did not pass: """%s"""', test['name'], test['descr'])
+            for err_msg in r_error.messages:
+                settings.add_errors()
+                logging.error(err_msg)
+            result.fail(r_error.messages)
+
+        except AssertionError as a_error:
+            # other errors
+            logging.error('Test "%s" did not pass: """%s"""', test['name'], test['descr'])
+            logging.error(str(a_error))
+            settings.add_errors()
+            result.fail([str(a_error)])
+    return result
+
+
+def make_stream(assertions):
+    """Set up the parsing of a response while it is read (--stream_responses), with the checks of STREAM_PROPERTY.
+
+    Return the stream and the ListPass that it feeds, or None for both.
+    """
+    settings = utils.setup.Settings()
+    if not settings.stream_responses:
+        return None, None
+    list_pass = assertions.list_pass(STREAM_PROPERTY) if settings.check_result else None
+    stream = utils.json_stream.ListStream(STREAM_PROPERTY, list_pass.feed if list_pass is not None else None,
+                                          settings.stream_limit)
+    return stream, list_pass
 
 
 def prepare_call(test):
@@ -53,37 +84,15 @@ def prepare_call(test):
     return status_code, ignore_schemas
 
 
-def assert_test(check, response):
-    """Test one property."""
-    length_ops = {'length_gt': (operator.gt, 'greater than'),
-                  'length_lt': (operator.lt, 'lesser than'),
-                  'length_eq': (operator.eq, 'equal to')
-                  }
-
-    if check["assert"] in length_ops:
-        lop, txt = length_ops[check["assert"]]
-        assert lop(len(response[check['property']]), check['length']), \
-            f"Bad length of field {check['property']}" \
-            f"should be {txt} {check['length']}, but is {len(response[check['property']])}"
-
-    if check["assert"] == "contains":
-        assert_partly_in(check['data'], response, check['property'])
-
-    if check["assert"] == "not_contains":
-        assert_not_in(check['data'], response, check['property'])
-
-    if check["assert"] in ["is_true", "is_false"]:
-        prop = response[check['property']]
-        err_msg = f"Bad value of field {check['property']}" \
-                  f"should be 'false', but is {response[check['property']]}"
-        if check["assert"] == "is_false":
-            prop = not prop
-        assert prop, err_msg
+def assert_test(check, response, index=None):
+    """Test one property. `index` is a ResponseIndex of the response."""
+    utils.assertions.Assertions([check]).check(response, index)
 
 
 def prepare_query(query):
-    """Remove all null values from the query."""
-    empties = [key for (key, val) in query.items() if val is None]
-    for key in empties:
-        del query[key]
-    return query
+    """Return a copy of the query without null values.
+
+    The test's own query is left untouched, since it may be shared with other tests
+    (yaml anchors) that are running at the same time.
+    """
+    return {key: val for (key, val) in query.items() if val is not None}
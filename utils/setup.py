@@ -1,19 +1,23 @@
 """Responsible for configuration."""
+import hashlib
 import json
 import logging
 import os
+import threading
 import urllib.error
-import urllib.request
 
-import jsonschema.exceptions as json_exceptions
-import openapi_core.schema.servers.models
-import openapi_spec_validator.exceptions as spec_exceptions
 import yaml
-from openapi_core import create_spec
 
 import config.config
+import utils.cassette
+import utils.connection_pool
 import utils.errors as err
+import utils.generate
 import utils.jsonschemas
+import utils.mock_beacon
+import utils.response_cache
+import utils.spec_cache
+import utils.validation_pool
 
 
 VERSIONS = {'v101': {'ga4gh': 'v1.0.1', 'CSCfi': 'v1.1.0-rc1'},
@@ -45,6 +49,8 @@ class Settings():
     check_result = True
     start_pos = 0
     json_schemas = {}
+    # compiled validators, by schema name or spec
+    validators = {}
     openapi = None
     host = None
     version = None
@@ -52,39 +58,126 @@ class Settings():
     warnings = []
     query_warnings = []
     tests = []
+    # tests made from data files while they are run, see utils.generate
+    generated = None
+    # timings of the finished tests, see utils.results.timing_record
+    timings = []
+    workers = 1
+    pool = None
+    # responses shared between tests, when enabled
+    response_cache = None
+    # recorded responses, see utils.cassette. The mode is 'record' or 'replay'
+    cassette = None
+    cassette_mode = None
+    # the mock beacon, when testing against it
+    mock_server = None
+    # sha256 of the OpenAPI specification
+    spec_hash = None
+    # number of tests not run with --changed_only
+    unchanged = 0
+    # worker processes for the validation, when enabled
+    validation_pool = None
+    # parse the responses while they are read, keep at most stream_limit bytes of each raw body
+    stream_responses = False
+    stream_limit = None
+    # guards the counters and validators above when tests are run concurrently
+    lock = threading.Lock()
 
     def __init__(self):
         """Initialize."""
         return
 
+    def host_name(self):
+        """Return a name of the host that stays the same between runs (the mock beacon gets a new port each time)."""
+        return config.config.MOCK_HOST if self.mock_server is not None else self.host
+
+    def close(self):
+        """Close the cassette and stop the validation processes."""
+        if self.cassette is not None:
+            self.cassette.close()
+        if self.validation_pool is not None:
+            self.validation_pool.close()
+
+    def set_responses(self, c_args):
+        """Set how the responses are read: cached, recorded or replayed, streamed."""
+        if c_args.cache_responses:
+            self.response_cache = utils.response_cache.ResponseCache()
+        if c_args.replay:
+            self.cassette = utils.cassette.Player(c_args.replay)
+            self.cassette_mode = 'replay'
+        elif c_args.record:
+            self.cassette = utils.cassette.Recorder(c_args.record, self.host)
+            self.cassette_mode = 'record'
+        if c_args.stream_responses is not None:
+            self.stream_responses = True
+            # the cassette needs the whole body
+            if self.cassette_mode != 'record':
+                self.stream_limit = int(c_args.stream_responses * 1024 * 1024)
+
+    def reset_results(self):
+        """Forget the results of the tests run so far, to run more tests (--watch)."""
+        with self.lock:
+            self.errors = 0
+            self.warnings = []
+            self.query_warnings = []
+            self.timings = []
+            self.unchanged = 0
+
+    def add_errors(self, num=1):
+        """Count failed checks."""
+        with self.lock:
+            self.errors += num
+
+    def add_warnings(self, warnings):
+        """Store specification errors found in responses."""
+        with self.lock:
+            self.warnings += warnings
+
+    def add_timings(self, record):
+        """Store the timings of a finished test."""
+        with self.lock:
+            self.timings.append(record)
+
+    def add_query_warnings(self, warnings):
+        """Store specification errors found in queries."""
+        with self.lock:
+            self.query_warnings += warnings
+
     def set_args(self, c_args):
         """Set current host, read API specifications."""
-        if c_args.host and c_args.host in config.config.HOSTS:
-            # use a known host
-            self.host = config.config.HOSTS.get(c_args.host)
-        elif c_args.host:
-            # use a given url
-            self.host = c_args.host
+        if c_args.host == config.config.MOCK_HOST:
+            # serve the test data from this process
+            self.mock_server = utils.mock_beacon.make_server(c_args).start()
+            self.host = self.mock_server.url
         else:
-            # default, use local host
-            self.host = config.config.HOSTS.get('local')
+            self.host = host_name(c_args.host)
 
-        for pathname in c_args.test:
+        for pathname in c_args.test or []:
             self.tests += utils.jsonschemas.load_and_validate_test(pathname)
+        if c_args.generate:
+            self.generated = utils.generate.generate_tests(c_args.generate, c_args.generate_limit)
 
         self.check_result = not c_args.only_structure
+        self.workers = max(1, c_args.workers)
+        self.pool = utils.connection_pool.ConnectionPool(size=c_args.pool_size, timeout=c_args.timeout)
         self.start_pos = int(c_args.one_based)
+        self.set_responses(c_args)
 
         self.version = c_args.version.replace('.', '')
         spec_versions = VERSIONS[self.version]
+        # no network at all when replaying
+        cache = utils.spec_cache.SpecCache(config.config.CACHE_DIR, self.version, offline=c_args.offline or bool(c_args.replay),
+                                           max_age=config.config.CACHE_MAX_AGE, timeout=c_args.timeout)
         if c_args.no_openapi:
-            spec_path = ''
+            spec_content = ''
         else:
-            spec_path = get_spec_content(spec_versions)
+            spec_content = get_spec_content(spec_versions, cache)
 
-        if spec_path:
-            self.openapi = parse_spec(spec_path)
-            server = openapi_core.schema.servers.models.Server(self.host)
+        self.spec_hash = hashlib.sha256(spec_content.encode() if isinstance(spec_content, str) else spec_content).hexdigest()
+        if spec_content:
+            from openapi_core.schema.servers.models import Server
+            self.openapi = parse_spec(spec_content, cache)
+            server = Server(self.host)
             self.openapi.servers.append(server)
 
         if c_args.no_json:
@@ -97,47 +190,60 @@ class Settings():
                 self.json_schemas['info'] = load_local_schema('info')
             else:
                 logging.info('Downloading JSON schemas')
-
-                def load_url(qtype):
+                for qtype in ['response', 'query', 'info']:
                     path = JSON_URL.format(querytype=qtype, version=spec_versions['CSCfi'])
-                    return json.loads(urllib.request.urlopen(path).read())
-
-                self.json_schemas['response'] = load_url('response')
-                self.json_schemas['query'] = load_url('query')
-                self.json_schemas['info'] = load_url('info')
+                    try:
+                        self.json_schemas[qtype] = json.loads(cache.fetch(path))
+                    except urllib.error.URLError as urlerr:
+                        logging.warning('Could not download %s (%s). '
+                                        'Will not validate against this JSON schema.',
+                                        path, urlerr.reason)
+        if c_args.validation_processes:
+            self.validation_pool = utils.validation_pool.ValidationPool(c_args.validation_processes, self, spec_content)
         logging.info('\n')
 
 
-def get_spec_content(versions):
+def host_name(host):
+    """Return the url of a known host (default: local host), or the given url.
+
+    The mock beacon keeps its name, since it gets a new port each time.
+    """
+    if host in config.config.HOSTS:
+        return config.config.HOSTS.get(host)
+    return host or config.config.HOSTS.get('local')
+
+
+def get_spec_content(versions, cache):
     """
     Try to read the spec and return its content.
 
     Strategy:
     1. If there is a file path in the config, try read and return it.
-    2. If there is a url in the config, try load and return it.
-    3. Try to load the default url and return it.
+    2. If there is a url in the config, try load (or get from the cache) and return it.
+    3. Try to load (or get from the cache) the default url and return it.
     4. Return an empty string.
     """
     if not config.config.SPEC:
-        return load_default_spec(versions)
+        return load_default_spec(versions, cache)
 
     if os.path.isfile(config.config.SPEC):
         logging.info('Using Beacon specification in %s', config.config.SPEC)
-        return open(config.config.SPEC)
+        with open(config.config.SPEC) as fileh:
+            return fileh.read()
     try:
         logging.info(f'Requesting spec {config.config.SPEC}')
-        return urllib.request.urlopen(config.config.SPEC).read()
+        return cache.fetch(config.config.SPEC)
     except urllib.error.URLError:
         logging.warning(f'Could not open {config.config.SPEC}')
-        return load_default_spec(versions)
+        return load_default_spec(versions, cache)
 
 
-def load_default_spec(versions):
+def load_default_spec(versions, cache):
     """Download the default api spec."""
     logging.info('Downloading default Beacon specification')
     try:
         spec_url = SPEC_URL.format(version=versions['ga4gh'])
-        return urllib.request.urlopen(spec_url).read()
+        return cache.fetch(spec_url)
     except urllib.error.URLError:
         logging.warning('Could not download %s. '
                         'Will not validate against the OpenAPI Specification.',
@@ -152,11 +258,26 @@ def load_local_schema(name):
     return json.loads(data)
 
 
-def parse_spec(inp_file):
-    """Parse a yaml file into a specification object."""
+def parse_spec(content, cache=None):
+    """Parse a yaml specification into a specification object.
+
+    If a cache is given, it is used for remote references in the spec,
+    and the parsed spec is stored in it for later runs.
+    """
+    # openapi_core is slow to import, only do it when a spec is used
+    import jsonschema.exceptions as json_exceptions
+    import openapi_spec_validator.exceptions as spec_exceptions
+    from openapi_core import create_spec
+    if cache is not None:
+        spec = cache.load_spec(content)
+        if spec is not None:
+            return spec
     try:
-        y_spec = yaml.load(inp_file, Loader=yaml.SafeLoader)
-        spec = create_spec(y_spec)
+        y_spec = yaml.load(content, Loader=yaml.SafeLoader)
+        if cache is not None:
+            spec = create_spec(y_spec, handlers=cache.handlers())
+        else:
+            spec = create_spec(y_spec)
     except json_exceptions.RefResolutionError:
         logging.error("Could not load specification. Check your network or try again")
         raise err.BeaconTestError()
@@ -169,4 +290,6 @@ def parse_spec(inp_file):
         logging.exception(exc)
         raise err.BeaconTestError()
 
+    if cache is not None:
+        cache.save_spec(content, spec)
     return spec
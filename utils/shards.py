@@ -0,0 +1,93 @@
+"""Split the tests over several runs (shards), and merge their reports.
+
+The tests are partitioned by their expected durations (longest processing time first): each
+test, from the slowest to the fastest, goes to the shard with the least work so far. The
+durations are only taken from reports that all shards are given (`--shard_timings`, eg. the
+json lines reports of the shards of an earlier run), never from the local history, which
+may differ between machines. Without timings, the tests are split by their number. Either
+way, the partition only depends on the tests and the given files, so all shards agree on it.
+The shards don't update the history; merging their reports (`--merge_reports`) does.
+"""
+import argparse
+import json
+import logging
+
+import utils.results
+
+
+def parse_shard(spec):
+    """Parse an `i/N` argument (1 <= i <= N). Used as an argparse type."""
+    try:
+        num, total = (int(part) for part in spec.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'Expected i/N, got {spec}')
+    if not 1 <= num <= total:
+        raise argparse.ArgumentTypeError(f'Shard {spec} does not exist')
+    return num, total
+
+
+def read_timings(filepaths):
+    """Return the durations (seconds) of the tests in json lines reports, by test key. The last run of a test counts."""
+    durations = {}
+    for record in read_records(filepaths):
+        if 'key' in record and record['status'] in ('passed', 'failed'):
+            durations[record['key']] = record['duration']
+    return durations
+
+
+def partition(tests, total, durations=None):
+    """Split the tests into `total` lists, with about the same expected duration.
+
+    `durations` are the durations of the tests by test key (see read_timings). Tests without
+    one are expected to take the median duration. Within each list, the tests keep their original order.
+    """
+    durations = durations or {}
+    known = sorted(durations.values())
+    median = known[len(known) // 2] if known else 0.0
+    expected = [durations.get(utils.results.test_key(test), median) for test in tests]
+    order = sorted(range(len(tests)), key=lambda pos: (-expected[pos], utils.results.test_key(tests[pos]), pos))
+    loads = [0.0] * total
+    shards = [[] for _ in range(total)]
+    for pos in order:
+        # without timings, all durations are 0, then the number of tests decides
+        shard = min(range(total), key=lambda num: (loads[num], len(shards[num]), num))
+        loads[shard] += expected[pos]
+        shards[shard].append(pos)
+    return [[tests[pos] for pos in sorted(shard)] for shard in shards], loads
+
+
+def select(tests, num, total, durations=None):
+    """Return the tests of shard `num` (1-based) of `total`."""
+    shards, loads = partition(tests, total, durations)
+    logging.info(f'Shard {num}/{total}: {len(shards[num - 1])} of {len(tests)} tests, '
+                 f'expected duration {loads[num - 1]:.1f} s (longest shard {max(loads):.1f} s)')
+    return shards[num - 1]
+
+
+def read_records(filepaths):
+    """Read the records of json lines reports, one at a time."""
+    for filepath in filepaths:
+        with open(filepath) as fileh:
+            for line in fileh:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def merge_reports(filepaths, history=None):
+    """Combine json lines reports (`--report jsonl:FILE`) of several shards, add the results to the history.
+
+    Return the data errors, the specification errors, the query specification errors,
+    the number of unchanged tests and the timing records, as in the summary of a single run.
+    """
+    merged = {'errors': 0, 'warnings': [], 'query_warnings': [], 'unchanged': 0, 'timings': []}
+    for record in read_records(filepaths):
+        if history is not None and 'key' in record:
+            history.add(record['key'], record['name'], record['status'], record['duration'])
+        merged['errors'] += len(record['errors'])
+        merged['warnings'].extend(record.get('response_warnings', []))
+        merged['query_warnings'].extend(record.get('query_warnings', []))
+        if record['status'] == 'unchanged':
+            merged['unchanged'] += 1
+        elif record['status'] != 'skipped':
+            merged['timings'].append({key: record[key] for key in ['name', 'status', 'duration', 'latency', 'timings']})
+    return merged
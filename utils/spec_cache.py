@@ -0,0 +1,241 @@
+"""Local cache for the downloaded specifications and schemas.
+
+Downloaded files are stored by their sha256 sum in `CACHE_DIR/objects`. The index,
+`CACHE_DIR/index.json`, maps the urls of each api version (see `utils.setup.VERSIONS`)
+to a stored file, together with the ETag and Last-Modified headers used to revalidate it.
+Parsed OpenAPI specifications are pickled in `CACHE_DIR/specs`, so that unchanged
+specifications don't need to be parsed and validated again.
+
+In offline mode, the network is never used; only cached files are available.
+openapi_core is only imported when a specification is parsed or loaded, it is slow to import.
+"""
+import copyreg
+import email.utils
+import hashlib
+import inspect
+import io
+import json
+import logging
+import os
+import pickle
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+import yaml
+
+
+class SpecCache():
+    """Cache for the files of one api version."""
+
+    def __init__(self, directory, version, offline=False, max_age=0, timeout=60):
+        """Set up the cache.
+
+        directory - where the files are stored
+        version   - the api version, a key of `utils.setup.VERSIONS`
+        offline   - never use the network
+        max_age   - seconds during which a cached file is used without being revalidated
+        timeout   - seconds to wait for a download
+        """
+        self.directory = directory
+        self.version = version
+        self.offline = offline
+        self.max_age = max_age
+        self.timeout = timeout
+        self.index = self.load_index()
+
+    def path(self, *parts):
+        """Return a path within the cache directory."""
+        return os.path.join(self.directory, *parts)
+
+    def load_index(self):
+        """Read the index, return an empty one if there is none."""
+        try:
+            with open(self.path('index.json')) as fileh:
+                return json.load(fileh)
+        except (OSError, ValueError):
+            return {}
+
+    def fetch(self, url):
+        """Return the content of the url, from the cache if it is still valid.
+
+        Raises urllib.error.URLError if the content can neither be downloaded nor found in the cache.
+        """
+        entry = self.index.get(self.version, {}).get(url)
+        cached = self.read_object(entry['sha']) if entry else None
+        if cached is not None and (self.offline or time.time() - entry['fetched'] < self.max_age):
+            logging.debug('Using cached %s', url)
+            return cached
+        if self.offline:
+            raise urllib.error.URLError(f'{url} is not cached, and no downloads are made in offline mode')
+
+        request = urllib.request.Request(url)
+        if cached is not None:
+            if entry.get('etag'):
+                request.add_header('If-None-Match', entry['etag'])
+            modified = entry.get('last_modified') or email.utils.formatdate(entry['fetched'], usegmt=True)
+            request.add_header('If-Modified-Since', modified)
+        try:
+            response = urllib.request.urlopen(request, timeout=self.timeout)
+        except urllib.error.HTTPError as error:
+            if error.code == 304 and cached is not None:
+                logging.debug('Cached %s is up to date', url)
+                entry['fetched'] = time.time()
+                self.save_index()
+                return cached
+            raise
+        except urllib.error.URLError as error:
+            if cached is None:
+                raise
+            logging.warning('Could not download %s (%s), using the cached version', url, error.reason)
+            return cached
+
+        content = response.read()
+        self.store(url, content, response.headers)
+        return content
+
+    def store(self, url, content, headers):
+        """Save downloaded content, update the index."""
+        sha = hashlib.sha256(content).hexdigest()
+        try:
+            write_file(self.path('objects', sha), content)
+            self.index.setdefault(self.version, {})[url] = {
+                'sha': sha,
+                'etag': headers.get('ETag'),
+                'last_modified': headers.get('Last-Modified'),
+                'fetched': time.time(),
+            }
+            self.save_index()
+        except OSError as error:
+            logging.warning('Could not write to the cache %s: %s', self.directory, error)
+
+    def read_object(self, sha):
+        """Return a stored file, or None if it is missing or damaged."""
+        try:
+            with open(self.path('objects', sha), 'rb') as fileh:
+                content = fileh.read()
+        except OSError:
+            return None
+        if hashlib.sha256(content).hexdigest() != sha:
+            return None
+        return content
+
+    def save_index(self):
+        """Write the index to disk."""
+        write_file(self.path('index.json'), json.dumps(self.index, indent=1).encode())
+
+    def handlers(self):
+        """Return handlers for resolving remote references in a specification through the cache."""
+        from openapi_spec_validator import default_handlers
+
+        def resolve_remote(url):
+            return yaml.load(self.fetch(url), Loader=yaml.SafeLoader)
+        return {**default_handlers, 'http': resolve_remote, 'https': resolve_remote}
+
+    def spec_path(self, content):
+        """Return the path of the pickled version of a specification."""
+        import openapi_core
+        if isinstance(content, str):
+            content = content.encode()
+        sha = hashlib.sha256(content).hexdigest()
+        return self.path('specs', f'{sha}-openapi_core-{openapi_core.__version__}.pickle')
+
+    def load_spec(self, content):
+        """Return the pickled, parsed specification, or None if it is not cached."""
+        try:
+            with open(self.spec_path(content), 'rb') as fileh:
+                spec = SpecUnpickler(fileh).load()
+        except FileNotFoundError:
+            return None
+        except Exception as error:
+            logging.debug('Could not load the cached specification: %s', error)
+            return None
+        logging.debug('Using cached parsed specification')
+        return spec
+
+    def save_spec(self, content, spec):
+        """Pickle a parsed specification."""
+        from openapi_core.schema.schemas.models import Schema
+        fileh = io.BytesIO()
+        pickler = SpecPickler(fileh, pickle.HIGHEST_PROTOCOL)
+        pickler.dispatch_table = copyreg.dispatch_table.copy()
+        pickler.dispatch_table[Schema] = reduce_schema
+        try:
+            pickler.dump(spec)
+            write_file(self.spec_path(content), fileh.getvalue())
+        except (OSError, pickle.PicklingError) as error:
+            logging.warning('Could not cache the parsed specification: %s', error)
+
+
+class SpecPickler(pickle.Pickler):
+    """Pickle parsed specifications.
+
+    The spec's reference resolver is not needed once the spec is parsed, and can't be pickled.
+    The `NoValue` marker must remain the same object after unpickling.
+    """
+
+    def __init__(self, *args, **kwargs):
+        """Set up the pickler."""
+        from jsonschema.validators import RefResolver
+        from openapi_core.schema.schemas.types import NoValue
+        super().__init__(*args, **kwargs)
+        self.resolver_type, self.no_value = RefResolver, NoValue
+
+    def persistent_id(self, obj):
+        """Leave out reference resolvers and markers."""
+        if isinstance(obj, self.resolver_type):
+            return 'resolver'
+        if obj is self.no_value:
+            return 'novalue'
+        return None
+
+
+class SpecUnpickler(pickle.Unpickler):
+    """Unpickle parsed specifications."""
+
+    def persistent_load(self, pid):
+        """Give the spec an empty reference resolver, restore markers."""
+        from jsonschema.validators import RefResolver
+        from openapi_core.schema.schemas.types import NoValue
+        if pid == 'novalue':
+            return NoValue
+        return RefResolver('', {})
+
+
+def write_file(path, content):
+    """Write a file atomically, so that concurrent runs never see half written files."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fileh = tempfile.NamedTemporaryFile(dir=os.path.dirname(path), delete=False)
+    try:
+        with fileh:
+            fileh.write(content)
+        os.replace(fileh.name, path)
+    except OSError:
+        os.unlink(fileh.name)
+        raise
+
+
+# Arguments of openapi_core's Schema that are kept in attributes with other names
+SCHEMA_ATTRIBUTES = {'schema_type': 'type', 'schema_format': 'format'}
+
+
+def reduce_schema(schema):
+    """Pickle an openapi_core Schema by the arguments to make it again.
+
+    Schema overrides `__dict__` to return its source, so the default pickling would lose the attributes.
+    Raises PicklingError if an argument is not kept in an attribute, then the spec is not cached.
+    """
+    kwargs = {}
+    for name in inspect.signature(type(schema)).parameters:
+        attribute = SCHEMA_ATTRIBUTES.get(name, name)
+        if not hasattr(schema, attribute):
+            raise pickle.PicklingError(f'Schema has no attribute for the argument {name}')
+        kwargs[name] = getattr(schema, attribute)
+    return restore_schema, (kwargs,)
+
+
+def restore_schema(kwargs):
+    """Recreate a pickled Schema."""
+    from openapi_core.schema.schemas.models import Schema
+    return Schema(**kwargs)
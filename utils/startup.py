@@ -0,0 +1,95 @@
+"""Measure how long the tester takes to start, per command.
+
+    python3 -m utils.startup [--runs N] [--json FILE] [--baseline FILE]
+
+Each command is run `N` times in a new interpreter with `-X importtime`. The median wall time
+and time spent importing are printed, with the slow packages (HEAVY) that the command imported,
+so that an import that makes every command slow is easy to spot. The figures can be saved with
+`--json`, and compared to saved figures with `--baseline`.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import config.config
+import utils.jsonschemas
+
+
+TESTS = 'tests/test-v101-variants.yaml'
+# name, arguments to beacon_api_tester.py (None: an empty interpreter), whether the test file changed before each run
+COMMANDS = [('python', None, False),
+            ('help', ['--help'], False),
+            ('validate_tests', ['--validate_tests', TESTS], False),
+            ('validate_tests (changed)', ['--validate_tests', TESTS], True),
+            ('show_data_files', ['--show_data_files', TESTS], False),
+            ('extract_csv_data', ['--extract_csv_data', TESTS], False),
+            ('test (mock)', ['--host', 'mock', '--offline', '--no_openapi', '--only_warn', '--test', TESTS], False)]
+HEAVY = ['openapi_core', 'openapi_spec_validator', 'jsonschema', 'werkzeug', 'numpy', 'yaml', 'coloredlogs', 'asyncio']
+
+
+def measure(args, changed):
+    """Run a command once. Return the wall time, the time spent importing, and the imported modules."""
+    if changed:
+        # like after an edit, the validated test file is not cached
+        try:
+            os.remove(utils.jsonschemas.suite_cache_path(utils.jsonschemas.read_test(TESTS, config.config.TEST_SPEC)[1]))
+        except FileNotFoundError:
+            pass
+    command = [sys.executable, '-X', 'importtime'] + (['-c', 'pass'] if args is None else ['beacon_api_tester.py'] + args)
+    start = time.perf_counter()
+    proc = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True)
+    wall = time.perf_counter() - start
+    imports, modules = 0, set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _self, cumulative, name = line[len('import time:'):].split('|')
+        modules.add(name.strip())
+        if not name[1:].startswith(' '):
+            # top level import, the cumulative time includes the imports below it
+            imports += int(cumulative) / 1e6
+    return wall, imports, modules
+
+
+def run(runs):
+    """Measure all commands. Return a dict of name -> figures."""
+    figures = {}
+    for name, args, changed in COMMANDS:
+        measured = [measure(args, changed) for _ in range(runs)]
+        modules = set.union(*[modules for _wall, _imports, modules in measured])
+        figures[name] = {'wall': statistics.median(wall for wall, _imports, _modules in measured),
+                         'imports': statistics.median(imports for _wall, imports, _modules in measured),
+                         'heavy': [package for package in HEAVY if package in modules]}
+    return figures
+
+
+def print_figures(figures, baseline=None):
+    """Print the figures, and the change since the baseline."""
+    print(f'{"command":26} {"wall":>8} {"imports":>8} {"change":>8}  heavy imports')
+    for name, fig in figures.items():
+        change = ''
+        if baseline and name in baseline:
+            change = f'{(fig["wall"] - baseline[name]["wall"]) * 1000:+.0f}'
+        print(f'{name:26} {fig["wall"] * 1000:8.0f} {fig["imports"] * 1000:8.0f} {change:>8}  {", ".join(fig["heavy"])}')
+    print('(milliseconds, median)')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure the start up time of each command')
+    parser.add_argument('--runs', type=int, default=5, help='Number of runs per command. Default 5')
+    parser.add_argument('--json', metavar='FILE', help='Save the figures')
+    parser.add_argument('--baseline', metavar='FILE', help='Compare to figures saved with --json')
+    c_args = parser.parse_args()
+    baseline = None
+    if c_args.baseline:
+        with open(c_args.baseline) as fileh:
+            baseline = json.load(fileh)
+    results = run(c_args.runs)
+    print_figures(results, baseline)
+    if c_args.json:
+        with open(c_args.json, 'w') as fileh:
+            json.dump(results, fileh, indent=1)
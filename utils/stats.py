@@ -0,0 +1,43 @@
+"""Summary statistics for timings."""
+import bisect
+import math
+
+
+def percentile(values, pct):
+    """Return the `pct`:th percentile of a sorted list (nearest rank), or None for empty lists."""
+    if not values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(values)))
+    return values[rank - 1]
+
+
+def summarize(timings, wall_time=None):
+    """Summarize a list of timings (in seconds).
+
+    If the wall time is given, the throughput (timings per second) is included.
+    """
+    values = sorted(timings)
+    summary = {'count': len(values),
+               'mean': sum(values) / len(values) if values else None,
+               'p50': percentile(values, 50),
+               'p95': percentile(values, 95),
+               'p99': percentile(values, 99),
+               'max': values[-1] if values else None}
+    if wall_time:
+        summary['throughput'] = len(values) / wall_time
+    return summary
+
+
+def histogram(timings, bounds):
+    """Count the timings below each bound (in seconds), the last count is for the timings above all bounds."""
+    counts = [0] * (len(bounds) + 1)
+    for timing in timings:
+        counts[bisect.bisect_right(bounds, timing)] += 1
+    return counts
+
+
+def in_ms(seconds):
+    """Format seconds as milliseconds, for tables."""
+    if seconds is None:
+        return '-'
+    return f'{seconds * 1000:.1f}'
@@ -0,0 +1,133 @@
+"""Validate the queries and responses in other processes.
+
+The OpenAPI and JSON schema validation is pure Python, so the test threads (`--workers`)
+can not validate in parallel. With a validation pool, each worker process parses the
+specification and builds its validators once, and the test threads hand the fetched
+responses over to it. The test threads wait for the results, while the other tests keep
+fetching. The specification errors and the timings of the validation are sent back to
+the test, which reports them as usual.
+"""
+import logging
+import multiprocessing
+import threading
+
+import config.config
+import utils.beacon_query
+import utils.errors as err
+import utils.jsonschemas
+import utils.results
+import utils.setup
+import utils.spec_cache
+
+
+# Seconds to wait for the processes to start
+READY_TIMEOUT = 60
+
+
+class ValidationPool():
+    """A pool of processes that run `utils.beacon_query.check_schemas`."""
+
+    def __init__(self, processes, settings, spec_content):
+        """Start the processes. They validate like `settings`, against the specification in `spec_content`."""
+        json_schemas = settings.json_schemas if settings.use_json_schemas else None
+        context = multiprocessing.get_context('spawn')
+        # wait for all processes to be set up, so that the first tests are not slowed down
+        ready = context.Barrier(processes + 1)
+        # the log messages of processes that could not be set up
+        failures = context.SimpleQueue()
+        self.pool = context.Pool(processes, initializer=init_worker,
+                                 initargs=(spec_content, settings.version, settings.host, json_schemas, ready, failures))
+        try:
+            ready.wait(READY_TIMEOUT)
+        except threading.BrokenBarrierError:
+            if not failures.empty():
+                for level, message in failures.get():
+                    logging.log(level, message)
+            logging.error('Could not start the validation processes')
+            self.pool.terminate()
+            raise err.BeaconTestError()
+        # processes that replace crashed ones don't wait
+        ready.abort()
+
+    def check(self, req, resp, path, query):
+        """Validate a query and its response in a worker process. Return the specification errors as ValidationWarnings."""
+        warnings, timings, records = self.pool.apply(check_in_worker, (req, resp, path, query))
+        for level, message in records:
+            logging.log(level, message)
+        for phase, seconds in timings.items():
+            utils.results.add_time(phase, seconds)
+        return utils.beacon_query.ValidationWarnings(*warnings)
+
+    def close(self):
+        """Stop the processes."""
+        self.pool.close()
+        self.pool.join()
+
+
+def init_worker(spec_content, version, host, json_schemas, ready, failures):
+    """Set up a worker process. If that fails, send the log messages to `failures` and stop waiting for the others."""
+    # the log messages are sent back to the tests
+    logging.getLogger().setLevel(logging.DEBUG)
+    handler = RecordingHandler()
+    logging.getLogger().handlers = [handler]
+    try:
+        setup_worker(spec_content, version, host, json_schemas)
+    except Exception as error:
+        if not isinstance(error, err.BeaconTestError):
+            # expected errors are logged where they are raised
+            logging.error(f'Could not set up a validation process: {error!r}')
+        failures.put(handler.records)
+        # the parent stops at once, instead of waiting for processes that can't be set up
+        ready.abort()
+        return
+    finally:
+        logging.getLogger().handlers = [logging.NullHandler()]
+    try:
+        ready.wait(READY_TIMEOUT)
+    except threading.BrokenBarrierError:
+        pass
+
+
+def setup_worker(spec_content, version, host, json_schemas):
+    """Set up the settings of a worker process, and build the validators."""
+    settings = utils.setup.Settings()
+    settings.host = host
+    settings.version = version
+    if spec_content:
+        from openapi_core.schema.servers.models import Server
+        # the parent has just parsed the spec, so it is found in the cache
+        cache = utils.spec_cache.SpecCache(config.config.CACHE_DIR, version, offline=True)
+        settings.openapi = utils.setup.parse_spec(spec_content, cache)
+        settings.openapi.servers.append(Server(host))
+        utils.beacon_query.openapi_validators(settings)
+    settings.use_json_schemas = json_schemas is not None
+    settings.json_schemas = json_schemas or {}
+    for schema in settings.json_schemas:
+        utils.jsonschemas.schema_validator(settings, schema)
+
+
+class RecordingHandler(logging.Handler):
+    """Keep the log messages of a validation, to be logged by the test that asked for it."""
+
+    def __init__(self):
+        """Set up an empty list of (level, message)."""
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        """Keep a record."""
+        self.records.append((record.levelno, record.getMessage()))
+
+
+def check_in_worker(req, resp, path, query):
+    """Validate in a worker process. Return the specification errors, the time spent per phase and the log messages."""
+    result = utils.results.TestResult({'name': path})
+    handler = RecordingHandler()
+    logger = logging.getLogger()
+    logger.addHandler(handler)
+    try:
+        with utils.results.collect(result):
+            warnings = utils.beacon_query.check_schemas(req, resp, path, query)
+    finally:
+        logger.removeHandler(handler)
+    return tuple(warnings), result.timings, handler.records
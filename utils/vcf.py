@@ -0,0 +1,237 @@
+"""Read records from (possibly compressed) vcf files.
+
+Plain, gzip and bgzip compressed files are supported. The first time records are extracted
+from a file, an index of the ids of the records is saved next to it (`<file>.ids.sqlite`).
+Later extractions look the wanted ids up in the index and read only their records, instead
+of the whole file.
+Records in gzip files can't be looked up, so these are always read in full.
+"""
+import gzip
+import logging
+import os
+import pathlib
+import re
+import sqlite3
+import struct
+import zlib
+
+
+INDEX_SUFFIX = '.ids.sqlite'
+BGZF_HEADER = struct.Struct('<4BI2BH')
+
+
+class BgzfReader():
+    """Read a bgzip file, which consists of separately compressed blocks.
+
+    Positions are virtual offsets: the file position of a block, shifted 16 bits left,
+    plus the position within the uncompressed block.
+    """
+
+    def __init__(self, fileh):
+        """Start reading at the first block."""
+        self.fileh = fileh
+        self.load_block(0)
+
+    def load_block(self, start):
+        """Read and uncompress the block at the given file position."""
+        self.fileh.seek(start)
+        self.block_start, self.block, self.pos = start, b'', 0
+        header = self.fileh.read(BGZF_HEADER.size)
+        if len(header) < BGZF_HEADER.size:
+            self.next_block = None
+            return
+        _id1, _id2, _cm, _flg, _mtime, _xfl, _os, xlen = BGZF_HEADER.unpack(header)
+        extra = self.fileh.read(xlen)
+        bsize = None
+        while extra:
+            sub_id, sub_len = extra[:2], struct.unpack('<H', extra[2:4])[0]
+            if sub_id == b'BC':
+                bsize = struct.unpack('<H', extra[4:6])[0]
+            extra = extra[4 + sub_len:]
+        if bsize is None:
+            raise ValueError('Not a bgzip file')
+        cdata = self.fileh.read(bsize - xlen - 19)
+        self.fileh.read(8)  # crc and uncompressed size
+        self.block = zlib.decompress(cdata, -15)
+        self.next_block = start + bsize + 1
+
+    def tell(self):
+        """Return the virtual offset of the next line."""
+        while self.pos >= len(self.block) and self.next_block is not None:
+            self.load_block(self.next_block)
+        return self.block_start << 16 | self.pos
+
+    def seek(self, offset):
+        """Go to a virtual offset."""
+        self.load_block(offset >> 16)
+        self.pos = offset & 0xFFFF
+
+    def readline(self):
+        """Read a line, return b'' at the end of the file."""
+        line = b''
+        while True:
+            end = self.block.find(b'\n', self.pos)
+            if end >= 0:
+                line += self.block[self.pos:end + 1]
+                self.pos = end + 1
+                return line
+            line += self.block[self.pos:]
+            self.pos = len(self.block)
+            if self.next_block is None:
+                return line
+            self.load_block(self.next_block)
+
+    def close(self):
+        """Close the file."""
+        self.fileh.close()
+
+
+def open_vcf(path):
+    """Open a vcf file for reading bytes. Return the file handle and whether it can seek."""
+    fileh = open(path, 'rb')
+    magic = fileh.read(4)
+    fileh.seek(0)
+    if magic[:2] != b'\x1f\x8b':
+        return fileh, True
+    if len(magic) == 4 and magic[3] & 4:
+        # the extra field is used by bgzip
+        try:
+            return BgzfReader(fileh), True
+        except ValueError:
+            pass
+    fileh.close()
+    return gzip.open(path, 'rb'), False
+
+
+def record_ids(line):
+    """Return the ids of a vcf record."""
+    try:
+        ids = line.split(b'\t', 3)[2].decode()
+    except IndexError:
+        logging.warning(f'Could not find id in vcf line {line}')
+        return []
+    return [vid for vid in re.split('[,;]', ids) if vid != '.']
+
+
+def file_stamp(path):
+    """Return something that changes when the file is changed."""
+    stat = os.stat(path)
+    return f'{stat.st_size}\t{stat.st_mtime_ns}'
+
+
+def lookup_index(path, ids):
+    """Find the offsets of the records with the given ids, using the index of the vcf file.
+
+    Return a dict with an offset list per found id, or None if there is no valid index.
+    """
+    found = {}
+    try:
+        # read only, so that a missing index is not created
+        index = sqlite3.connect(pathlib.Path(str(path) + INDEX_SUFFIX).resolve().as_uri() + '?mode=ro', uri=True)
+    except sqlite3.Error:
+        return None
+    try:
+        if index.execute('SELECT stamp FROM file').fetchone() != (file_stamp(path),):
+            return None
+        for vid in ids:
+            offsets = [offset for offset, in index.execute('SELECT offset FROM ids WHERE id = ?', (vid,))]
+            if offsets:
+                found[vid] = offsets
+    except (OSError, sqlite3.Error):
+        return None
+    finally:
+        index.close()
+    return found
+
+
+def extract(path, ids, out, print_metadata=True):
+    """Write the header and the records with the given ids from a vcf file to `out`.
+
+    `ids` is a set of ids, `*` means all records.
+    Return the set of ids that were found.
+    """
+    fileh, seekable = open_vcf(path)
+    try:
+        while True:
+            pos = fileh.tell() if seekable else 0
+            line = fileh.readline()
+            if not line.startswith(b'#'):
+                break
+            if not line.startswith(b'##') or print_metadata:
+                out.write(line)
+
+        offsets = lookup_index(path, ids) if seekable and '*' not in ids else None
+        if offsets is not None:
+            for offset in sorted({offset for vid_offsets in offsets.values() for offset in vid_offsets}):
+                fileh.seek(offset)
+                out.write(fileh.readline())
+            return set(offsets)
+        return extract_all(fileh, path, line, pos, ids, out, seekable)
+    finally:
+        fileh.close()
+
+
+def extract_all(fileh, path, line, pos, ids, out, seekable):
+    """Read through all records and write the matching ones. Save an index if possible."""
+    found = set()
+    index = open_index(path) if seekable else None
+    try:
+        while line:
+            line_ids = record_ids(line)
+            matches = ids.intersection(line_ids)
+            if matches or '*' in ids:
+                out.write(line)
+                found.update(matches)
+            if index is not None:
+                index.add(line_ids, pos)
+                pos = fileh.tell()
+            line = fileh.readline()
+    except BaseException:
+        if index is not None:
+            index.discard()
+        raise
+    if index is not None:
+        index.save()
+    return found
+
+
+class IndexWriter():
+    """Write the index of a vcf file: the offset of the record of each id, and the stamp of the file."""
+
+    def __init__(self, path):
+        """Start writing to a temporary file next to the vcf file."""
+        self.path = str(path) + INDEX_SUFFIX
+        self.tmp_path = self.path + '.tmp'
+        if os.path.exists(self.tmp_path):
+            # left from an interrupted run
+            os.unlink(self.tmp_path)
+        self.db = sqlite3.connect(self.tmp_path)
+        self.db.execute('CREATE TABLE file (stamp TEXT)')
+        self.db.execute('INSERT INTO file VALUES (?)', (file_stamp(path),))
+        self.db.execute('CREATE TABLE ids (id TEXT, offset INTEGER)')
+
+    def add(self, ids, offset):
+        """Add the ids of a record."""
+        self.db.executemany('INSERT INTO ids VALUES (?, ?)', ((vid, offset) for vid in ids))
+
+    def save(self):
+        """Make the ids searchable, and replace the old index."""
+        # building the search index once is faster than updating it for each record
+        self.db.execute('CREATE INDEX ids_id ON ids (id)')
+        self.db.commit()
+        self.db.close()
+        os.replace(self.tmp_path, self.path)
+
+    def discard(self):
+        """Remove the unfinished index."""
+        self.db.close()
+        os.unlink(self.tmp_path)
+
+
+def open_index(path):
+    """Start writing a new index for a vcf file. Return None if that is not possible."""
+    try:
+        return IndexWriter(path)
+    except (OSError, sqlite3.Error) as error:
+        logging.warning(f'Could not save vcf index for {path}: {error}')
+        return None
@@ -0,0 +1,152 @@
+"""Run the tests again when they change (`--watch`).
+
+The tester keeps running and looks for changes in the test files and in their data files
+(`beacondata`) a few times a second. When a test file changes, its new and changed tests are
+run; when a data file changes, the tests that use it are run, and the mock beacon serves the
+new data. Everything else is kept between the runs: the parsed specification, the compiled
+validators, the connections to the beacon and the validation processes.
+"""
+import logging
+import os
+import time
+from pathlib import Path
+
+import config.config
+import utils.beacondata
+import utils.errors as err
+import utils.jsonschemas
+import utils.response_cache
+import utils.setup
+
+
+# Seconds between the checks for changes
+INTERVAL = 0.5
+
+
+def stamp(path):
+    """Return the modification time and size of a file, None if it doesn't exist (eg. while an editor saves it)."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class FileWatcher():
+    """Find the files that have changed since they were last looked at."""
+
+    def __init__(self, paths=()):
+        """Start watching some files."""
+        self.stamps = {}
+        self.watch(paths)
+
+    def watch(self, paths):
+        """Set the files to watch. Files that were watched before keep their stamps."""
+        self.stamps = {path: self.stamps[path] if path in self.stamps else stamp(path) for path in paths}
+
+    def changed(self):
+        """Return the files that have changed, in order."""
+        changed = []
+        for path, old in self.stamps.items():
+            new = stamp(path)
+            if new != old and new is not None:
+                changed.append(path)
+            self.stamps[path] = new
+        return changed
+
+
+def data_file(testfile, test):
+    """Return the path of the data file of a test, or None."""
+    if 'beacondata' not in test:
+        return None
+    return str(Path(testfile).parent / test['beacondata'])
+
+
+class Watch():
+    """The test files and their tests, as they were when they were last run."""
+
+    def __init__(self, c_args, rerun, interval=INTERVAL):
+        """Read the test files.
+
+        rerun - is called with the tests to run after a change
+        """
+        self.c_args = c_args
+        self.rerun = rerun
+        self.interval = interval
+        self.suites = {testfile: utils.jsonschemas.load_and_validate_test(testfile) for testfile in c_args.test or []}
+        self.watcher = FileWatcher(self.paths())
+
+    def paths(self):
+        """Return the files to watch: the test files, their data files and the data of the mock beacon."""
+        paths = list(self.suites) + self.data_files()
+        if utils.setup.Settings().mock_server is not None:
+            paths += self.mock_data_files()
+        return list(dict.fromkeys(paths))
+
+    def data_files(self):
+        """Return the data files of the tests."""
+        return sorted({data_file(testfile, test) for testfile, tests in self.suites.items() for test in tests if 'beacondata' in test})
+
+    def mock_data_files(self):
+        """Return the data of the mock beacon, like utils.mock_beacon.data_files, using the tests as they were last read."""
+        if self.c_args.mock_data:
+            return self.c_args.mock_data
+        filepaths = self.data_files()
+        filepaths += [filepath for filepath in self.c_args.generate or [] if filepath not in filepaths]
+        return filepaths or config.config.MOCK_DATA
+
+    def loop(self):
+        """Look for changes and run the affected tests, until interrupted."""
+        logging.info(f'Watching {len(self.watcher.stamps)} files for changes, press Ctrl-C to stop.')
+        try:
+            while True:
+                time.sleep(self.interval)
+                changed = self.watcher.changed()
+                if changed:
+                    self.update(changed)
+        except KeyboardInterrupt:
+            logging.info('Stopped watching.')
+
+    def update(self, changed):
+        """Run the tests affected by changes in some files."""
+        logging.info(f'Changed: {", ".join(changed)}')
+        tests = self.changed_tests(changed)
+        self.watcher.watch(self.paths())
+        settings = utils.setup.Settings()
+        if any(path not in self.suites for path in changed):
+            self.reload_data()
+            if settings.response_cache is not None:
+                # the cached responses may be out of date
+                settings.response_cache = utils.response_cache.ResponseCache()
+        if tests:
+            self.rerun(tests)
+        else:
+            logging.info('No tests affected.')
+
+    def changed_tests(self, changed):
+        """Read the changed test files. Return their new and changed tests, and the tests of changed data files."""
+        tests = []
+        for testfile, suite in list(self.suites.items()):
+            old = {}
+            if testfile in changed:
+                try:
+                    self.suites[testfile] = utils.jsonschemas.load_and_validate_test(testfile)
+                except Exception as error:
+                    # keep watching, the file may be saved again soon
+                    logging.error(f'Could not read {testfile}: {error}')
+                    continue
+                old = {test['name']: test for test in suite}
+            for test in self.suites[testfile]:
+                if (testfile in changed and old.get(test['name']) != test) or data_file(testfile, test) in changed:
+                    tests.append(test)
+        return tests
+
+    def reload_data(self):
+        """Give the mock beacon the new data."""
+        settings = utils.setup.Settings()
+        if settings.mock_server is None:
+            return
+        try:
+            settings.mock_server.beacon.index = utils.beacondata.VariantIndex.from_files(self.mock_data_files())
+        except (OSError, ValueError, err.BeaconTestError):
+            logging.error('Could not read the data of the mock beacon, it serves the old data.')